@@ -0,0 +1,170 @@
+"""
+Prompt templates for the formatting calls.
+
+Each template's static instructions are sent as the system message and only the
+per-request notes go in the user message, so every call shares an identical
+prefix and OpenAI's automatic prompt caching applies to it (cached input tokens
+are billed at a discount and show up in usage.prompt_tokens_details). The
+template version hashes the role layout and text; response-cache keys use it,
+so editing a prompt invalidates its cached outputs.
+"""
+from dataclasses import dataclass
+from typing import Dict
+
+from app.services.response_cache import prompt_version
+
+CONTRACTOR_PROMPT_PREFIX = (
+    "You MUST return exactly one JSON object matching the ContractorDocV1 schema.\n"
+    "Do NOT return markdown. Do NOT wrap in code fences. Do NOT add any extra text.\n"
+    "No extra keys allowed. No explanations.\n"
+    "The top-level object MUST contain ONLY these keys: schema_version, client_name, client_address, line_items, total_cents.\n"
+    "Do NOT nest under another object. Do NOT add extra keys. Do NOT omit required keys.\n"
+    "\n"
+    "Example ContractorDocV1 JSON:\n"
+    "{\n"
+    "  \"schema_version\": \"v1\",\n"
+    "  \"client_name\": \"Jane Smith\",\n"
+    "  \"client_address\": \"123 Main St, Denver, CO\",\n"
+    "  \"line_items\": [\n"
+    "    {\n"
+    "      \"description\": \"Install carpet\",\n"
+    "      \"amount_cents\": 120000\n"
+    "    },\n"
+    "    {\n"
+    "      \"description\": \"Remove old carpet\",\n"
+    "      \"amount_cents\": 20000\n"
+    "    }\n"
+    "  ],\n"
+    "  \"total_cents\": 140000\n"
+    "}\n"
+)
+
+PROMPT_PREFIX = (
+    "You MUST return exactly one JSON object that matches the AiDocV1 schema.\n"
+    "The top-level object MUST contain ONLY these keys:\n"
+    "\"schema_version\"\n"
+    "\"currency\"\n"
+    "\"locale\"\n"
+    "\"client\"\n"
+    "\"project\"\n"
+    "\"line_items\"\n"
+    "\"totals\"\n"
+    "\"source\" (if applicable per schema)\n"
+    "Do NOT create an 'invoice' object.\n"
+    "Do NOT nest all fields under another object.\n"
+    "Do NOT add extra keys.\n"
+    "Do NOT omit required keys.\n"
+    "\n"
+    "Example of valid top-level structure:\n"
+    "{\n"
+    "  \"schema_version\": \"1.0\",\n"
+    "  \"currency\": \"USD\",\n"
+    "  \"locale\": \"en-US\",\n"
+    "  \"client\": { ... },\n"
+    "  \"project\": { ... },\n"
+    "  \"line_items\": [\n"
+    "    {\n"
+    "      \"description\": \"Demo carpet\",\n"
+    "      \"quantity\": 1,\n"
+    "      \"unit_price_cents\": 100000,\n"
+    "      \"total_cents\": 100000\n"
+    "    }\n"
+    "  ],\n"
+    "  \"totals\": {\n"
+    "    \"subtotal_cents\": 100000,\n"
+    "    \"total_cents\": 100000\n"
+    "  }\n"
+    "}\n"
+    "\n"
+    "Return ONLY JSON.\n"
+    "No markdown.\n"
+    "No explanations.\n"
+    "No extra wrapping objects.\n"
+)
+
+REWRITE_PROMPT = (
+    "You are turning handwritten notes into a clean invoice/proposal scope list.\n"
+    "Hard rules:\n"
+    "- Plain text only. No markdown.\n"
+    "- Output each line as plain text. Do NOT include bullets (no '•', no '-', no numbering).\n"
+    "- Do NOT include client name, address, or any header information in the output body.\n"
+    "- Do NOT include printed/letterhead content (company slogans, phone, email, address).\n"
+    "- Do NOT include 'Session:' or 'Page:' lines.\n"
+    "- Do NOT output stand-alone numbers or an 'Amount' section.\n"
+    "Pricing Rules:\n"
+    "- If the handwritten notes contain no dollar amounts anywhere, do NOT invent pricing.\n"
+    "- In that case, output the scope only and include a final line:\n"
+    "  'Total: TO BE DETERMINED'\n"
+    "- If a line shows a price range (example: 5000-7000 or 5,000 – 7,000):\n"
+    "  Format it exactly as:\n"
+    "  'Description — $5,000.00 – $7,000.00'\n"
+    "- If any line uses a range price, the final total must also show a range:\n"
+    "  'Total: $X,XXX.XX – $Y,YYY.YY'\n"
+    "- Always normalize money with '$' and two decimals.\n"
+    "- Never output stand-alone number columns.\n"
+    "Output format:\n"
+    "- Produce a list of line items.\n"
+    "- Each line item must include a description. A price is optional.\n"
+    "- If priced:  'Description — $1,234.56'\n"
+    "- If unpriced: 'Description'\n"
+    "- Do not invent prices. Do not assign the final total to a random line item.\n"
+    "- If the notes show an amount off to the right (like '650 00'), treat it as $650.00.\n"
+    "- If an amount has no '$' or no decimals, normalize it to dollars with two decimals.\n"
+    "- If you cannot confidently find a price for a scope line, KEEP the line but output it with NO price.\n"
+    "- Stand-alone numbers (e.g. 192, 12600) should only be used as Total if clearly the final total; otherwise ignore them.\n"
+    "- Do NOT merge separate scope lines into one combined line, even if they are adjacent.\n"
+    "- If two separate amounts appear (e.g., 175 and 75), keep them as separate line items.\n"
+    "- If a final handwritten total exists (e.g., 12,600), use ONLY that as the Total.\n"
+    "- Do NOT recompute or sum line items.\n"
+    "- Never add line items together to create new totals.\n"
+    "Voice:\n"
+    "Older, friendly, experienced construction owner: plain, direct, practical wording."
+)
+
+SINGLE_CALL_PROMPT_SUFFIX = (
+    "Return exactly one JSON object (no markdown) describing the document:\n"
+    "- professional_text: the rewritten scope list, exactly as the rules above would produce it as plain text.\n"
+    "- client_name / client_address: taken from the header of the notes, or null if absent.\n"
+    "- line_items: one entry per scope line in professional_text; amount_cents is the price in integer cents, or null if unpriced or a range.\n"
+    "- total_cents: the handwritten final total in integer cents, or null if absent, a range, or TO BE DETERMINED.\n"
+    "- schema_version: \"v1\".\n"
+)
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    system: str
+
+    @property
+    def version(self) -> str:
+        return prompt_version("system+user", self.system)
+
+    def messages(self, user_content: str) -> list:
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": user_content},
+        ]
+
+
+PROMPTS: Dict[str, PromptTemplate] = {}
+
+
+def register_prompt(name: str, system: str) -> PromptTemplate:
+    template = PromptTemplate(name, system)
+    PROMPTS[name] = template
+    return template
+
+
+def get_prompt(name: str) -> PromptTemplate:
+    return PROMPTS[name]
+
+
+def notes_block(text: str) -> str:
+    return "=== BEGIN HANDWRITTEN NOTES ===\n" + text + "\n=== END HANDWRITTEN NOTES ===\n"
+
+
+CONTRACTOR_DOC = register_prompt("contractor_doc_v1", CONTRACTOR_PROMPT_PREFIX)
+AI_DOC = register_prompt("ai_doc_v1", PROMPT_PREFIX)
+REWRITE = register_prompt("rewrite", REWRITE_PROMPT)
+SINGLE_CALL = register_prompt("single_call", REWRITE_PROMPT + "\n\n" + SINGLE_CALL_PROMPT_SUFFIX)
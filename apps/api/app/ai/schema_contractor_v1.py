@@ -31,3 +31,47 @@ def validate_contractor_doc_v1(raw_text: str) -> ContractorDocV1:
         )
 
     return ContractorDocV1.model_validate(obj)
+
+
+class ContractorProposalV1(ContractorDocV1):
+    """Single-call generate output: the rewritten professional text plus ContractorDocV1 fields."""
+    professional_text: str
+
+
+# response_format for OpenAI structured outputs (strict mode: every key required, nullables typed)
+CONTRACTOR_PROPOSAL_V1_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "contractor_proposal_v1",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["professional_text", "schema_version", "client_name", "client_address", "line_items", "total_cents"],
+            "properties": {
+                "professional_text": {"type": "string"},
+                "schema_version": {"type": "string", "enum": ["v1"]},
+                "client_name": {"type": ["string", "null"]},
+                "client_address": {"type": ["string", "null"]},
+                "line_items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "required": ["description", "amount_cents"],
+                        "properties": {
+                            "description": {"type": "string"},
+                            "amount_cents": {"type": ["integer", "null"]},
+                        },
+                    },
+                },
+                "total_cents": {"type": ["integer", "null"]},
+            },
+        },
+    },
+}
+
+
+def validate_contractor_proposal_v1(raw_text: str) -> ContractorProposalV1:
+    # Structured outputs return bare JSON, so no brace scanning is needed; bad JSON raises ValidationError too
+    return ContractorProposalV1.model_validate_json(raw_text)
@@ -3,6 +3,7 @@ import json
 from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import JSONResponse
+from app.request_context import get_request_id
 from app.middleware.error_handlers import error_response
 from typing import Any
 from app.auth import require_auth
@@ -50,18 +51,7 @@ from fastapi import Depends
 from app.auth import require_auth
 @router.get("/api/admin-saves/{kind}/{entity_id}", dependencies=[Depends(require_auth)])
 async def get_admin_save(kind: str, entity_id: str, auth=Depends(require_auth)):
-    request_id = None
-    try:
-        from fastapi import Request as _Request
-        import inspect
-        frame = inspect.currentframe()
-        while frame:
-            if "request" in frame.f_locals and isinstance(frame.f_locals["request"], _Request):
-                request_id = getattr(frame.f_locals["request"].state, "request_id", None)
-                break
-            frame = frame.f_back
-    except Exception:
-        pass
+    request_id = get_request_id()
     if kind not in ALLOWED_KINDS:
         return error_response("invalid_kind", "Invalid kind", request_id, 400)
     if not entity_id:
@@ -3,7 +3,8 @@ from pydantic import BaseModel
 
 from app.auth import get_auth_level
 from app.security.tokens import create_access_token
-from app.security.rate_limit import RateLimiter, RateLimitException
+from app.security.rate_limit import RateLimitException, get_rate_limiter
+from app.models import config
 from app.middleware.error_handlers import error_response
 
 router = APIRouter()
@@ -11,8 +12,6 @@ router = APIRouter()
 class LoginRequest(BaseModel):
     password: str
 
-rate_limiter = RateLimiter()
-
 @router.post("/login")
 async def login(payload: LoginRequest, req: Request):
     request_id = getattr(req.state, "request_id", None)
@@ -26,7 +25,7 @@ async def login(payload: LoginRequest, req: Request):
         else:
             ip = req.client.host if req.client else "unknown"
 
-        rate_limiter.check(ip, "login", 5)
+        await get_rate_limiter().acheck(ip, "login", config.get_settings().login_rate_limit)
 
     except RateLimitException as exc:
         # Must return a response (no exception leak)
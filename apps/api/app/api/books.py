@@ -1,9 +1,11 @@
+from app.request_context import get_request_id
 from app.middleware.error_handlers import error_response
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
 from fastapi.responses import FileResponse
-from app.storage.file_manager import FileManager
-from app.services.book_ocr_service import BookOCRService
-from app.services.book_export_service import BookExportService
+from app.services.container import get_services
+from app.services.usage_tracker import usage_scope
+from app.observability.metrics import OCR_PAGES
+from app.observability.timing import stage
 from app.models.schemas import ChapterUploadResponse, ChapterListResponse, ChapterData
 from app.auth import require_admin, require_auth
 from datetime import datetime
@@ -19,14 +21,10 @@ from app.auth import require_auth
 router = APIRouter(
     dependencies=[Depends(require_auth)]
 )
-file_manager = FileManager()
-_ocr_service = None
+file_manager = get_services().file_manager
 def get_ocr_service():
-    global _ocr_service
-    if _ocr_service is None:
-        _ocr_service = BookOCRService()
-    return _ocr_service
-export_service = BookExportService()
+    return get_services().book_ocr_service
+export_service = get_services().book_export_service
 
 
 @router.post("/upload", response_model=ChapterUploadResponse)
@@ -40,24 +38,35 @@ async def upload_chapter(
     chapter_id = str(uuid.uuid4())
     
     # Save all uploaded pages
-    saved_paths = await file_manager.save_chapter_pages(chapter_id, files)
+    with stage("upload_save"):
+        saved_paths = await file_manager.save_chapter_pages(chapter_id, files)
     
+    with usage_scope("/api/book/upload", chapter_id):
+        return await process_chapter_upload(chapter_id, chapter_name, [str(p) for p in saved_paths])
+
+
+async def process_chapter_upload(chapter_id: str, chapter_name: str, page_paths: list[str]) -> ChapterUploadResponse:
+    """OCR the saved pages, save chapter.json and render the DOCX (shared by /upload and the job queue)."""
+    OCR_PAGES.labels("book").observe(len(page_paths))
     # Transcribe all pages in order
-    transcribed_text = await get_ocr_service().transcribe_pages([str(p) for p in saved_paths])
+    with stage("ocr"):
+        transcribed_text = await get_ocr_service().transcribe_pages(page_paths, tenant=chapter_id)
     
     # Save chapter data
-    await file_manager.save_chapter_data(chapter_id, chapter_name, transcribed_text, len(files))
+    with stage("save"):
+        await file_manager.save_chapter_data(chapter_id, chapter_name, transcribed_text, len(page_paths))
     
     # Generate Word document
-    chapter_dir = file_manager.books_dir / chapter_id
+    chapter_dir = file_manager.chapter_dir(chapter_id)
     docx_path = chapter_dir / f"{chapter_name}.docx"
-    export_service.export_chapter(chapter_name, transcribed_text, docx_path)
+    with stage("docx_export"):
+        export_service.export_chapter(chapter_name, transcribed_text, docx_path)
     
     return ChapterUploadResponse(
         chapter_id=chapter_id,
         chapter_name=chapter_name,
         transcribed_text=transcribed_text,
-        page_count=len(files),
+        page_count=len(page_paths),
         status="success"
     )
 
@@ -74,10 +83,7 @@ async def list_chapters(auth_level: str = Depends(require_admin)):
     if not books_dir.exists():
         return ChapterListResponse(chapters=[], total=0)
     
-    for chapter_dir in sorted(books_dir.iterdir(), key=lambda x: x.stat().st_mtime, reverse=True):
-        if not chapter_dir.is_dir():
-            continue
-        
+    for chapter_dir in sorted(file_manager.iter_chapter_dirs(), key=lambda x: x.stat().st_mtime, reverse=True):
         chapter_file = chapter_dir / "chapter.json"
         if not chapter_file.exists():
             continue
@@ -113,20 +119,9 @@ from app.auth import require_auth
 async def download_chapter(chapter_id: str):
     """Download chapter as Word document"""
     
-    chapter_dir = file_manager.books_dir / chapter_id
-    
-    request_id = None
-    try:
-        from fastapi import Request as _Request
-        import inspect
-        frame = inspect.currentframe()
-        while frame:
-            if "request" in frame.f_locals and isinstance(frame.f_locals["request"], _Request):
-                request_id = getattr(frame.f_locals["request"].state, "request_id", None)
-                break
-            frame = frame.f_back
-    except Exception:
-        pass
+    chapter_dir = file_manager.chapter_dir(chapter_id)
+    
+    request_id = get_request_id()
     if not chapter_dir.exists():
         return error_response("not_found", "Chapter not found", request_id, 404)
     
@@ -149,20 +144,9 @@ async def download_chapter(chapter_id: str):
 async def delete_chapter(chapter_id: str, auth_level: str = Depends(require_admin)):
     """Delete a chapter"""
     
-    chapter_dir = file_manager.books_dir / chapter_id
-    
-    request_id = None
-    try:
-        from fastapi import Request as _Request
-        import inspect
-        frame = inspect.currentframe()
-        while frame:
-            if "request" in frame.f_locals and isinstance(frame.f_locals["request"], _Request):
-                request_id = getattr(frame.f_locals["request"].state, "request_id", None)
-                break
-            frame = frame.f_back
-    except Exception:
-        pass
+    chapter_dir = file_manager.chapter_dir(chapter_id)
+    
+    request_id = get_request_id()
     if not chapter_dir.exists():
         return error_response("not_found", "Chapter not found", request_id, 404)
     
@@ -1,6 +1,7 @@
+from app.request_context import get_request_id
 from app.middleware.error_handlers import error_response
 from fastapi import APIRouter, Depends
-from app.storage.file_manager import FileManager
+from app.services.container import get_services
 from app.models.schemas import ProposalListResponse, ProposalSummary
 from app.auth import require_admin
 from pathlib import Path
@@ -14,7 +15,7 @@ from app.auth import require_auth
 router = APIRouter(
     dependencies=[Depends(require_auth)]
 )
-file_manager = FileManager()
+file_manager = get_services().file_manager
 
 
 from fastapi import Depends
@@ -31,9 +32,7 @@ async def list_proposals(auth_level: str = Depends(require_admin)):
     if not sessions_dir.exists():
         return ProposalListResponse(proposals=[], total=0)
     
-    for session_dir in sorted(sessions_dir.iterdir(), key=lambda x: x.stat().st_mtime, reverse=True):
-        if not session_dir.is_dir():
-            continue
+    for session_dir in sorted(file_manager.iter_session_dirs(), key=lambda x: x.stat().st_mtime, reverse=True):
         
         proposal_file = session_dir / "proposal.json"
         if not proposal_file.exists():
@@ -76,18 +75,7 @@ async def get_proposal(session_id: str, auth_level: str = Depends(require_admin)
     
     proposal_data = await file_manager.load_proposal(session_id)
     
-    request_id = None
-    try:
-        from fastapi import Request as _Request
-        import inspect
-        frame = inspect.currentframe()
-        while frame:
-            if "request" in frame.f_locals and isinstance(frame.f_locals["request"], _Request):
-                request_id = getattr(frame.f_locals["request"].state, "request_id", None)
-                break
-            frame = frame.f_back
-    except Exception:
-        pass
+    request_id = get_request_id()
     if not proposal_data:
         return error_response("not_found", "Proposal not found", request_id, 404)
     
@@ -101,20 +89,9 @@ async def get_proposal(session_id: str, auth_level: str = Depends(require_admin)
 async def delete_proposal(session_id: str, auth_level: str = Depends(require_admin)):
     """Delete a proposal"""
     
-    session_dir = file_manager.sessions_dir / session_id
+    session_dir = file_manager.session_dir(session_id)
     
-    request_id = None
-    try:
-        from fastapi import Request as _Request
-        import inspect
-        frame = inspect.currentframe()
-        while frame:
-            if "request" in frame.f_locals and isinstance(frame.f_locals["request"], _Request):
-                request_id = getattr(frame.f_locals["request"].state, "request_id", None)
-                break
-            frame = frame.f_back
-    except Exception:
-        pass
+    request_id = get_request_id()
     if not session_dir.exists():
         return error_response("not_found", "Proposal not found", request_id, 404)
     
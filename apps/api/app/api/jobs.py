@@ -0,0 +1,185 @@
+import asyncio
+import json
+import uuid
+
+from fastapi import APIRouter, Depends, File, Form, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.api import books, proposals
+from app.auth import require_auth
+from app.middleware.error_handlers import error_response
+from app.models.schemas import ProposalRequest, ProposalResponse
+from app.services.job_queue import TERMINAL, JobFailed, get_job_queue, job_handler
+from app.services.usage_tracker import usage_scope
+
+router = APIRouter(
+    dependencies=[Depends(require_auth)]
+)
+
+# How often /events re-reads the job row while waiting for a change
+EVENTS_POLL_SECONDS = 0.5
+
+
+@job_handler("generate")
+async def run_generate_job(payload: dict) -> dict:
+    request = ProposalRequest.model_validate(payload["request"])
+    request_id = payload.get("request_id")
+    response_headers = {}
+    with usage_scope("/api/jobs/generate", request.session_id):
+        result = await proposals.generate_document(
+            request,
+            request_id,
+            response_headers,
+            use_cache=payload.get("use_cache", True),
+            # Upstream failures go to the queue's retry path instead of becoming a terminal 503
+            raise_upstream_failures=True,
+        )
+    if not isinstance(result, ProposalResponse):
+        body = json.loads(result.body)
+        raise JobFailed(body.get("error_code", "INTERNAL_ERROR"), body.get("message", "Proposal generation failed."), result.status_code)
+    return {**result.model_dump(mode="json"), "ai_doc": response_headers.get("X-AI-DOC")}
+
+
+@job_handler("book_upload")
+async def run_book_upload_job(payload: dict) -> dict:
+    with usage_scope("/api/jobs/book/upload", payload["chapter_id"]):
+        result = await books.process_chapter_upload(payload["chapter_id"], payload["chapter_name"], payload["page_paths"])
+    return result.model_dump(mode="json")
+
+
+def _request_id(request: Request):
+    return getattr(request.state, "request_id", None) or request.headers.get("x-request-id")
+
+
+def _job_view(job: dict) -> dict:
+    """Public shape of a job row (payload and result are served separately)."""
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"] if job["status"] == "failed" else None,
+        "status_url": f"/api/jobs/{job['id']}",
+        "result_url": f"/api/jobs/{job['id']}/result",
+        "events_url": f"/api/jobs/{job['id']}/events",
+    }
+
+
+def _jobs_disabled(request_id):
+    return error_response("JOBS_DISABLED", "Background jobs are disabled.", request_id, 503)
+
+
+async def _submit(kind: str, payload: dict) -> JSONResponse:
+    job = await get_job_queue().submit(kind, payload)
+    return JSONResponse(_job_view(job), status_code=202, headers={"Location": f"/api/jobs/{job['id']}"})
+
+
+@router.post("/generate", status_code=202)
+async def submit_generate(payload: ProposalRequest, request: Request):
+    """Queue /api/proposals/generate work; returns 202 with the job id immediately."""
+    request_id = _request_id(request)
+    if get_job_queue() is None:
+        return _jobs_disabled(request_id)
+    limited = await proposals.check_generate_rate_limit(request, request_id)
+    if limited is not None:
+        return limited
+    return await _submit("generate", {
+        "request": payload.model_dump(mode="json"),
+        "request_id": request_id,
+        "use_cache": not proposals.cache_bypassed(request),
+    })
+
+
+@router.post("/book/upload", status_code=202)
+async def submit_book_upload(
+    request: Request,
+    chapter_name: str = Form(...),
+    files: list[UploadFile] = File(...),
+):
+    """Save the chapter pages now and queue OCR + DOCX export; returns 202 with the job id."""
+    if get_job_queue() is None:
+        return _jobs_disabled(_request_id(request))
+    chapter_id = str(uuid.uuid4())
+    saved_paths = await books.file_manager.save_chapter_pages(chapter_id, files)
+    return await _submit("book_upload", {
+        "chapter_id": chapter_id,
+        "chapter_name": chapter_name,
+        "page_paths": [str(p) for p in saved_paths],
+    })
+
+
+async def _load_job(job_id: str, request_id):
+    queue = get_job_queue()
+    if queue is None:
+        return None, _jobs_disabled(request_id)
+    job = await queue.get(job_id)
+    if job is None:
+        return None, error_response("NOT_FOUND", "Job not found", request_id, 404)
+    return job, None
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, request: Request):
+    job, failure = await _load_job(job_id, _request_id(request))
+    if failure is not None:
+        return failure
+    return _job_view(job)
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str, request: Request):
+    """200 with the result once succeeded, 202 with the job status while pending, the job's error once failed."""
+    request_id = _request_id(request)
+    job, failure = await _load_job(job_id, request_id)
+    if failure is not None:
+        return failure
+    if job["status"] == "succeeded":
+        return job["result"]
+    if job["status"] == "failed":
+        error = job["error"] or {}
+        return error_response(
+            error.get("error_code", "INTERNAL_ERROR"),
+            error.get("message", "Job failed."),
+            request_id,
+            error.get("status_code", 500),
+        )
+    return JSONResponse(_job_view(job), status_code=202, headers={"Retry-After": "1"})
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """SSE feed of status changes; ends with `result` or `error` once the job finishes."""
+    job, failure = await _load_job(job_id, _request_id(request))
+    if failure is not None:
+        return failure
+    queue = get_job_queue()
+
+    def sse(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def events():
+        current = job
+        last_status = None
+        while True:
+            if current["status"] != last_status:
+                last_status = current["status"]
+                yield sse("status", _job_view(current))
+            if current["status"] in TERMINAL:
+                if current["status"] == "succeeded":
+                    yield sse("result", current["result"])
+                else:
+                    yield sse("error", current["error"] or {})
+                return
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(EVENTS_POLL_SECONDS)
+            current = await queue.get(job_id) or current
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import Response
+from app.auth import require_admin, require_auth
+from app.middleware.idempotency import get_idempotency_store
+from app.middleware.error_handlers import error_response
+from app.observability import tracing
+from app.observability.metrics import CONTENT_TYPE, REGISTRY
+from app.request_context import get_request_id
+from app.services.formatting_service import schema_win_stats
+from app.services.openai_guard import get_openai_guard
+from app.services.openai_scheduler import get_openai_scheduler
+from app.services.response_cache import get_response_cache
+from app.services.single_flight import get_single_flight
+from app.services.usage_tracker import get_usage_tracker
+
+router = APIRouter(
+    dependencies=[Depends(require_auth)]
+)
+# Mounted at /metrics for Prometheus scrapers (bearer auth with the admin password)
+exposition_router = APIRouter(
+    dependencies=[Depends(require_auth)]
+)
+
+
+@router.get("", dependencies=[Depends(require_admin)])
+async def get_metrics(request: Request):
+    """Operational snapshot: OpenAI breaker/timeouts/retry budget, scheduler queues, generate_doc schema wins, response cache, single-flight, retention, idempotency, job queue, tracing."""
+    retention_worker = getattr(request.app.state, "retention_worker", None)
+    return {
+        "openai_guard": get_openai_guard().snapshot(),
+        "openai_scheduler": get_openai_scheduler().stats(),
+        "generate_doc_schemas": schema_win_stats.snapshot(),
+        "response_cache": cache.stats() if (cache := get_response_cache()) is not None else None,
+        "retention": retention_worker.snapshot() if retention_worker is not None else None,
+        "single_flight": get_single_flight().stats(),
+        "idempotency": get_idempotency_store().stats(),
+        "jobs": job_queue.snapshot() if (job_queue := getattr(request.app.state, "job_queue", None)) is not None else None,
+        "tracing": tracer.stats() if (tracer := tracing.get_tracer()) is not None else None,
+    }
+
+
+@router.get("/usage", dependencies=[Depends(require_admin)])
+async def get_usage_report(top_sessions: int = 20):
+    """OpenAI token usage and estimated cost per operation, route and session, with prompt-cache savings."""
+    return get_usage_tracker().report(top_sessions=max(0, min(top_sessions, 200)))
+
+
+@router.get("/traces", dependencies=[Depends(require_admin)])
+async def get_slowest_traces(limit: int = 10):
+    """Slowest recent traces, each with the critical path of spans that set its latency."""
+    tracer = tracing.get_tracer()
+    return {"traces": tracer.slowest(limit=max(1, min(limit, 100))) if tracer is not None else []}
+
+
+@router.get("/traces/{trace_id}", dependencies=[Depends(require_admin)])
+async def get_trace(trace_id: str):
+    """Spans of one recent trace; accepts the trace id or the request's X-Request-ID."""
+    tracer = tracing.get_tracer()
+    spans = None
+    if tracer is not None:
+        spans = tracer.trace(trace_id) or tracer.trace(tracing.trace_id_for(trace_id))
+    if not spans:
+        return error_response("NOT_FOUND", "Trace not found", get_request_id(), 404)
+    spans.sort(key=lambda s: s.start_ns)
+    return {
+        "trace_id": spans[0].trace_id,
+        "critical_path": tracing.critical_path(spans),
+        "spans": [s.summary() for s in spans],
+    }
+
+
+@exposition_router.get("", dependencies=[Depends(require_admin)], include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text exposition of request, OpenAI, OCR, PDF, storage and rate-limit metrics."""
+    return Response(REGISTRY.expose(), media_type=CONTENT_TYPE)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import FileResponse
+
+from app.auth import require_admin
+from app.middleware.error_handlers import error_response
+from app.observability.profiling import get_profile_store
+from app.request_context import get_request_id
+
+router = APIRouter(
+    dependencies=[Depends(require_admin)]
+)
+
+
+@router.get("")
+async def list_profiles(limit: int = 50):
+    """Stored request profiles (newest first): request, trigger, duration and sample count."""
+    return {"profiles": get_profile_store().list()[:max(1, min(limit, 500))]}
+
+
+@router.get("/{profile_id}")
+async def download_profile(profile_id: str):
+    """Folded stacks for flamegraph.pl / inferno / speedscope."""
+    path = get_profile_store().folded_path(profile_id)
+    if path is None:
+        return error_response("NOT_FOUND", "Profile not found", get_request_id(), 404)
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=f"{profile_id}.folded")
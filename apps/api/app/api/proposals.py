@@ -1,21 +1,25 @@
+import json
+import os
+import re
+
 from fastapi import APIRouter, HTTPException, Depends, Request, Response
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from app.middleware.error_handlers import error_response
 from app.auth import require_auth
-from app.services.formatting_service import FormattingService
-from app.services.export_service import ExportService
+from app.services.container import get_services
 from app.models.schemas import ProposalRequest, ProposalResponse, ProposalData
 
 from app.services.openai_guard import OpenAIFailure
+from app.services.usage_tracker import usage_scope
 from app.errors import StandardizedAIError
 from pydantic import ValidationError
-from app.storage.file_manager import FileManager
 from app.api.logging_config import logger
-from app.security.rate_limit import RateLimiter
+from app.security.rate_limit import get_rate_limiter
+from app.models import config
+from app.observability.timing import stage
 
-export_service = ExportService()
-file_manager = FileManager()
-rate_limiter = RateLimiter()
+export_service = get_services().export_service
+file_manager = get_services().file_manager
 
 router = APIRouter(
     dependencies=[Depends(require_auth)]
@@ -26,9 +30,10 @@ async def download_proposal(session_id: str, request: Request):
     request_id = getattr(request.state, "request_id", None) or request.headers.get("x-request-id")
 
     # Try expected PDF locations (proposal first, then invoice)
-    pdf_path = file_manager.sessions_dir / session_id / "proposal.pdf"
+    session_dir = file_manager.session_dir(session_id)
+    pdf_path = session_dir / "proposal.pdf"
     if not pdf_path.exists():
-        alt = file_manager.sessions_dir / session_id / "invoice.pdf"
+        alt = session_dir / "invoice.pdf"
         pdf_path = alt if alt.exists() else pdf_path
 
     if not pdf_path.exists():
@@ -61,16 +66,14 @@ async def download_proposal(session_id: str, request: Request):
         filename=f"MPH_Document_{session_id[:8]}.pdf",
     )
 
-_formatting_service = None
-def get_formatting_service():
-    global _formatting_service
-    if _formatting_service is None:
-        _formatting_service = FormattingService()
-    return _formatting_service
+def cache_bypassed(request: Request) -> bool:
+    """`X-Cache-Bypass: 1` or `Cache-Control: no-cache` forces fresh model calls."""
+    if request.headers.get("x-cache-bypass", "").strip().lower() in ("1", "true", "yes"):
+        return True
+    return "no-cache" in request.headers.get("cache-control", "").lower()
 
-export_service = ExportService()
-file_manager = FileManager()
-rate_limiter = RateLimiter()
+def get_formatting_service():
+    return get_services().formatting_service
 
 
 
@@ -78,40 +81,295 @@ rate_limiter = RateLimiter()
 @router.post("/generate", response_model=ProposalResponse)
 async def generate_proposal(payload: ProposalRequest, request: Request, response: Response):
     """Convert transcribed text to professional proposal or invoice"""
-    import os
-    aidoc_strict = os.environ.get("AIDOC_STRICT", "0") == "1"
     request_id = getattr(request.state, "request_id", None) or request.headers.get("x-request-id")
 
-    structuring_ok = False
-    used_aidoc_fallback = False
     try:
         # Rate limit check (after validation/auth, before any side effects)
-        xff = request.headers.get("x-forwarded-for")
-        ip = xff.split(",")[0].strip() if xff else (request.client.host if request.client else "127.0.0.1")
-        try:
-            rate_limiter.check(ip, "generate", 3)
-        except Exception:
-            return error_response(
-                error_code="RATE_LIMITED",
-                message="Rate limit exceeded.",
-                request_id=request_id,
-                status_code=429,
+        limited = await check_generate_rate_limit(request, request_id)
+        if limited is not None:
+            return limited
+
+        response_headers = {}
+        with usage_scope("/api/proposals/generate", payload.session_id):
+            result = await generate_document(
+                payload,
+                request_id,
+                response_headers,
+                use_cache=not cache_bypassed(request),
             )
+        response.headers.update(response_headers)
+        return result
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception(
+            "proposal_generate_unhandled_error",
+            extra={"request_id": getattr(request.state, "request_id", None)},
+        )
+        return error_response(
+            error_code="INTERNAL_ERROR",
+            message="Proposal generation failed.",
+            request_id=getattr(request.state, "request_id", None),
+            status_code=500,
+        )
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _failure_event(result, request_id) -> str:
+    """SSE error event carrying the same error_code/message as the JSON error body."""
+    try:
+        body = json.loads(result.body)
+    except Exception:
+        body = {}
+    return _sse_event("error", {
+        "error_code": body.get("error_code", "INTERNAL_ERROR"),
+        "message": body.get("message", "Proposal generation failed."),
+        "request_id": request_id,
+    })
+
+
+@router.post("/generate/stream")
+async def generate_proposal_stream(payload: ProposalRequest, request: Request):
+    """
+    Same pipeline as /generate, but the professional text is streamed as SSE
+    `token` events while GPT-4o writes it; structuring, save and PDF export run
+    once the text is complete and the final ProposalResponse arrives as `done`.
+    Errors after the stream has started are reported as an `error` event.
+    """
+    request_id = getattr(request.state, "request_id", None) or request.headers.get("x-request-id")
+    limited = await check_generate_rate_limit(request, request_id)
+    if limited is not None:
+        return limited
+    use_cache = not cache_bypassed(request)
+
+    async def events():
+        yield _sse_event("start", {"session_id": payload.session_id, "request_id": request_id})
+        # Entered inside the generator: the handler's context is gone once streaming starts
+        with usage_scope("/api/proposals/generate/stream", payload.session_id):
+            try:
+                professional_text = None
+                if os.environ.get("OPENAI_API_KEY"):
+                    parts = []
+                    async for delta in get_formatting_service().stream_rewrite_professional(payload.raw_text, use_cache=use_cache):
+                        parts.append(delta)
+                        yield _sse_event("token", {"text": delta})
+                    professional_text = "".join(parts).strip()
+                    logger.info(f"[stream_rewrite_professional] session_id={payload.session_id} done")
+
+                response_headers = {}
+                result = await generate_document(
+                    payload,
+                    request_id,
+                    response_headers,
+                    use_cache=use_cache,
+                    professional_text=professional_text,
+                )
+                if not isinstance(result, ProposalResponse):
+                    yield _failure_event(result, request_id)
+                    return
+                if professional_text is None:
+                    # Stub mode: nothing was streamed, send the whole text as one token
+                    yield _sse_event("token", {"text": result.professional_text})
+                done = result.model_dump(mode="json")
+                done["ai_doc"] = response_headers.get("X-AI-DOC")
+                yield _sse_event("done", done)
+            except OpenAIFailure as e:
+                yield _sse_event("error", {
+                    "error_code": getattr(e, "code", "AI_UPSTREAM_UNAVAILABLE"),
+                    "message": "Proposal generation is temporarily unavailable. Please retry.",
+                    "request_id": request_id,
+                })
+            except Exception:
+                logger.exception("proposal_generate_stream_unhandled_error", extra={"request_id": request_id})
+                yield _sse_event("error", {
+                    "error_code": "INTERNAL_ERROR",
+                    "message": "Proposal generation failed.",
+                    "request_id": request_id,
+                })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
+async def check_generate_rate_limit(request: Request, request_id):
+    """429 error response when the client is over the generate rate limit, else None."""
+    xff = request.headers.get("x-forwarded-for")
+    ip = xff.split(",")[0].strip() if xff else (request.client.host if request.client else "127.0.0.1")
+    try:
+        await get_rate_limiter().acheck(ip, "generate", config.get_settings().generate_rate_limit)
+    except Exception:
+        return error_response(
+            error_code="RATE_LIMITED",
+            message="Rate limit exceeded.",
+            request_id=request_id,
+            status_code=429,
+        )
+    return None
+
+
+# Fallback header parser patterns (compiled once per process)
+_STREET_RE = re.compile(r"\b(Pl|Place|St|Street|Ave|Avenue|Rd|Road|Dr|Drive|Way|Ln|Lane|Blvd|Boulevard|Ct|Court|Cir|Circle|Pkwy|Parkway|Ter|Terrace)\b", re.IGNORECASE)
+_SCOPE_RE = re.compile(r"\b(demo|demolition|install|prep|paint|height|labor|material|tile|drywall|electrical|plumbing|pickup|box|ceiling|trim|cabinet|flooring|base\s*shoe|bondo|caulk)\b", re.IGNORECASE)
+
+
+def parse_fallback_header(raw_text: str):
+    """
+    (client name, address) guessed from the first lines of the raw notes, used
+    when AI structuring failed. The name is the first short line that is not a
+    page marker, document title or bullet; the address is the next line that
+    looks like a street address. Either may be None.
+    """
+    lines = [ln.strip() for ln in raw_text.splitlines() if ln.strip()]
+    # Remove leading page markers (e.g. --- Page ...)
+    i = 0
+    while i < len(lines):
+        if re.match(r"^---\s*Page\b", lines[i], re.IGNORECASE):
+            del lines[i]
+            # Remove following blank if present
+            if i < len(lines) and not lines[i]:
+                del lines[i]
+        else:
+            break
+    head = lines[:20]
+    name_candidate = None
+    addr_candidate = None
+    # Find name_candidate
+    for idx, line in enumerate(head):
+        if len(line) > 60:
+            continue
+        if not re.search(r"[a-zA-Z]", line):
+            continue
+        if re.search(r"invoice|proposal", line, re.IGNORECASE):
+            continue
+        if line.lstrip().startswith('-'):
+            continue
+        name_candidate = line
+        # Find addr_candidate as next line after name_candidate
+        for j in range(idx+1, len(head)):
+            addr_line = head[j]
+            # Must not be digits-only
+            if re.fullmatch(r"\d+", addr_line):
+                continue
+            # Reject scope-like, ~, @, or dash lines
+            if _SCOPE_RE.search(addr_line):
+                continue
+            if "~" in addr_line or "@" in addr_line:
+                continue
+            if addr_line.lstrip().startswith('-'):
+                continue
+            # Require address-like: starts with number+space or has street suffix
+            addr_like = bool(re.match(r"^\d{1,6}\s+\S+", addr_line)) or bool(_STREET_RE.search(addr_line))
+            if not addr_like:
+                continue
+            addr_candidate = addr_line
+            break
+        break
+    return name_candidate, addr_candidate
+
+
+async def generate_document(payload: ProposalRequest, request_id, response_headers: dict, *, use_cache: bool = True, professional_text=None, raise_upstream_failures: bool = False):
+    """
+    Generate pipeline shared by /generate and /generate/stream: rewrite (unless
+    `professional_text` is given), structure, fall back on schema failures, save
+    and export the PDF. Returns a ProposalResponse or an error JSONResponse;
+    headers to set on the response (X-AI-DOC) are written into `response_headers`.
+    With `raise_upstream_failures` (background jobs), OpenAIFailure propagates
+    instead of becoming a 503 so the caller can retry it.
+    """
+    import os
+    aidoc_strict = os.environ.get("AIDOC_STRICT", "0") == "1"
+    structuring_ok = False
+    used_aidoc_fallback = False
+
+    document_type = getattr(payload, "document_type", "proposal")
+    client_name = (getattr(payload, "client_name", None) or "").strip() or None
+    address = (getattr(payload, "address", None) or "").strip() or None
+    # Log raw text and payload client info before any OpenAI calls
+    if globals().get("DEBUG", False):
+        logger.info(f"RAW_TEXT_PREVIEW_TOP: {repr(payload.raw_text[:500])}")
+        logger.info(f"PAYLOAD client_name={repr(client_name)} address={repr(address)}")
+
+    # Stub mode when OPENAI_API_KEY is missing (local/dev)
+    if not os.environ.get("OPENAI_API_KEY"):
+        professional_text = (
+            f"{document_type.upper()} (STUB)\n\n"
+            f"Session: {payload.session_id}\n\n"
+            f"{payload.raw_text}".strip()
+        )
+        proposal_data = {
+            "document_type": document_type,
+            "session_id": payload.session_id,
+            "sections": [{"title": "Scope", "items": [payload.raw_text]}],
+        }
+        if client_name:
+            proposal_data["client_name"] = client_name
+        if address:
+            proposal_data["project_address"] = address
+        logger.info(f"[stub_generate] session_id={payload.session_id} done")
+    else:
+        try:
+            if professional_text is not None:
+                # Text already produced (e.g. streamed to the client): only structure it
+                with stage("structure"):
+                    proposal_data = await get_formatting_service().structure_proposal(
+                        professional_text, document_type=document_type, use_cache=use_cache
+                    )
+            elif config.get_settings().GENERATE_SINGLE_CALL:
+                # One structured-output call yields both the text and the ProposalData fields
+                with stage("single_call"):
+                    professional_text, proposal_data = await get_formatting_service().generate_proposal_single_call(
+                        payload.raw_text, document_type=document_type, use_cache=use_cache
+                    )
+                logger.info(f"[generate_proposal_single_call] session_id={payload.session_id} done")
+            else:
+                with stage("rewrite"):
+                    professional_text = await get_formatting_service().rewrite_professional(payload.raw_text, use_cache=use_cache)
+                logger.info(f"[rewrite_professional] session_id={payload.session_id} done")
+                # TEMP LOG: professional_text type and first 800 chars
+                logger.info(f"professional_text type: {type(professional_text)}")
+                logger.info(f"professional_text preview: {repr(professional_text[:800])}")
 
-        document_type = getattr(payload, "document_type", "proposal")
-        client_name = (getattr(payload, "client_name", None) or "").strip() or None
-        address = (getattr(payload, "address", None) or "").strip() or None
-        # Log raw text and payload client info before any OpenAI calls
-        if globals().get("DEBUG", False):
-            logger.info(f"RAW_TEXT_PREVIEW_TOP: {repr(payload.raw_text[:500])}")
-            logger.info(f"PAYLOAD client_name={repr(client_name)} address={repr(address)}")
+                with stage("structure"):
+                    proposal_data = await get_formatting_service().structure_proposal(
+                        professional_text, document_type=document_type, use_cache=use_cache
+                    )
+            structuring_ok = True
+            # TEMP LOG: client_name, project_address, keys
+            logger.info(f"proposal_data client_name: {proposal_data.get('client_name')}")
+            logger.info(f"proposal_data project_address: {proposal_data.get('project_address')}")
+            logger.info(f"proposal_data keys: {list(proposal_data.keys())}")
 
-        # Stub mode when OPENAI_API_KEY is missing (local/dev)
-        if not os.environ.get("OPENAI_API_KEY"):
-            professional_text = (
-                f"{document_type.upper()} (STUB)\n\n"
+            if client_name:
+                proposal_data["client_name"] = client_name
+            if address:
+                proposal_data["project_address"] = address
+            logger.info(f"[structure_proposal] session_id={payload.session_id} done")
+        except StandardizedAIError as e:
+            # Fallback for AiDocV1/schema validation failure
+            if aidoc_strict:
+                return error_response(
+                    error_code=getattr(e, "code", "AI_SCHEMA_VALIDATION_FAILED"),
+                    message=str(e),
+                    request_id=request_id,
+                    status_code=503,
+                )
+            # Non-strict: fallback ProposalData, set header
+            used_aidoc_fallback = True
+            logger.info(
+                "aidoc_fallback",
+                extra={
+                    "request_id": request_id,
+                    "session_id": payload.session_id,
+                },
+            )
+            professional_text = professional_text if professional_text is not None else (
+                f"{document_type.upper()} (FALLBACK)\n\n"
                 f"Session: {payload.session_id}\n\n"
                 f"{payload.raw_text}".strip()
             )
@@ -120,245 +378,132 @@ async def generate_proposal(payload: ProposalRequest, request: Request, response
                 "session_id": payload.session_id,
                 "sections": [{"title": "Scope", "items": [payload.raw_text]}],
             }
+            # Deterministic header parse for client_name and address from raw_text
+            if not client_name or not address:
+                name_candidate, addr_candidate = parse_fallback_header(payload.raw_text)
+                if not client_name and name_candidate:
+                    proposal_data["client_name"] = name_candidate
+                if not address and addr_candidate:
+                    proposal_data["project_address"] = addr_candidate
             if client_name:
                 proposal_data["client_name"] = client_name
             if address:
                 proposal_data["project_address"] = address
-            logger.info(f"[stub_generate] session_id={payload.session_id} done")
-        else:
-            try:
-                professional_text = await get_formatting_service().rewrite_professional(payload.raw_text)
-                logger.info(f"[rewrite_professional] session_id={payload.session_id} done")
-                # TEMP LOG: professional_text type and first 800 chars
-                logger.info(f"professional_text type: {type(professional_text)}")
-                logger.info(f"professional_text preview: {repr(professional_text[:800])}")
-
-                proposal_data = await get_formatting_service().structure_proposal(
-                    professional_text, document_type=document_type
-                )
-                structuring_ok = True
-                # TEMP LOG: client_name, project_address, keys
-                logger.info(f"proposal_data client_name: {proposal_data.get('client_name')}")
-                logger.info(f"proposal_data project_address: {proposal_data.get('project_address')}")
-                logger.info(f"proposal_data keys: {list(proposal_data.keys())}")
-
-                if client_name:
-                    proposal_data["client_name"] = client_name
-                if address:
-                    proposal_data["project_address"] = address
-                logger.info(f"[structure_proposal] session_id={payload.session_id} done")
-            except StandardizedAIError as e:
-                # Fallback for AiDocV1/schema validation failure
-                if aidoc_strict:
-                    return error_response(
-                        error_code=getattr(e, "code", "AI_SCHEMA_VALIDATION_FAILED"),
-                        message=str(e),
-                        request_id=request_id,
-                        status_code=503,
-                    )
-                # Non-strict: fallback ProposalData, set header
-                used_aidoc_fallback = True
-                logger.info(
-                    "aidoc_fallback",
-                    extra={
-                        "request_id": request_id,
-                        "session_id": payload.session_id,
-                    },
-                )
-                professional_text = professional_text if 'professional_text' in locals() else (
-                    f"{document_type.upper()} (FALLBACK)\n\n"
-                    f"Session: {payload.session_id}\n\n"
-                    f"{payload.raw_text}".strip()
-                )
-                proposal_data = {
-                    "document_type": document_type,
-                    "session_id": payload.session_id,
-                    "sections": [{"title": "Scope", "items": [payload.raw_text]}],
-                }
-                # Deterministic header parse for client_name and address from raw_text
-                if not client_name or not address:
-                    import re
-                    lines = [ln.strip() for ln in payload.raw_text.splitlines() if ln.strip()]
-                    # Remove leading page markers (e.g. --- Page ...)
-                    i = 0
-                    while i < len(lines):
-                        if re.match(r"^---\s*Page\b", lines[i], re.IGNORECASE):
-                            del lines[i]
-                            # Remove following blank if present
-                            if i < len(lines) and not lines[i]:
-                                del lines[i]
-                        else:
-                            break
-                    head = lines[:20]
-                    name_candidate = None
-                    addr_candidate = None
-                    # Compile regexes once
-                    street_re = re.compile(r"\b(Pl|Place|St|Street|Ave|Avenue|Rd|Road|Dr|Drive|Way|Ln|Lane|Blvd|Boulevard|Ct|Court|Cir|Circle|Pkwy|Parkway|Ter|Terrace)\b", re.IGNORECASE)
-                    scope_re = re.compile(r"\b(demo|demolition|install|prep|paint|height|labor|material|tile|drywall|electrical|plumbing|pickup|box|ceiling|trim|cabinet|flooring|base\s*shoe|bondo|caulk)\b", re.IGNORECASE)
-                    # Find name_candidate
-                    for idx, line in enumerate(head):
-                        if len(line) > 60:
-                            continue
-                        if not re.search(r"[a-zA-Z]", line):
-                            continue
-                        if re.search(r"invoice|proposal", line, re.IGNORECASE):
-                            continue
-                        if line.lstrip().startswith('-'):
-                            continue
-                        name_candidate = line
-                        # Find addr_candidate as next line after name_candidate
-                        for j in range(idx+1, len(head)):
-                            addr_line = head[j]
-                            # Must not be digits-only
-                            if re.fullmatch(r"\d+", addr_line):
-                                continue
-                            # Reject scope-like, ~, @, or dash lines
-                            if scope_re.search(addr_line):
-                                continue
-                            if "~" in addr_line or "@" in addr_line:
-                                continue
-                            if addr_line.lstrip().startswith('-'):
-                                continue
-                            # Require address-like: starts with number+space or has street suffix
-                            addr_like = bool(re.match(r"^\d{1,6}\s+\S+", addr_line)) or bool(street_re.search(addr_line))
-                            if not addr_like:
-                                continue
-                            addr_candidate = addr_line
-                            break
-                        break
-                    if not client_name and name_candidate:
-                        proposal_data["client_name"] = name_candidate
-                    if not address and addr_candidate:
-                        proposal_data["project_address"] = addr_candidate
-                if client_name:
-                    proposal_data["client_name"] = client_name
-                if address:
-                    proposal_data["project_address"] = address
+            with stage("validate"):
                 proposal_data_obj = ProposalData.model_validate(proposal_data)
+            with stage("save"):
                 await file_manager.save_proposal(payload.session_id, proposal_data_obj, document_type=document_type)
-                await export_service.export_document(payload.session_id, proposal_data_obj, professional_text, "pdf", document_type=document_type)
-                response.headers["X-AI-DOC"] = "fallback"
-                return ProposalResponse(
-                    session_id=payload.session_id,
-                    professional_text=professional_text,
-                    proposal_data=proposal_data_obj,
-                    document_data=proposal_data_obj,
-                    document_type=document_type,
-                    status="generated"
-                )
-            except OpenAIFailure as e:
-                # Map OpenAI upstream failures to HTTP 503 with deterministic error contract
-                return error_response(
-                    error_code=getattr(e, "code", "AI_UPSTREAM_UNAVAILABLE"),
-                    message="Proposal generation is temporarily unavailable. Please retry.",
-                    request_id=request_id,
-                    status_code=503,
-                )
-
-        # Validate ProposalData before returning ProposalResponse
-        try:
-            proposal_data_obj = ProposalData.model_validate(proposal_data)
-        except ValidationError:
-            return error_response(
-                error_code="PROPOSAL_SCHEMA_INVALID",
-                message="Generated proposal data was invalid. Please retry.",
+            await export_service.export_document(payload.session_id, proposal_data_obj, professional_text, "pdf", document_type=document_type)
+            response_headers["X-AI-DOC"] = "fallback"
+            return ProposalResponse(
+                session_id=payload.session_id,
+                professional_text=professional_text,
+                proposal_data=proposal_data_obj,
+                document_data=proposal_data_obj,
+                document_type=document_type,
+                status="generated"
+            )
+        except OpenAIFailure as e:
+            if raise_upstream_failures:
+                raise
+            # Map OpenAI upstream failures to HTTP 503 with deterministic error contract
+            failure_response = error_response(
+                error_code=getattr(e, "code", "AI_UPSTREAM_UNAVAILABLE"),
+                message="Proposal generation is temporarily unavailable. Please retry.",
                 request_id=request_id,
-                status_code=500,
+                status_code=503,
             )
+            if getattr(e, "retry_after", None):
+                # Circuit breaker open: tell clients when the next probe is allowed
+                failure_response.headers["Retry-After"] = str(e.retry_after)
+            return failure_response
 
-        # In fallback mode, rebuild line_items from professional_text for PDF table
-        if used_aidoc_fallback:
-            lines = [ln.strip() for ln in professional_text.splitlines() if ln.strip()]
-            new_items = []
-            parsed_total = None
-            def parse_money(val):
-                val = val.replace("$", "").replace(",", "").strip()
-                try:
-                    return float(val)
-                except Exception:
-                    return None
-            for line in lines:
-                if line.lower().startswith("total:"):
-                    money_part = line[len("total:"):].strip()
-                    parsed_val = parse_money(money_part)
-                    if parsed_val is not None:
-                        parsed_total = parsed_val
-                    continue
-                elif "—" in line and "$" in line:
-                    desc, amt = line.rsplit("—", 1)
-                    desc = desc.strip()
-                    amt = amt.strip()
-                    parsed_amt = parse_money(amt)
-                    new_items.append({"description": desc, "amount": parsed_amt})
-                else:
-                    new_items.append({"description": line, "amount": None})
-            if new_items:
-                proposal_data_obj.line_items = new_items
-            if parsed_total is not None:
-                proposal_data_obj.total = parsed_total
-
-        # Save to session with correct naming
-        await file_manager.save_proposal(payload.session_id, proposal_data_obj, document_type=document_type)
-        logger.info(f"[save_proposal] session_id={payload.session_id} done")
-
-        # Temporary debug logging before PDF rendering
-        if globals().get("DEBUG", False):
-            logger.info(f"structuring_ok={structuring_ok}")
-            logger.info(f"used_aidoc_fallback={used_aidoc_fallback}")
-            logger.info(f"ProposalData fields: client_name={getattr(proposal_data_obj, 'client_name', None)}, project_address={getattr(proposal_data_obj, 'project_address', None)}, line_items={len(getattr(proposal_data_obj, 'line_items', []) or [])}, total={getattr(proposal_data_obj, 'total', None)}")
-            logger.info("PDF DEBUG line_items: %s", proposal_data_obj.line_items)
-            logger.info("PDF DEBUG total: %s", proposal_data_obj.total)
-            logger.info("PDF DEBUG professional_text: %s", professional_text)
-
-        # Generate PDF with correct naming and header
-        format = "pdf"
-        output_path = await export_service.export_document(payload.session_id, proposal_data_obj, professional_text, format, document_type=document_type)
-        size_bytes = None
-        try:
-            size_bytes = output_path.stat().st_size
-        except Exception:
-            pass
-
-        logger.info(
-            "proposal_pdf_written",
-            extra={
-                "request_id": request_id,
-                "session_id": payload.session_id,
-                "document_type": document_type,
-                "format": format,
-                "pdf_path": str(output_path),
-                "size_bytes": size_bytes,
-            },
-        )
-        logger.info(f"[export_document] session_id={payload.session_id} done")
-
-        return ProposalResponse(
-            session_id=payload.session_id,
-            professional_text=professional_text,
-            proposal_data=proposal_data_obj,
-            document_data=proposal_data_obj,
-            document_type=document_type,
-            status="generated"
-        )
-    except HTTPException:
-        raise
-    except Exception:
-        logger.exception(
-            "proposal_generate_unhandled_error",
-            extra={"request_id": getattr(request.state, "request_id", None)},
-        )
+    # Validate ProposalData before returning ProposalResponse
+    try:
+        with stage("validate"):
+            proposal_data_obj = ProposalData.model_validate(proposal_data)
+    except ValidationError:
         return error_response(
-            error_code="INTERNAL_ERROR",
-            message="Proposal generation failed.",
-            request_id=getattr(request.state, "request_id", None),
+            error_code="PROPOSAL_SCHEMA_INVALID",
+            message="Generated proposal data was invalid. Please retry.",
+            request_id=request_id,
             status_code=500,
         )
-    # Final guard: never return None
-    return error_response(
-        error_code="INTERNAL_ERROR",
-        message="Generate failed",
-        request_id=request_id,
-        status_code=500,
+
+    # In fallback mode, rebuild line_items from professional_text for PDF table
+    if used_aidoc_fallback:
+        lines = [ln.strip() for ln in professional_text.splitlines() if ln.strip()]
+        new_items = []
+        parsed_total = None
+        def parse_money(val):
+            val = val.replace("$", "").replace(",", "").strip()
+            try:
+                return float(val)
+            except Exception:
+                return None
+        for line in lines:
+            if line.lower().startswith("total:"):
+                money_part = line[len("total:"):].strip()
+                parsed_val = parse_money(money_part)
+                if parsed_val is not None:
+                    parsed_total = parsed_val
+                continue
+            elif "—" in line and "$" in line:
+                desc, amt = line.rsplit("—", 1)
+                desc = desc.strip()
+                amt = amt.strip()
+                parsed_amt = parse_money(amt)
+                new_items.append({"description": desc, "amount": parsed_amt})
+            else:
+                new_items.append({"description": line, "amount": None})
+        if new_items:
+            proposal_data_obj.line_items = new_items
+        if parsed_total is not None:
+            proposal_data_obj.total = parsed_total
+
+    # Save to session with correct naming
+    with stage("save"):
+        await file_manager.save_proposal(payload.session_id, proposal_data_obj, document_type=document_type)
+    logger.info(f"[save_proposal] session_id={payload.session_id} done")
+
+    # Temporary debug logging before PDF rendering
+    if globals().get("DEBUG", False):
+        logger.info(f"structuring_ok={structuring_ok}")
+        logger.info(f"used_aidoc_fallback={used_aidoc_fallback}")
+        logger.info(f"ProposalData fields: client_name={getattr(proposal_data_obj, 'client_name', None)}, project_address={getattr(proposal_data_obj, 'project_address', None)}, line_items={len(getattr(proposal_data_obj, 'line_items', []) or [])}, total={getattr(proposal_data_obj, 'total', None)}")
+        logger.info("PDF DEBUG line_items: %s", proposal_data_obj.line_items)
+        logger.info("PDF DEBUG total: %s", proposal_data_obj.total)
+        logger.info("PDF DEBUG professional_text: %s", professional_text)
+
+    # Generate PDF with correct naming and header
+    format = "pdf"
+    output_path = await export_service.export_document(payload.session_id, proposal_data_obj, professional_text, format, document_type=document_type)
+    size_bytes = None
+    try:
+        size_bytes = output_path.stat().st_size
+    except Exception:
+        pass
+
+    logger.info(
+        "proposal_pdf_written",
+        extra={
+            "request_id": request_id,
+            "session_id": payload.session_id,
+            "document_type": document_type,
+            "format": format,
+            "pdf_path": str(output_path),
+            "size_bytes": size_bytes,
+        },
+    )
+    logger.info(f"[export_document] session_id={payload.session_id} done")
+
+    return ProposalResponse(
+        session_id=payload.session_id,
+        professional_text=professional_text,
+        proposal_data=proposal_data_obj,
+        document_data=proposal_data_obj,
+        document_type=document_type,
+        status="generated"
     )
 
 
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from app.request_context import get_request_id
 from app.auth import require_auth
 from app.middleware.error_handlers import error_response
-from app.services.ocr_service import OCRService
+from app.services.container import get_services
+from app.services.usage_tracker import usage_scope
+from app.observability.metrics import OCR_PAGES
+from app.observability.timing import stage
 from app.models.schemas import TranscriptionResponse
-from app.storage.file_manager import FileManager
 import uuid
 
 
@@ -14,13 +17,9 @@ from app.auth import require_auth
 router = APIRouter(
     dependencies=[Depends(require_auth)]
 )
-_ocr_service = None
 def get_ocr_service():
-    global _ocr_service
-    if _ocr_service is None:
-        _ocr_service = OCRService()
-    return _ocr_service
-file_manager = FileManager()
+    return get_services().ocr_service
+file_manager = get_services().file_manager
 
 
 from fastapi import Depends
@@ -31,18 +30,7 @@ async def transcribe_image(
     file: list[UploadFile] | None = File(None)
 ):
     """Upload handwritten image(s) and get transcription (multi-image supported)"""
-    request_id = None
-    try:
-        from fastapi import Request as _Request
-        import inspect
-        frame = inspect.currentframe()
-        while frame:
-            if "request" in frame.f_locals and isinstance(frame.f_locals["request"], _Request):
-                request_id = getattr(frame.f_locals["request"].state, "request_id", None)
-                break
-            frame = frame.f_back
-    except Exception:
-        pass
+    request_id = get_request_id()
     # Normalize input: accept both 'files' and 'file' fields (both can be lists)
     incoming = []
     if files:
@@ -78,24 +66,28 @@ async def transcribe_image(
         return error_response("invalid_file", "File(s) must be image(s)", request_id, 400)
     session_id = str(uuid.uuid4())
     image_paths = []
-    for file in incoming:
-        image_path = await file_manager.save_upload(session_id, file)
-        image_paths.append(image_path)
+    with stage("upload_save"):
+        for file in incoming:
+            image_path = await file_manager.save_upload(session_id, file)
+            image_paths.append(image_path)
     # Deterministic aggregation
     ocr_results = []
-    if len(image_paths) == 1:
-        ocr_results = [await get_ocr_service().transcribe_image(image_paths[0])]
-    else:
-        ocr_results = await get_ocr_service().transcribe_pages([str(p) for p in image_paths])
-        if not isinstance(ocr_results, list):
-            ocr_results = [ocr_results]
+    OCR_PAGES.labels("transcribe").observe(len(image_paths))
+    with usage_scope("/api/transcribe/upload", session_id), stage("ocr"):
+        if len(image_paths) == 1:
+            ocr_results = [await get_ocr_service().transcribe_image(image_paths[0])]
+        else:
+            ocr_results = await get_ocr_service().transcribe_pages([str(p) for p in image_paths])
+    if not isinstance(ocr_results, list):
+        ocr_results = [ocr_results]
     # Ensure all pages are marked
     raw_text_parts = []
     for i, img in enumerate(image_paths):
         page_text = ocr_results[i] if i < len(ocr_results) and ocr_results[i] else "(no text)"
         raw_text_parts.append(f"\n\n--- Page {i+1} ---\n\n" + page_text)
     raw_text = "".join(raw_text_parts)
-    await file_manager.save_transcription(session_id, raw_text)
+    with stage("save"):
+        await file_manager.save_transcription(session_id, raw_text)
     return TranscriptionResponse(
         session_id=session_id,
         raw_text=raw_text,
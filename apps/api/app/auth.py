@@ -2,6 +2,7 @@ import secrets
 from typing import Optional
 from fastapi import HTTPException, Header, Depends
 from app.models.config import get_settings
+from app.request_context import set_auth_level
 
 def parse_bearer_token(authorization: Optional[str]) -> str:
     """Strict Bearer token parser (case-insensitive, no extra parts, no empty token)"""
@@ -41,12 +42,13 @@ def require_auth(authorization: Optional[str] = Header(None)) -> str:
     token = parse_bearer_token(authorization)
     # Try as password first (legacy/demo)
     try:
-        return get_auth_level(token)
+        auth_level = get_auth_level(token)
     except HTTPException:
-        pass
-    # Try as access_token
-    from app.security.verify_token import verify_access_token
-    return verify_access_token(token)
+        # Try as access_token
+        from app.security.verify_token import verify_access_token
+        auth_level = verify_access_token(token)
+    set_auth_level(auth_level)
+    return auth_level
 
 from fastapi import Request
 def require_admin(request: Request):
@@ -64,4 +66,5 @@ def require_admin(request: Request):
     if auth_level != "admin":
         # Valid token, but not admin
         raise HTTPException(status_code=403, detail="Admin access required")
+    set_auth_level(auth_level)
     return auth_level
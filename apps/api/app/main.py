@@ -9,14 +9,19 @@
 #
 # Current order (outermost to innermost):
 #   1. CORS (added last, wraps all)
-#   2. RequestLoggingMiddleware
-#   3. RequestSizeLimitMiddleware
-#   4. RequestIDMiddleware
-#   5. AuthGate (function-based middleware)
+#   2. ProfilingMiddleware (profiles cover every middleware below; no-op unless PROFILING_ENABLED)
+#   3. RequestLoggingMiddleware
+#   4. AdmissionControlMiddleware (sheds overload before any request body is read)
+#   5. RequestSizeLimitMiddleware
+#   6. AuthGate (function-based middleware)
+#   7. IdempotencyMiddleware (after auth: only authenticated requests are replayed)
+#   8. RequestIDMiddleware
 #
 # Changing this order may break security, error handling, or determinism.
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from app.models.config import get_settings
 import os
 from fastapi import FastAPI, Request
@@ -27,6 +32,10 @@ from app.middleware.request_id import RequestIDMiddleware
 from app.middleware.request_logging import RequestLoggingMiddleware
 from app.models.config import get_settings
 from app.middleware.request_size_limit import RequestSizeLimitMiddleware
+from app.middleware.idempotency import IdempotencyMiddleware
+from app.middleware.admission import AdmissionControlMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.request_context import RequestContextLogFilter
 
 
 DEPLOY_FINGERPRINT = "cors-v2-20260216-1849"
@@ -52,6 +61,8 @@ class RedactAuthFilter(logging.Filter):
 
 for handler in logging.getLogger().handlers:
     handler.addFilter(RedactAuthFilter())
+    # request_id / auth_level from the request contextvar on every record
+    handler.addFilter(RequestContextLogFilter())
 
 def create_app(settings_override=None, auth_public_paths=None, auth_public_prefixes=None) -> FastAPI:
     """
@@ -64,10 +75,65 @@ def create_app(settings_override=None, auth_public_paths=None, auth_public_prefi
     import os
     logger = logging.getLogger(__name__)
 
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Background workers live for the lifetime of the server process
+        from app.models import config as config_mod
+        from app.storage.retention import RetentionWorker
+        from app.services.container import get_services
+        from app.services.openai_client import get_openai_client
+        from app.services.job_queue import close_job_queue, get_job_queue
+        from app.observability.tracing import close_tracer
+        from app.services.warmup import run_warmup
+        from app.middleware.admission import get_loop_lag_monitor
+        current_settings = config_mod.get_settings()
+        # Shared service instances (built on first use) and the data directories
+        services = get_services()
+        services.start()
+        app.state.services = services
+        # One pooled OpenAI client for every AI call made while the server runs
+        get_openai_client()
+        retention_worker = None
+        if getattr(current_settings, "RETENTION_ENABLED", False):
+            retention_worker = RetentionWorker.from_settings(current_settings)
+            retention_worker.start()
+        app.state.retention_worker = retention_worker
+        # Durable job queue: requeues work interrupted by the previous process, then starts workers
+        job_queue = get_job_queue()
+        if job_queue is not None:
+            await job_queue.start()
+        app.state.job_queue = job_queue
+        # Event-loop lag feeds admission control's load shedding
+        lag_monitor = get_loop_lag_monitor()
+        lag_monitor.start()
+        # Warm-up runs behind the listening server; /ready reports 503 until it is done
+        app.state.ready = False
+        app.state.warmup = None
+        warmup_task = None
+        if getattr(current_settings, "WARMUP_ENABLED", True):
+            async def warm_up():
+                app.state.warmup = await run_warmup(current_settings)
+                app.state.ready = True
+            warmup_task = asyncio.create_task(warm_up())
+        else:
+            app.state.ready = True
+        try:
+            yield
+        finally:
+            if warmup_task is not None and not warmup_task.done():
+                warmup_task.cancel()
+            await lag_monitor.stop()
+            await close_job_queue()
+            close_tracer()
+            if retention_worker is not None:
+                await retention_worker.stop()
+            await services.aclose()
+
     app = FastAPI(
         title="MPH Handwriting API",
         description="Transcribe handwritten proposals to professional documents",
-        version="0.1.0"
+        version="0.1.0",
+        lifespan=lifespan,
     )
 
     demo_pw = os.getenv("DEMO_PASSWORD")
@@ -77,6 +143,15 @@ def create_app(settings_override=None, auth_public_paths=None, auth_public_prefi
     async def health():
         return {"status": "ok"}
 
+    @app.get("/ready", include_in_schema=False)
+    async def ready(request: Request):
+        # Liveness is /health; readiness waits for the startup warm-up
+        if not getattr(request.app.state, "ready", False):
+            response = error_response("NOT_READY", "Warming up", getattr(request.state, "request_id", None), 503)
+            response.headers["Retry-After"] = "1"
+            return response
+        return {"status": "ready", "warmup": getattr(request.app.state, "warmup", None)}
+
     add_global_error_handlers(app)
     # PHASE 1: Universal error contract for all exceptions
     from fastapi.exceptions import RequestValidationError
@@ -109,6 +184,8 @@ def create_app(settings_override=None, auth_public_paths=None, auth_public_prefi
 
     # Register request ID middleware
     app.add_middleware(RequestIDMiddleware)
+    # Idempotency-Key replay sits inside the auth gate
+    app.add_middleware(IdempotencyMiddleware)
     # Register AuthGate as function-based middleware (replaces class-based AuthGateMiddleware)
     DEFAULT_PUBLIC_PREFIXES = (
         "/api/auth",
@@ -116,6 +193,7 @@ def create_app(settings_override=None, auth_public_paths=None, auth_public_prefi
         "/openapi.json",
         "/redoc",
         "/health",
+        "/ready",
     )
     from starlette.routing import Match
 
@@ -173,9 +251,12 @@ def create_app(settings_override=None, auth_public_paths=None, auth_public_prefi
 
     # Register request size limit middleware
     app.add_middleware(RequestSizeLimitMiddleware)
+    # Admission control: per-route concurrency, queue-time and loop-lag shedding (503 OVERLOADED)
+    app.add_middleware(AdmissionControlMiddleware)
     # Other middleware
     # app.add_middleware(EnforceRequestIDInJSONErrorsMiddleware)
     app.add_middleware(RequestLoggingMiddleware)
+    app.add_middleware(ProfilingMiddleware)
 
     # --- CORS Stabilization: Add CORSMiddleware LAST (outermost) ---
     app.add_middleware(
@@ -192,7 +273,7 @@ def create_app(settings_override=None, auth_public_paths=None, auth_public_prefi
         allow_credentials=False,
         allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
         allow_headers=["*"],
-        expose_headers=["X-Request-ID"],
+        expose_headers=["X-Request-ID", "Idempotent-Replayed", "Server-Timing", "X-Profile-Id"],
         max_age=86400,
     )
 
@@ -204,6 +285,13 @@ def create_app(settings_override=None, auth_public_paths=None, auth_public_prefi
     app.include_router(books.router, prefix="/api/book", tags=["book"])
     from app.api import admin_saves
     app.include_router(admin_saves.router, tags=["admin-saves"])
+    from app.api import metrics
+    app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
+    app.include_router(metrics.exposition_router, prefix="/metrics", tags=["metrics"])
+    from app.api import jobs
+    app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
+    from app.api import profiles
+    app.include_router(profiles.router, prefix="/api/admin/profiles", tags=["profiles"])
 
     # Register RateLimitException handler for correct error shaping
     from app.security.rate_limit import RateLimitException
@@ -0,0 +1,201 @@
+"""
+Admission control for the expensive POST endpoints (generate, OCR upload, book upload).
+
+Each route class has a concurrency limit. A request over the limit waits in a
+bounded FIFO queue for a free slot; it is shed with 503 OVERLOADED when the
+queue is already full or when it has waited ADMISSION_MAX_QUEUE_SECONDS. New
+requests are also shed while the event loop lags by more than
+ADMISSION_MAX_LOOP_LAG_MS (measured by LoopLagMonitor, started in the
+lifespan), since a stalled loop means everything already admitted is late.
+Shed responses use the error_response shape with a Retry-After header.
+
+Sits just inside request logging, outside the size limit, so a shed request
+is logged but its body (base64 images, often megabytes) is never read. A slot
+is held until the response has been sent, streaming included. Other routes,
+/health and /ready included, are never gated.
+
+Slots and queue waiters are per-process. Waiters use concurrent.futures, as in
+the idempotency middleware, so a slot can be handed over across event loops.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from app.middleware.error_handlers import error_response
+from app.models.config import get_settings
+from app.observability.metrics import ADMISSION_QUEUE_SECONDS, ADMISSION_REJECTIONS, EVENT_LOOP_LAG_SECONDS
+
+logger = logging.getLogger("mph.admission")
+
+# POST path -> route class; each class has its own limit and queue
+ADMITTED_PATHS = {
+    "/api/proposals/generate": "generate",
+    "/api/proposals/generate/stream": "generate",
+    "/api/jobs/generate": "generate",
+    "/api/transcribe/upload": "transcribe",
+    "/api/book/upload": "book_upload",
+    "/api/jobs/book/upload": "book_upload",
+}
+
+_LIMIT_SETTINGS = {
+    "generate": ("ADMISSION_GENERATE_CONCURRENCY", 8),
+    "transcribe": ("ADMISSION_TRANSCRIBE_CONCURRENCY", 8),
+    "book_upload": ("ADMISSION_BOOK_UPLOAD_CONCURRENCY", 4),
+}
+
+
+class AdmissionGate:
+    """Concurrency limit with a bounded FIFO wait queue."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def try_acquire(self, limit: int, max_queue: int):
+        """True (slot taken), a Future to wait on (queued), or None (queue full)."""
+        with self._lock:
+            if self.in_flight < limit and not self._waiters:
+                self.in_flight += 1
+                return True
+            if len(self._waiters) >= max_queue:
+                return None
+            waiter: concurrent.futures.Future = concurrent.futures.Future()
+            self._waiters.append(waiter)
+            return waiter
+
+    def abandon(self, waiter: concurrent.futures.Future) -> bool:
+        """Leave the queue; False when the slot was already handed over (caller now owns it)."""
+        with self._lock:
+            if waiter.done():
+                return False
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            return True
+
+    def release(self, limit: int) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            # Hand freed slots straight to the oldest waiters so they can't be overtaken
+            while self._waiters and self.in_flight < limit:
+                waiter = self._waiters.popleft()
+                if waiter.set_running_or_notify_cancel():
+                    self.in_flight += 1
+                    waiter.set_result(True)
+
+
+class LoopLagMonitor:
+    """Samples event-loop lag: how late a short sleep wakes up.
+
+    `lag_s` is a decaying peak (half-life LAG_HALF_LIFE_S), so one long stall
+    keeps counting for a moment instead of vanishing at the next sample.
+    """
+
+    LAG_HALF_LIFE_S = 0.5
+
+    def __init__(self, interval_s: float = 0.1):
+        self.interval_s = interval_s
+        self.lag_s = 0.0
+        self._decay = 0.5 ** (interval_s / self.LAG_HALF_LIFE_S)
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval_s)
+            sample = max(0.0, time.monotonic() - started - self.interval_s)
+            EVENT_LOOP_LAG_SECONDS.observe(sample)
+            self.lag_s = max(sample, self.lag_s * self._decay)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self.lag_s = 0.0
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.lag_s = 0.0
+
+
+_loop_lag_monitor: Optional[LoopLagMonitor] = None
+
+
+def get_loop_lag_monitor() -> LoopLagMonitor:
+    global _loop_lag_monitor
+    if _loop_lag_monitor is None:
+        _loop_lag_monitor = LoopLagMonitor()
+    return _loop_lag_monitor
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app: Callable, **_):
+        self.app = app
+        self.gates: Dict[str, AdmissionGate] = {name: AdmissionGate() for name in _LIMIT_SETTINGS}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") != "POST":
+            return await self.app(scope, receive, send)
+        route_class = ADMITTED_PATHS.get(scope.get("path", ""))
+        if route_class is None:
+            return await self.app(scope, receive, send)
+        settings = get_settings()
+        if not getattr(settings, "ADMISSION_ENABLED", True):
+            return await self.app(scope, receive, send)
+
+        max_lag_ms = float(getattr(settings, "ADMISSION_MAX_LOOP_LAG_MS", 500.0))
+        lag_s = get_loop_lag_monitor().lag_s
+        if max_lag_ms > 0 and lag_s * 1000.0 > max_lag_ms:
+            return await self._shed(scope, receive, send, route_class, "loop_lag", settings, lag_s=lag_s)
+
+        setting_name, default_limit = _LIMIT_SETTINGS[route_class]
+        limit = max(1, int(getattr(settings, setting_name, default_limit)))
+        gate = self.gates[route_class]
+        slot = gate.try_acquire(limit, int(getattr(settings, "ADMISSION_QUEUE_DEPTH", 16)))
+        if slot is None:
+            return await self._shed(scope, receive, send, route_class, "queue_full", settings)
+        if slot is not True:
+            started = time.perf_counter()
+            max_wait = float(getattr(settings, "ADMISSION_MAX_QUEUE_SECONDS", 5.0))
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(slot)), timeout=max_wait)
+            except asyncio.TimeoutError:
+                if gate.abandon(slot):
+                    ADMISSION_QUEUE_SECONDS.labels(route_class).observe(time.perf_counter() - started)
+                    return await self._shed(scope, receive, send, route_class, "queue_timeout", settings)
+            except asyncio.CancelledError:
+                # Client went away while queued: give the slot back if it was already handed over
+                if not gate.abandon(slot):
+                    gate.release(limit)
+                raise
+            ADMISSION_QUEUE_SECONDS.labels(route_class).observe(time.perf_counter() - started)
+        try:
+            return await self.app(scope, receive, send)
+        finally:
+            gate.release(limit)
+
+    async def _shed(self, scope, receive, send, route_class: str, reason: str, settings, lag_s: float = 0.0):
+        ADMISSION_REJECTIONS.labels(route_class, reason).inc()
+        request_id = (scope.get("state") or {}).get("request_id") or str(uuid.uuid4())
+        logger.warning("admission_shed route_class=%s reason=%s loop_lag_ms=%.0f", route_class, reason, lag_s * 1000.0)
+        retry_after = max(int(getattr(settings, "ADMISSION_RETRY_AFTER_SECONDS", 2)), math.ceil(lag_s))
+        response = error_response("OVERLOADED", "Server is busy; retry shortly.", request_id, 503)
+        response.headers["Retry-After"] = str(retry_after)
+        await response(scope, receive, send)
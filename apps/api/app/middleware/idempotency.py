@@ -0,0 +1,261 @@
+"""
+Idempotency-Key support for the expensive POST endpoints (upload/OCR, generate, job submit).
+
+A request carrying `Idempotency-Key` is identified by (key, caller's token,
+method, path). The first request runs normally. A duplicate that arrives while
+it is still running waits for it and receives the same response instead of
+starting a second OCR/LLM pipeline. A duplicate that arrives later gets the
+stored response replayed, marked with `Idempotent-Replayed: true`. Only 2xx
+responses are stored, so a failed attempt can be retried with the same key.
+A 5xx (upstream failure, 503 shed) is not shared with waiters either: the key
+is released and the next of them runs the request again.
+Reusing a key with a different body is rejected with 422 IDEMPOTENCY_KEY_REUSED.
+
+A replay carries the X-Request-ID of the request being answered, so it can be
+found in the logs; the body is replayed byte for byte, so a `request_id`
+inside it still names the request that produced it.
+
+Stored responses live in a bounded in-memory LRU with a TTL. They are
+per-process, like the memory rate-limit backend. Waiters use
+concurrent.futures so an in-flight entry can be awaited from any event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import hashlib
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from app.middleware.error_handlers import error_response
+from app.models.config import get_settings
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+# Stage timings describe the original request, not the replay
+_NOT_REPLAYED = (REPLAYED_HEADER, b"server-timing", b"x-request-id")
+MAX_KEY_LENGTH = 255
+
+# POST endpoints where a resend repeats OCR / LLM work
+IDEMPOTENT_PATHS = frozenset({
+    "/api/transcribe/upload",
+    "/api/proposals/generate",
+    "/api/book/upload",
+    "/api/jobs/generate",
+    "/api/jobs/book/upload",
+})
+
+_BOUNDARY_RE = re.compile(rb"boundary=\"?([^\";]+)\"?", re.IGNORECASE)
+
+
+@dataclass
+class StoredResponse:
+    status: int
+    headers: list
+    body: bytes
+    fingerprint: str
+    created_at: float
+
+
+class _InFlight:
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+
+
+class IdempotencyStore:
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 86400, clock=time.time):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._done: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._running: dict = {}
+        self.replays = 0
+        self.attached = 0
+
+    def begin(self, key: str, fingerprint: str):
+        """
+        ("stored", StoredResponse) | ("running", _InFlight) to follow an existing
+        request, or ("owner", _InFlight) when the caller must compute the response.
+        """
+        with self._lock:
+            stored = self._done.get(key)
+            if stored is not None:
+                if self._clock() - stored.created_at <= self.ttl_seconds:
+                    self._done.move_to_end(key)
+                    return "stored", stored
+                del self._done[key]
+            running = self._running.get(key)
+            if running is not None:
+                return "running", running
+            running = self._running[key] = _InFlight(fingerprint)
+            return "owner", running
+
+    def finish(self, key: str, entry: _InFlight, response: Optional[StoredResponse], store: bool) -> None:
+        with self._lock:
+            self._running.pop(key, None)
+            if store and response is not None:
+                response.created_at = self._clock()
+                self._done[key] = response
+                self._done.move_to_end(key)
+                while len(self._done) > self.max_entries:
+                    self._done.popitem(last=False)
+        # Waiters get the owner's final answer; None (owner crashed or failed with a 5xx)
+        # sends them round again so one of them retries the request
+        shared = response if response is not None and response.status < 500 else None
+        entry.future.set_result(shared)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "stored": len(self._done),
+                "in_flight": len(self._running),
+                "max_entries": self.max_entries,
+                "replays": self.replays,
+                "attached": self.attached,
+            }
+
+
+_store: Optional[IdempotencyStore] = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    global _store
+    if _store is None:
+        settings = get_settings()
+        _store = IdempotencyStore(
+            max_entries=getattr(settings, "IDEMPOTENCY_MAX_ENTRIES", 1000),
+            ttl_seconds=getattr(settings, "IDEMPOTENCY_TTL_SECONDS", 86400),
+        )
+    return _store
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for k, v in headers or []:
+        if k.lower() == name:
+            return v
+    return None
+
+
+def _fingerprint(body: bytes, content_type: Optional[bytes]) -> str:
+    # Multipart boundaries are random per send; strip them so a resent form matches
+    if content_type:
+        match = _BOUNDARY_RE.search(content_type)
+        if match:
+            body = body.replace(match.group(1), b"")
+    return hashlib.sha256(body).hexdigest()
+
+
+async def _send_json_error(send, code: str, message: str, request_id, status: int) -> None:
+    resp = error_response(code, message, request_id, status)
+    headers = [(b"content-type", b"application/json; charset=utf-8"), (b"content-length", str(len(resp.body)).encode("ascii"))]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": resp.body, "more_body": False})
+
+
+async def _replay(send, stored: StoredResponse, request_id: str) -> None:
+    headers = [(k, v) for k, v in stored.headers if k.lower() not in _NOT_REPLAYED]
+    headers.append((b"x-request-id", request_id.encode("latin-1")))
+    headers.append((REPLAYED_HEADER, b"true"))
+    await send({"type": "http.response.start", "status": stored.status, "headers": headers})
+    await send({"type": "http.response.body", "body": stored.body, "more_body": False})
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app: Callable, **_):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") != "POST" or scope.get("path") not in IDEMPOTENT_PATHS:
+            return await self.app(scope, receive, send)
+        headers = scope.get("headers") or []
+        raw_key = _header(headers, IDEMPOTENCY_HEADER)
+        settings = get_settings()
+        if raw_key is None or not getattr(settings, "IDEMPOTENCY_ENABLED", True):
+            return await self.app(scope, receive, send)
+
+        # RequestIDMiddleware sits inside this one; request logging (further out) has already picked the id
+        request_id = (
+            (scope.get("state") or {}).get("request_id")
+            or (_header(headers, b"x-request-id") or b"").decode("latin-1").strip()
+            or str(uuid.uuid4())
+        )
+        key_text = raw_key.decode("latin-1").strip()
+        if not key_text or len(key_text) > MAX_KEY_LENGTH:
+            return await _send_json_error(send, "VALIDATION_ERROR", f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters.", request_id, 400)
+
+        # Buffer the body (RequestSizeLimitMiddleware, further out, already bounds it)
+        body_parts = []
+        messages = []
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            body_parts.append(message.get("body", b"") or b"")
+            if not message.get("more_body", False):
+                break
+        fingerprint = _fingerprint(b"".join(body_parts), _header(headers, b"content-type"))
+        caller = hashlib.sha256(_header(headers, b"authorization") or b"").hexdigest()[:16]
+        key = f"{caller}:{scope['path']}:{key_text}"
+
+        store = get_idempotency_store()
+        while True:
+            state, entry = store.begin(key, fingerprint)
+            if state == "owner":
+                break
+            if entry.fingerprint != fingerprint:
+                return await _send_json_error(send, "IDEMPOTENCY_KEY_REUSED", "Idempotency-Key was already used with a different request body.", request_id, 422)
+            if state == "stored":
+                store.replays += 1
+                return await _replay(send, entry, request_id)
+            # Same request still running: attach to it rather than recomputing
+            result = await asyncio.wrap_future(entry.future)
+            if result is not None:
+                store.attached += 1
+                return await _replay(send, result, request_id)
+
+        i = 0
+
+        async def replay_receive():
+            nonlocal i
+            if i < len(messages):
+                i += 1
+                return messages[i - 1]
+            return await receive()
+
+        max_body = int(getattr(settings, "IDEMPOTENCY_MAX_BODY_BYTES", 2_000_000))
+        captured = {"status": None, "headers": [], "body": bytearray(), "too_big": False, "streaming": False}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = list(message.get("headers") or [])
+                content_type = _header(captured["headers"], b"content-type") or b""
+                captured["streaming"] = content_type.startswith(b"text/event-stream")
+            elif message["type"] == "http.response.body" and not captured["too_big"]:
+                captured["body"] += message.get("body", b"") or b""
+                if len(captured["body"]) > max_body:
+                    captured["too_big"] = True
+                    captured["body"] = bytearray()
+            await send(message)
+
+        stored = None
+        try:
+            await self.app(scope, replay_receive, capture_send)
+            if captured["status"] is not None and not captured["too_big"] and not captured["streaming"]:
+                stored = StoredResponse(
+                    status=captured["status"],
+                    headers=captured["headers"],
+                    body=bytes(captured["body"]),
+                    fingerprint=fingerprint,
+                    created_at=0.0,
+                )
+        finally:
+            store.finish(key, entry, stored, store=stored is not None and 200 <= stored.status < 300)
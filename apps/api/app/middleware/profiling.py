@@ -0,0 +1,122 @@
+"""
+Per-request sampling profiles, on demand or at a sampled rate.
+
+With PROFILING_ENABLED on, a request is profiled when either:
+  - an admin sends `X-Profile: 1` or `?profile=1` (checked against the admin
+    password, same as require_admin)
+  - it falls within PROFILING_SAMPLE_RATE (0.0-1.0) of all requests
+The response carries `X-Profile-Id`. The folded stacks are listed and
+downloaded under /api/admin/profiles.
+
+Sits just inside CORS so the profile covers every other middleware. Only one
+request is profiled at a time; others pass through untouched. With profiling
+disabled the cost is one settings lookup per request.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+
+from app.auth import get_auth_level
+from app.models.config import get_settings
+from app.observability.profiling import ProfileStore, SamplingProfiler, get_profile_store
+
+logger = logging.getLogger("mph.profiling")
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+_TRUTHY = {"1", "true", "yes"}
+
+_active = threading.Lock()
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for k, v in headers or []:
+        if k.lower() == name:
+            return v
+    return None
+
+
+def _is_admin(headers) -> bool:
+    auth = (_header(headers, b"authorization") or b"").decode("latin-1").strip()
+    if not auth.startswith("Bearer "):
+        return False
+    try:
+        return get_auth_level(auth[len("Bearer "):].strip()) == "admin"
+    except HTTPException:
+        return False
+
+
+def _trigger(scope, settings) -> Optional[str]:
+    headers = scope.get("headers") or []
+    flag = (_header(headers, PROFILE_HEADER) or b"").decode("latin-1").strip().lower()
+    if not flag and scope.get("query_string"):
+        flag = (parse_qs(scope["query_string"].decode("latin-1")).get("profile") or [""])[0].lower()
+    if flag in _TRUTHY and _is_admin(headers):
+        return "on_demand"
+    rate = float(getattr(settings, "PROFILING_SAMPLE_RATE", 0.0) or 0.0)
+    if rate > 0 and random.random() < rate:
+        return "sampled"
+    return None
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: Callable, **_):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        settings = get_settings()
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            return await self.app(scope, receive, send)
+        trigger = _trigger(scope, settings)
+        if trigger is None or not _active.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        profile_id = ProfileStore.new_id()
+        status = {"code": None}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": list(message.get("headers") or []) + [(PROFILE_ID_HEADER, profile_id.encode("ascii"))]}
+            await send(message)
+
+        profiler = SamplingProfiler(threading.get_ident(), getattr(settings, "PROFILING_INTERVAL_MS", 5) / 1000.0)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000.0
+            profiler.stop(wait=False)
+            _active.release()
+            meta = {
+                "request_id": (scope.get("state") or {}).get("request_id"),
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "status_code": status["code"],
+                "trigger": trigger,
+                "duration_ms": round(duration_ms, 1),
+                "interval_ms": profiler.interval_s * 1000.0,
+                "created_at": time.time(),
+            }
+
+            def finish():
+                # Join, fold and write off the event loop
+                profiler.stop()
+                meta["samples"] = profiler.sample_count
+                get_profile_store().save(profile_id, profiler.folded(), meta)
+
+            try:
+                await asyncio.to_thread(finish)
+            except Exception:
+                logger.warning("profile_save_failed profile_id=%s", profile_id, exc_info=True)
@@ -6,6 +6,10 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
 
+from app import request_context
+from app.models.config import get_settings
+from app.observability import timing, tracing
+
 REQUEST_ID_HEADER = "x-request-id"
 
 class RequestIDMiddleware(BaseHTTPMiddleware):
@@ -26,8 +30,37 @@ class RequestIDMiddleware(BaseHTTPMiddleware):
         # Ensure ASGI scope has state for downstream ASGI middleware
         if hasattr(request, 'scope') and isinstance(request.scope, dict):
             request.scope.setdefault('state', {})['request_id'] = request_id
-        response = await call_next(request)
+        # Bound once here; handlers, services and log filters read it via app.request_context
+        ctx = request_context.RequestContext(
+            request_id=request_id,
+            method=request.method,
+            path=request.url.path,
+            client_ip=request_context.client_ip_from_scope(request.scope),
+        )
+        token = request_context.bind(ctx)
+        try:
+            # Root span; the trace id is derived from the request id so either finds the other
+            with tracing.span(
+                request.method,
+                kind=tracing.KIND_SERVER,
+                trace_id=tracing.trace_id_for(request_id),
+                attributes={"request_id": request_id, "http.method": request.method, "http.target": request.url.path, "client.address": ctx.client_ip},
+            ) as root:
+                response = await call_next(request)
+                route = request_context.route_template(request.scope)
+                if route:
+                    root.name = f"{request.method} {route}"
+                    root.set_attribute("http.route", route)
+                root.set_attribute("http.status_code", response.status_code)
+                if response.status_code >= 500:
+                    root.status_code = tracing.STATUS_ERROR
+        finally:
+            request_context.reset(token)
         response.headers[REQUEST_ID_HEADER] = request_id
+        if getattr(get_settings(), "SERVER_TIMING_ENABLED", True):
+            # Streaming responses report the stages finished before the first byte
+            response.headers[timing.SERVER_TIMING_HEADER] = timing.server_timing(ctx)
+            timing.log_timing(ctx, response.status_code)
 
         # Option B: Inject request_id into ANY JSON dict response if missing (success + error).
         # NOTE: BaseHTTPMiddleware may wrap JSON responses as StreamingResponse; if we consume
@@ -8,12 +8,16 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
 
+from app.observability.metrics import HTTP_REQUEST_SECONDS
+from app.request_context import route_template
+
 logger = logging.getLogger("mph.request")
 
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         import datetime
         start = time.time()
+        started = time.perf_counter()
         req_id = getattr(request.state, "request_id", None)
         if not req_id or not str(req_id).strip():
             header_id = request.headers.get("x-request-id", "").strip()
@@ -41,6 +45,9 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
         finally:
             duration_ms = int((time.time() - start) * 1000)
             status_code = getattr(response, "status_code", None) if 'response' in locals() else None
+            # Route template keeps the label set bounded (ids stay out of metrics)
+            route = route_template(request.scope) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(method, route, status_code or 500).observe(time.perf_counter() - started)
             logger.info(json.dumps({
                 "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
                 "level": "INFO",
@@ -90,7 +90,9 @@ class RequestSizeLimitMiddleware:
                 msg = buffered[i]
                 i += 1
                 return msg
-            return {"type": "http.request", "body": b"", "more_body": False}
+            # Body fully replayed: later receives (e.g. disconnect polling while a
+            # StreamingResponse is sending) must see the real channel
+            return await receive()
 
         return await self.app(scope, replay_receive, send)
 
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 from functools import lru_cache
+from typing import Optional
 
 
 
@@ -21,6 +22,109 @@ class Settings(BaseSettings):
     # Rate limiting
     login_rate_limit: int = Field(default=5, validation_alias="LOGIN_RATE_LIMIT")
     generate_rate_limit: int = Field(default=3, validation_alias="GENERATE_RATE_LIMIT")
+    # memory (per process) | shared (mmap, all workers on the host) | redis (all hosts)
+    RATE_LIMIT_BACKEND: str = Field(default="memory", validation_alias="RATE_LIMIT_BACKEND")
+    RATE_LIMIT_MAX_KEYS: int = Field(default=10_000, validation_alias="RATE_LIMIT_MAX_KEYS")
+    RATE_LIMIT_SHARED_PATH: Optional[str] = Field(default=None, validation_alias="RATE_LIMIT_SHARED_PATH")
+    RATE_LIMIT_REDIS_URL: str = Field(default="redis://localhost:6379/0", validation_alias="RATE_LIMIT_REDIS_URL")
+
+    # Proposal generation: one structured-output call instead of rewrite + structure
+    GENERATE_SINGLE_CALL: bool = Field(default=False, validation_alias="GENERATE_SINGLE_CALL")
+    # generate_doc: race the ContractorDocV1 and AiDocV1 prompts instead of trying them in turn
+    GENERATE_DOC_SPECULATIVE: bool = Field(default=False, validation_alias="GENERATE_DOC_SPECULATIVE")
+
+    # Response cache for deterministic formatting calls (bypass per request with X-Cache-Bypass: 1)
+    RESPONSE_CACHE_ENABLED: bool = Field(default=True, validation_alias="RESPONSE_CACHE_ENABLED")
+    RESPONSE_CACHE_MAX_ENTRIES: int = Field(default=1000, validation_alias="RESPONSE_CACHE_MAX_ENTRIES")
+    RESPONSE_CACHE_TTL_SECONDS: int = Field(default=7 * 86400, validation_alias="RESPONSE_CACHE_TTL_SECONDS")
+    RESPONSE_CACHE_DIR: Optional[str] = Field(default=None, validation_alias="RESPONSE_CACHE_DIR")
+
+    # Upstream OpenAI scheduling (shared by OCR, book OCR and formatting)
+    OPENAI_MAX_CONCURRENCY: int = Field(default=8, validation_alias="OPENAI_MAX_CONCURRENCY")
+    OPENAI_REQUESTS_PER_MINUTE: int = Field(default=500, validation_alias="OPENAI_REQUESTS_PER_MINUTE")
+    OPENAI_TOKENS_PER_MINUTE: int = Field(default=30_000, validation_alias="OPENAI_TOKENS_PER_MINUTE")
+    OPENAI_QUEUE_TIMEOUT_SECONDS: float = Field(default=60.0, validation_alias="OPENAI_QUEUE_TIMEOUT_SECONDS")
+    # While book OCR waits, every Nth grant goes to it (0 = strict interactive priority)
+    OPENAI_BULK_EVERY: int = Field(default=4, validation_alias="OPENAI_BULK_EVERY")
+    # Circuit breaker, adaptive per-attempt timeouts and retry budget (openai_guard)
+    OPENAI_BREAKER_FAILURE_THRESHOLD: int = Field(default=5, validation_alias="OPENAI_BREAKER_FAILURE_THRESHOLD")
+    OPENAI_BREAKER_RECOVERY_SECONDS: float = Field(default=30.0, validation_alias="OPENAI_BREAKER_RECOVERY_SECONDS")
+    OPENAI_ADAPTIVE_TIMEOUT: bool = Field(default=True, validation_alias="OPENAI_ADAPTIVE_TIMEOUT")
+    OPENAI_TIMEOUT_MIN_SECONDS: float = Field(default=5.0, validation_alias="OPENAI_TIMEOUT_MIN_SECONDS")
+    OPENAI_TIMEOUT_P95_MULTIPLIER: float = Field(default=2.0, validation_alias="OPENAI_TIMEOUT_P95_MULTIPLIER")
+    OPENAI_RETRY_BUDGET_RATIO: float = Field(default=0.2, validation_alias="OPENAI_RETRY_BUDGET_RATIO")
+    # Shared OpenAI HTTP connection pool
+    OPENAI_HTTP2: bool = Field(default=True, validation_alias="OPENAI_HTTP2")
+    OPENAI_MAX_CONNECTIONS: int = Field(default=20, validation_alias="OPENAI_MAX_CONNECTIONS")
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = Field(default=10, validation_alias="OPENAI_MAX_KEEPALIVE_CONNECTIONS")
+    OPENAI_KEEPALIVE_EXPIRY_SECONDS: float = Field(default=30.0, validation_alias="OPENAI_KEEPALIVE_EXPIRY_SECONDS")
+    OPENAI_CONNECT_TIMEOUT_SECONDS: float = Field(default=5.0, validation_alias="OPENAI_CONNECT_TIMEOUT_SECONDS")
+    # Alternate OpenAI-compatible endpoint, e.g. the local stand-in in loadtest/fake_openai.py
+    OPENAI_BASE_URL: Optional[str] = Field(default=None, validation_alias="OPENAI_BASE_URL")
+    # Cassettes: off | record (append exchanges to OPENAI_CASSETTE_PATH) | replay (serve them, no network)
+    OPENAI_CASSETTE_MODE: str = Field(default="off", validation_alias="OPENAI_CASSETTE_MODE")
+    OPENAI_CASSETTE_PATH: str = Field(default="", validation_alias="OPENAI_CASSETTE_PATH")
+    OPENAI_CASSETTE_REPLAY_LATENCY: bool = Field(default=False, validation_alias="OPENAI_CASSETTE_REPLAY_LATENCY")
+
+    # Storage layout: hash-prefix sharded session/chapter dirs (legacy flat dirs still resolve)
+    STORAGE_SHARDED_LAYOUT: bool = Field(default=True, validation_alias="STORAGE_SHARDED_LAYOUT")
+
+    # Retention / compaction of data/sessions and data/books (0 disables a policy)
+    RETENTION_ENABLED: bool = Field(default=True, validation_alias="RETENTION_ENABLED")
+    RETENTION_INTERVAL_SECONDS: int = Field(default=3600, validation_alias="RETENTION_INTERVAL_SECONDS")
+    RETENTION_MAX_AGE_DAYS: int = Field(default=0, validation_alias="RETENTION_MAX_AGE_DAYS")
+    RETENTION_ARCHIVE_AFTER_DAYS: int = Field(default=0, validation_alias="RETENTION_ARCHIVE_AFTER_DAYS")
+    RETENTION_ARCHIVE_QUALITY: int = Field(default=60, validation_alias="RETENTION_ARCHIVE_QUALITY")
+    RETENTION_ARCHIVE_MAX_DIMENSION: int = Field(default=2000, validation_alias="RETENTION_ARCHIVE_MAX_DIMENSION")
+    RETENTION_ORPHAN_GRACE_SECONDS: int = Field(default=3600, validation_alias="RETENTION_ORPHAN_GRACE_SECONDS")
+
+    # Server-Timing header + request_timing log record with per-stage durations
+    SERVER_TIMING_ENABLED: bool = Field(default=True, validation_alias="SERVER_TIMING_ENABLED")
+
+    # Tracing: recent traces stay in memory (/api/metrics/traces); OTLP/JSON export when a path or endpoint is set
+    TRACING_ENABLED: bool = Field(default=True, validation_alias="TRACING_ENABLED")
+    TRACING_RECENT_TRACES: int = Field(default=200, validation_alias="TRACING_RECENT_TRACES")
+    TRACING_EXPORT_PATH: str = Field(default="", validation_alias="TRACING_EXPORT_PATH")
+    TRACING_OTLP_ENDPOINT: str = Field(default="", validation_alias="TRACING_OTLP_ENDPOINT")
+
+    # Request profiling: admin `X-Profile: 1` / `?profile=1`, or a sampled fraction of all requests
+    PROFILING_ENABLED: bool = Field(default=False, validation_alias="PROFILING_ENABLED")
+    PROFILING_SAMPLE_RATE: float = Field(default=0.0, validation_alias="PROFILING_SAMPLE_RATE")
+    PROFILING_INTERVAL_MS: float = Field(default=5.0, validation_alias="PROFILING_INTERVAL_MS")
+    PROFILING_MAX_PROFILES: int = Field(default=100, validation_alias="PROFILING_MAX_PROFILES")
+    PROFILING_DIR: Optional[str] = Field(default=None, validation_alias="PROFILING_DIR")
+
+    # Coalesce identical concurrent OCR / formatting calls into one upstream request
+    SINGLE_FLIGHT_ENABLED: bool = Field(default=True, validation_alias="SINGLE_FLIGHT_ENABLED")
+
+    # Idempotency-Key replay for upload/generate POSTs (per-process store)
+    IDEMPOTENCY_ENABLED: bool = Field(default=True, validation_alias="IDEMPOTENCY_ENABLED")
+    IDEMPOTENCY_TTL_SECONDS: int = Field(default=86400, validation_alias="IDEMPOTENCY_TTL_SECONDS")
+    IDEMPOTENCY_MAX_ENTRIES: int = Field(default=1000, validation_alias="IDEMPOTENCY_MAX_ENTRIES")
+    IDEMPOTENCY_MAX_BODY_BYTES: int = Field(default=2_000_000, validation_alias="IDEMPOTENCY_MAX_BODY_BYTES")
+
+    # Admission control for generate / OCR upload / book upload: per-class concurrency, bounded wait queue, loop-lag shedding
+    ADMISSION_ENABLED: bool = Field(default=True, validation_alias="ADMISSION_ENABLED")
+    ADMISSION_GENERATE_CONCURRENCY: int = Field(default=8, validation_alias="ADMISSION_GENERATE_CONCURRENCY")
+    ADMISSION_TRANSCRIBE_CONCURRENCY: int = Field(default=8, validation_alias="ADMISSION_TRANSCRIBE_CONCURRENCY")
+    ADMISSION_BOOK_UPLOAD_CONCURRENCY: int = Field(default=4, validation_alias="ADMISSION_BOOK_UPLOAD_CONCURRENCY")
+    ADMISSION_QUEUE_DEPTH: int = Field(default=16, validation_alias="ADMISSION_QUEUE_DEPTH")
+    ADMISSION_MAX_QUEUE_SECONDS: float = Field(default=5.0, validation_alias="ADMISSION_MAX_QUEUE_SECONDS")
+    ADMISSION_MAX_LOOP_LAG_MS: float = Field(default=500.0, validation_alias="ADMISSION_MAX_LOOP_LAG_MS")
+    ADMISSION_RETRY_AFTER_SECONDS: int = Field(default=2, validation_alias="ADMISSION_RETRY_AFTER_SECONDS")
+
+    # Startup warm-up (schemas, templates, a throwaway PDF, the OpenAI connection); /ready is 503 until done
+    WARMUP_ENABLED: bool = Field(default=True, validation_alias="WARMUP_ENABLED")
+    WARMUP_OPENAI: bool = Field(default=True, validation_alias="WARMUP_OPENAI")
+    WARMUP_TIMEOUT_SECONDS: float = Field(default=30.0, validation_alias="WARMUP_TIMEOUT_SECONDS")
+
+    # Background job queue for generate / book upload (SQLite-backed, in-process workers)
+    JOBS_ENABLED: bool = Field(default=True, validation_alias="JOBS_ENABLED")
+    JOB_WORKERS: int = Field(default=2, validation_alias="JOB_WORKERS")
+    JOB_MAX_ATTEMPTS: int = Field(default=2, validation_alias="JOB_MAX_ATTEMPTS")
+    JOB_RETENTION_SECONDS: int = Field(default=7 * 86400, validation_alias="JOB_RETENTION_SECONDS")
+    JOB_POLL_INTERVAL_SECONDS: float = Field(default=1.0, validation_alias="JOB_POLL_INTERVAL_SECONDS")
+    JOB_DB_PATH: Optional[str] = Field(default=None, validation_alias="JOB_DB_PATH")
 
     model_config = SettingsConfigDict(
         env_file=".env",
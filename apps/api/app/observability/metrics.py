@@ -0,0 +1,279 @@
+"""
+In-process Prometheus metrics (counters and histograms) with text exposition.
+
+Recording takes no locks on the hot path. Each labelled child keeps one shard
+per thread (threading.local), and a thread only ever updates its own shard.
+Scrapes sum the shards, which may be a few observations stale while
+increments are in progress. A lock is taken only when a new label set or a new
+thread shows up.
+
+Keep label values low-cardinality: route templates rather than raw paths,
+operation names rather than ids.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterShard:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+
+class _HistogramShard:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, n_buckets: int):
+        # One slot per finite bucket plus the +Inf overflow
+        self.counts = [0] * (n_buckets + 1)
+        self.sum = 0.0
+
+
+class _Child:
+    def __init__(self, make_shard):
+        self._make_shard = make_shard
+        self._local = threading.local()
+        self._shards: list = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._make_shard()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+
+class CounterChild(_Child):
+    def __init__(self):
+        super().__init__(_CounterShard)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._shard().value += amount
+
+    def value(self) -> float:
+        with self._lock:
+            shards = list(self._shards)
+        return sum(s.value for s in shards)
+
+
+class HistogramChild(_Child):
+    def __init__(self, buckets: Tuple[float, ...]):
+        super().__init__(lambda: _HistogramShard(len(buckets)))
+        self._buckets = buckets
+
+    def observe(self, value: float) -> None:
+        shard = self._shard()
+        shard.counts[bisect_left(self._buckets, value)] += 1
+        shard.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """(per-bucket counts incl. +Inf, sum) merged across shards; counts are not cumulative."""
+        with self._lock:
+            shards = list(self._shards)
+        counts = [0] * (len(self._buckets) + 1)
+        total = 0.0
+        for s in shards:
+            for i, c in enumerate(s.counts):
+                counts[i] += c
+            total += s.sum
+        return counts, total
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def expose(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Unlabelled increment."""
+        self.labels().inc(amount)
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, child in self._items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value())}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Unlabelled observation."""
+        self.labels().observe(value)
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bounds = self.buckets + (math.inf,)
+        for key, child in self._items():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def expose(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "mph_http_request_duration_seconds",
+    "HTTP request latency by route template, method and status.",
+    ("method", "route", "status"),
+)
+OPENAI_ATTEMPT_SECONDS = REGISTRY.histogram(
+    "mph_openai_attempt_duration_seconds",
+    "Latency of individual OpenAI attempts made by call_openai_with_retry.",
+    ("operation", "outcome"),
+)
+OPENAI_RETRIES = REGISTRY.counter(
+    "mph_openai_retries_total",
+    "OpenAI attempts retried after a retryable failure.",
+    ("operation", "code"),
+)
+OPENAI_FAILURES = REGISTRY.counter(
+    "mph_openai_failures_total",
+    "OpenAI calls that gave up (OpenAIFailure raised to the caller).",
+    ("operation", "code"),
+)
+OCR_PAGES = REGISTRY.histogram(
+    "mph_ocr_pages_per_request",
+    "Pages transcribed per upload request.",
+    ("source",),
+    buckets=(1, 2, 3, 5, 8, 13, 25, 50),
+)
+PDF_RENDER_SECONDS = REGISTRY.histogram(
+    "mph_pdf_render_duration_seconds",
+    "Time spent in ExportService._generate_pdf.",
+    ("document_type",),
+)
+STORAGE_BYTES_WRITTEN = REGISTRY.counter(
+    "mph_storage_bytes_written_total",
+    "Bytes written through atomic_write_bytes / atomic_write_bytes_sync.",
+    ("mode",),
+)
+RATE_LIMIT_REJECTIONS = REGISTRY.counter(
+    "mph_rate_limit_rejections_total",
+    "Requests rejected by the rate limiter.",
+    ("route",),
+)
+PIPELINE_STAGE_SECONDS = REGISTRY.histogram(
+    "mph_pipeline_stage_duration_seconds",
+    "Time per pipeline stage (OCR, rewrite, structure, save, PDF render, ...) recorded by timing.stage().",
+    ("stage",),
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "mph_admission_rejections_total",
+    "Requests shed with 503 OVERLOADED by admission control (reason: queue_full, queue_timeout, loop_lag).",
+    ("route_class", "reason"),
+)
+ADMISSION_QUEUE_SECONDS = REGISTRY.histogram(
+    "mph_admission_queue_seconds",
+    "Time a request waited for an admission slot.",
+    ("route_class",),
+)
+EVENT_LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "mph_event_loop_lag_seconds",
+    "How late the event loop wakes a 100 ms sleep.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
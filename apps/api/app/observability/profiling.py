@@ -0,0 +1,148 @@
+"""
+Sampling profiler for individual requests.
+
+A daemon thread wakes every `interval_s` and records the Python stack of the
+profiled thread (the event loop thread serving the request) from
+sys._current_frames(). Stacks are keyed by code objects while sampling and only
+formatted at the end, so a sample costs one frame walk. The request itself is
+never traced call-by-call.
+
+The output is the folded-stack format ("outer;inner;leaf <count>" per line)
+read by flamegraph.pl, inferno and speedscope. Each profile is stored as
+<id>.folded next to an <id>.json metadata file in the profiles directory.
+
+The event loop thread is shared, so the samples include whatever else the loop
+ran during the request. Profile on a quiet instance for a clean picture. Work
+sent to the threadpool (asyncio.to_thread, sync endpoints) is not sampled.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+from app.storage.atomic_write import atomic_write_bytes_sync
+
+PROFILE_ID_RE = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+_SITE_MARKERS = ("site-packages" + os.sep, "dist-packages" + os.sep)
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    for marker in _SITE_MARKERS:
+        idx = filename.find(marker)
+        if idx != -1:
+            filename = filename[idx + len(marker):]
+            break
+    else:
+        idx = filename.find(os.sep + "app" + os.sep)
+        if idx != -1:
+            filename = filename[idx + 1:]
+    # ';' separates frames in the folded format
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id: int, interval_s: float = 0.005, max_depth: int = 200):
+        self.thread_id = thread_id
+        self.interval_s = max(0.001, float(interval_s))
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        depth_limit = self.max_depth
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < depth_limit:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(stack)] += 1
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self.samples.values())
+
+    def folded(self) -> str:
+        """Folded stacks, root first, merged by label (different code objects can share one)."""
+        merged: Counter = Counter()
+        for stack, count in self.samples.items():
+            merged[";".join(_frame_label(code) for code in reversed(stack))] += count
+        return "".join(f"{line} {count}\n" for line, count in merged.most_common())
+
+
+class ProfileStore:
+    def __init__(self, root: Path, max_profiles: int = 100):
+        self.root = Path(root)
+        self.max_profiles = max(1, int(max_profiles))
+
+    @classmethod
+    def from_settings(cls, settings) -> "ProfileStore":
+        from app.storage.file_manager import BASE_DIR
+        root = getattr(settings, "PROFILING_DIR", None) or (BASE_DIR / "data" / "profiles")
+        return cls(Path(root), getattr(settings, "PROFILING_MAX_PROFILES", 100))
+
+    @staticmethod
+    def new_id() -> str:
+        return time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + "-" + os.urandom(4).hex()
+
+    def save(self, profile_id: str, folded: str, meta: dict) -> None:
+        atomic_write_bytes_sync(self.root / f"{profile_id}.folded", folded.encode("utf-8"))
+        atomic_write_bytes_sync(self.root / f"{profile_id}.json", json.dumps({"id": profile_id, **meta}).encode("utf-8"))
+        self._prune()
+
+    def _prune(self) -> None:
+        metas = sorted(self.root.glob("*.json"))
+        for meta_path in metas[:-self.max_profiles]:
+            for path in (meta_path, meta_path.with_suffix(".folded")):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def list(self) -> List[dict]:
+        """Metadata of stored profiles, newest first."""
+        if not self.root.is_dir():
+            return []
+        out = []
+        for meta_path in sorted(self.root.glob("*.json"), reverse=True):
+            try:
+                out.append(json.loads(meta_path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+        return out
+
+    def folded_path(self, profile_id: str) -> Optional[Path]:
+        if not PROFILE_ID_RE.match(profile_id or ""):
+            return None
+        path = self.root / f"{profile_id}.folded"
+        return path if path.is_file() else None
+
+
+_store: Optional[ProfileStore] = None
+
+
+def get_profile_store() -> ProfileStore:
+    global _store
+    if _store is None:
+        from app.models.config import get_settings
+        _store = ProfileStore.from_settings(get_settings())
+    return _store
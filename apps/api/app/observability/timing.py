@@ -0,0 +1,74 @@
+"""
+Per-request pipeline stage timing.
+
+Wrap a unit of work in `with stage("rewrite"):` and its wall time is added to
+the current RequestContext. On the way out RequestIDMiddleware turns the
+stages into a `Server-Timing` header (visible in the browser's network panel)
+and one structured `request_timing` log record, and each stage is observed in
+the `mph_pipeline_stage_seconds` histogram.
+
+Each stage is also a tracing span. Beyond the span, a stage costs two
+perf_counter() calls and a dict update; outside a request (job workers,
+scripts) only the histogram and span are recorded. Repeated stages with the
+same name (one per OCR page, say) are summed, and the count is kept in the log
+record.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from app import request_context
+from app.observability import tracing
+from app.observability.metrics import PIPELINE_STAGE_SECONDS
+
+logger = logging.getLogger("mph.timing")
+
+SERVER_TIMING_HEADER = "server-timing"
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        with tracing.span(name):
+            yield
+    finally:
+        elapsed = time.perf_counter() - started
+        PIPELINE_STAGE_SECONDS.labels(name).observe(elapsed)
+        ctx = request_context.current()
+        if ctx is not None:
+            entry = ctx.stages.get(name)
+            if entry is None:
+                ctx.stages[name] = [elapsed * 1000.0, 1]
+            else:
+                entry[0] += elapsed * 1000.0
+                entry[1] += 1
+
+
+def server_timing(ctx: request_context.RequestContext) -> str:
+    """`Server-Timing` value: one metric per stage plus `total` for the whole request so far."""
+    parts = [f"{name};dur={ms:.1f}" for name, (ms, _count) in list(ctx.stages.items())]
+    parts.append(f"total;dur={ctx.elapsed_ms():.1f}")
+    return ", ".join(parts)
+
+
+def timing_record(ctx: request_context.RequestContext, status_code: Optional[int] = None) -> dict:
+    return {
+        "event": "request_timing",
+        "request_id": ctx.request_id,
+        "method": ctx.method,
+        "path": ctx.path,
+        "status_code": status_code,
+        "total_ms": round(ctx.elapsed_ms(), 1),
+        "stages": {name: {"ms": round(ms, 1), "count": count} for name, (ms, count) in list(ctx.stages.items())},
+    }
+
+
+def log_timing(ctx: request_context.RequestContext, status_code: Optional[int] = None) -> None:
+    """Emit the structured record; requests that ran no stages are left to request_end."""
+    if ctx.stages:
+        logger.info(json.dumps(timing_record(ctx, status_code)), extra={"request_id": ctx.request_id})
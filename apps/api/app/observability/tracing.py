@@ -0,0 +1,426 @@
+"""
+Lightweight tracing with OTLP/JSON export.
+
+Spans follow the OpenTelemetry data model (trace/span ids, parent links, kind,
+attributes, events, status) without depending on the OpenTelemetry SDK. Each
+finished span goes to:
+  - an in-memory ring of recent traces, served by /api/metrics/traces with the
+    critical path of each trace
+  - optionally a batch exporter that writes OTLP/JSON (`ExportTraceServiceRequest`)
+    one request per line to TRACING_EXPORT_PATH and/or POSTs it to
+    TRACING_OTLP_ENDPOINT (an OTLP/HTTP collector's /v1/traces)
+
+The trace id of a request is derived from its X-Request-ID (a UUID maps to
+the same 32 hex digits), so a request id from a log line or an error body finds
+the trace directly. Background jobs use the job id.
+
+`span()` nests through a ContextVar, so tasks spawned inside a span (asyncio
+copies the context into them) become its children. `start_span()` is for leaf phases that
+cannot be wrapped in a block; call `.end()` on the result.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger("mph.tracing")
+
+# OTLP SpanKind / StatusCode values
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+SERVICE_NAME = "mph-api"
+_HEX32 = re.compile(r"^[0-9a-f]{32}$")
+
+
+def trace_id_for(request_id: str) -> str:
+    """32-hex trace id for a request id: UUIDs keep their digits, anything else is hashed."""
+    compact = str(request_id).replace("-", "").lower()
+    if _HEX32.match(compact) and compact != "0" * 32:
+        return compact
+    return hashlib.sha256(str(request_id).encode("utf-8")).hexdigest()[:32]
+
+
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64) or 1:016x}"
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "kind", "start_ns", "end_ns",
+                 "attributes", "events", "status_code", "status_message", "_tracer")
+
+    def __init__(self, tracer, name: str, trace_id: str, parent_span_id: Optional[str], kind: int, attributes: Optional[dict]):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes or {})
+        self.events: list = []
+        self.status_code = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes) -> None:
+        self.events.append((name, time.time_ns(), attributes))
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status_code = STATUS_ERROR
+        self.status_message = str(getattr(exc, "code", None) or type(exc).__name__)
+        self.add_event("exception", **{"exception.type": type(exc).__name__, "exception.message": str(exc)[:500]})
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self._tracer is not None:
+                self._tracer._on_end(self)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        out = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status_code, **({"message": self.status_message} if self.status_message else {})},
+        }
+        if self.parent_span_id:
+            out["parentSpanId"] = self.parent_span_id
+        if self.events:
+            out["events"] = [
+                {"name": name, "timeUnixNano": str(ts), "attributes": _otlp_attributes(attrs)}
+                for name, ts, attrs in self.events
+            ]
+        return out
+
+    def summary(self) -> dict:
+        return {
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_ms": self.start_ns / 1e6,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": {STATUS_UNSET: "unset", STATUS_OK: "ok", STATUS_ERROR: "error"}[self.status_code],
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Returned while tracing is disabled; accepts the Span API and records nothing."""
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def add_event(self, name, **attributes):
+        pass
+
+    def record_exception(self, exc):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def otlp_request(spans: Iterable[Span], service_name: str = SERVICE_NAME) -> dict:
+    """OTLP/JSON ExportTraceServiceRequest for a batch of finished spans."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+            "scopeSpans": [{
+                "scope": {"name": "app.observability.tracing"},
+                "spans": [s.to_otlp() for s in spans],
+            }],
+        }]
+    }
+
+
+class BatchExporter:
+    """
+    Hands finished spans to a daemon thread that exports them in batches, so
+    request handlers never block on file or network I/O. When the queue is full,
+    spans are dropped and counted rather than applying backpressure.
+    """
+
+    def __init__(self, path: Optional[str] = None, endpoint: Optional[str] = None, max_queue: int = 10_000,
+                 batch_size: int = 256, interval_s: float = 1.0, service_name: str = SERVICE_NAME):
+        self.path = path or None
+        self.endpoint = endpoint or None
+        self.batch_size = max(1, int(batch_size))
+        self.interval_s = float(interval_s)
+        self.service_name = service_name
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.exported = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def submit(self, span: Span) -> None:
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None and not self._stopped.is_set():
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _drain(self, limit: int) -> List[Span]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                first = self._queue.get(timeout=self.interval_s)
+            except queue.Empty:
+                continue
+            self._export([first] + self._drain(self.batch_size - 1))
+
+    def _export(self, batch: List[Span]) -> None:
+        if not batch:
+            return
+        body = json.dumps(otlp_request(batch, self.service_name), separators=(",", ":"))
+        try:
+            with self._write_lock:
+                if self.path:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(body + "\n")
+                if self.endpoint:
+                    req = urllib.request.Request(self.endpoint, data=body.encode("utf-8"), headers={"Content-Type": "application/json"}, method="POST")
+                    with urllib.request.urlopen(req, timeout=5):
+                        pass
+            self.exported += len(batch)
+        except Exception:
+            self.errors += 1
+            logger.warning("span_export_failed spans=%d", len(batch), exc_info=True)
+
+    def flush(self) -> None:
+        """Export everything queued so far on the calling thread."""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._export(batch)
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=self.interval_s + 1.0)
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "endpoint": self.endpoint,
+            "queued": self._queue.qsize(),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+def critical_path(spans: List[Span]) -> List[dict]:
+    """
+    Chain of spans that determined the trace's end-to-end latency: from the root,
+    repeatedly descend into the child that finished last (the one its parent was
+    still waiting on).
+    """
+    if not spans:
+        return []
+    children: dict = {}
+    by_id = {s.span_id: s for s in spans}
+    for s in spans:
+        children.setdefault(s.parent_span_id, []).append(s)
+    roots = [s for s in spans if not s.parent_span_id or s.parent_span_id not in by_id]
+    node = max(roots, key=lambda s: (s.end_ns or 0) - s.start_ns)
+    path = []
+    while node is not None:
+        path.append({"name": node.name, "span_id": node.span_id, "duration_ms": round(node.duration_ms, 3)})
+        kids = children.get(node.span_id)
+        node = max(kids, key=lambda s: s.end_ns or 0) if kids else None
+    return path
+
+
+class Tracer:
+    def __init__(self, exporter: Optional[BatchExporter] = None, recent_traces: int = 200, max_spans_per_trace: int = 500):
+        self.exporter = exporter
+        self.recent_traces = max(0, int(recent_traces))
+        self.max_spans_per_trace = max(1, int(max_spans_per_trace))
+        self._lock = threading.Lock()
+        self._recent: "OrderedDict[str, list]" = OrderedDict()
+
+    def start_span(self, name: str, *, kind: int = KIND_INTERNAL, trace_id: Optional[str] = None, attributes: Optional[dict] = None) -> Span:
+        """Start a span under the current one (or a new root for `trace_id`) without making it current."""
+        parent = _current_span.get()
+        if trace_id is None and parent is not None:
+            return Span(self, name, parent.trace_id, parent.span_id, kind, attributes)
+        return Span(self, name, trace_id or f"{random.getrandbits(128) or 1:032x}", None, kind, attributes)
+
+    def _on_end(self, span: Span) -> None:
+        if self.recent_traces:
+            with self._lock:
+                spans = self._recent.get(span.trace_id)
+                if spans is None:
+                    spans = self._recent[span.trace_id] = []
+                    while len(self._recent) > self.recent_traces:
+                        self._recent.popitem(last=False)
+                if len(spans) < self.max_spans_per_trace:
+                    spans.append(span)
+        if self.exporter is not None:
+            self.exporter.submit(span)
+
+    def trace(self, trace_id: str) -> Optional[List[Span]]:
+        with self._lock:
+            spans = self._recent.get(trace_id)
+            return list(spans) if spans is not None else None
+
+    def slowest(self, limit: int = 10) -> List[dict]:
+        """Recent traces ordered by root duration, each with its critical path."""
+        with self._lock:
+            traces = [(tid, list(spans)) for tid, spans in self._recent.items()]
+        rows = []
+        for trace_id, spans in traces:
+            roots = [s for s in spans if not s.parent_span_id]
+            if not roots:
+                continue
+            root = max(roots, key=lambda s: s.duration_ms)
+            rows.append({
+                "trace_id": trace_id,
+                "name": root.name,
+                "request_id": root.attributes.get("request_id"),
+                "duration_ms": round(root.duration_ms, 3),
+                "spans": len(spans),
+                "critical_path": critical_path(spans),
+            })
+        rows.sort(key=lambda r: r["duration_ms"], reverse=True)
+        return rows[:limit]
+
+    def stats(self) -> dict:
+        with self._lock:
+            recent = len(self._recent)
+        return {"recent_traces": recent, "exporter": self.exporter.stats() if self.exporter is not None else None}
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("mph_current_span", default=None)
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Process-wide tracer built from settings; None when TRACING_ENABLED is off."""
+    global _tracer
+    if _tracer is None:
+        from app.models.config import get_settings
+        settings = get_settings()
+        if not getattr(settings, "TRACING_ENABLED", True):
+            return None
+        with _tracer_lock:
+            if _tracer is None:
+                path = getattr(settings, "TRACING_EXPORT_PATH", "") or None
+                endpoint = getattr(settings, "TRACING_OTLP_ENDPOINT", "") or None
+                exporter = BatchExporter(path=path, endpoint=endpoint) if (path or endpoint) else None
+                _tracer = Tracer(exporter=exporter, recent_traces=getattr(settings, "TRACING_RECENT_TRACES", 200))
+    return _tracer
+
+
+def close_tracer() -> None:
+    """Flush pending exports (called from the app lifespan on shutdown)."""
+    global _tracer
+    tracer = _tracer
+    _tracer = None
+    if tracer is not None:
+        tracer.shutdown()
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+def start_span(name: str, **kwargs):
+    tracer = get_tracer()
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.start_span(name, **kwargs)
+
+
+@contextmanager
+def span(name: str, *, kind: int = KIND_INTERNAL, trace_id: Optional[str] = None, attributes: Optional[dict] = None):
+    """Run the block in a child span of the current one (or a new root when `trace_id` is given)."""
+    tracer = get_tracer()
+    if tracer is None:
+        yield NOOP_SPAN
+        return
+    s = tracer.start_span(name, kind=kind, trace_id=trace_id, attributes=attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        s.end()
@@ -0,0 +1,92 @@
+"""
+Per-request context carried in a ContextVar.
+
+RequestIDMiddleware binds a RequestContext once per request. Anything running
+inside that request reads it in O(1): handlers, dependencies, services, and
+log filters. That includes tasks spawned from it, which copy the context when
+they are created.
+`auth_level` is filled in by the auth dependencies once the caller is known.
+Outside a request (workers, scripts, tests calling services directly) current()
+returns None, and the helpers fall back to neutral defaults.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class RequestContext:
+    request_id: str
+    method: str = ""
+    path: str = ""
+    client_ip: Optional[str] = None
+    auth_level: Optional[str] = None
+    started_at: float = field(default_factory=time.perf_counter)
+    # stage name -> [total ms, count], filled by app.observability.timing.stage()
+    stages: dict = field(default_factory=dict)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000.0
+
+
+_current: ContextVar[Optional[RequestContext]] = ContextVar("mph_request_context", default=None)
+
+
+def bind(ctx: RequestContext) -> Token:
+    return _current.set(ctx)
+
+
+def reset(token: Token) -> None:
+    _current.reset(token)
+
+
+def current() -> Optional[RequestContext]:
+    return _current.get()
+
+
+def get_request_id() -> Optional[str]:
+    ctx = _current.get()
+    return ctx.request_id if ctx is not None else None
+
+
+def set_auth_level(level: Optional[str]) -> None:
+    ctx = _current.get()
+    if ctx is not None and level:
+        # Mutate in place: sync dependencies run in a threadpool copy of the context
+        ctx.auth_level = level
+
+
+def client_ip_from_scope(scope) -> Optional[str]:
+    for name, value in scope.get("headers") or []:
+        if name == b"x-forwarded-for":
+            return value.decode("latin-1").split(",")[0].strip() or None
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+def route_template(scope) -> Optional[str]:
+    """Matched route's path template including its router prefix ("/api/book/download/{chapter_id}")."""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return None
+    # Included routers keep their prefix on the include context rather than on the route
+    included = (scope.get("fastapi") or {}).get("included_router")
+    prefix = getattr(getattr(included, "include_context", None), "prefix", "") or ""
+    return prefix + path
+
+
+class RequestContextLogFilter(logging.Filter):
+    """Stamp request_id (when not passed via extra=) and auth_level onto every record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ctx = _current.get()
+        if not getattr(record, "request_id", None):
+            record.request_id = ctx.request_id if ctx is not None else None
+        if not hasattr(record, "auth_level"):
+            record.auth_level = ctx.auth_level if ctx is not None else None
+        return True
@@ -7,11 +7,29 @@ class RateLimitException(Exception):
         self.retry_after = retry_after
         super().__init__(self.message)
 
+import asyncio
 import time
 import hmac
-from fastapi import Request, HTTPException
-from starlette.status import HTTP_429_TOO_MANY_REQUESTS
-from typing import Callable
+import hashlib
+import logging
+import math
+import os
+import socket
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+from fastapi import Request
+
+from app.observability.metrics import RATE_LIMIT_REJECTIONS
+
+logger = logging.getLogger("mph.rate_limit")
+
+DEFAULT_WINDOW_SECONDS = 60
+
 
 def get_client_ip(request: Request, trust_proxy: bool) -> str:
     if trust_proxy:
@@ -21,27 +39,330 @@ def get_client_ip(request: Request, trust_proxy: bool) -> str:
     return request.client.host or "unknown"
 
 
+def sliding_window_decision(curr: int, prev: int, limit: int, now: float, window_start: float, window: float) -> Tuple[bool, int]:
+    """
+    Sliding-window counter: the previous fixed window's count is weighted by how
+    much of it still overlaps the trailing `window` seconds. This removes the
+    double burst a plain fixed window allows at window edges.
+    Returns (allowed, retry_after_seconds). `curr` excludes the request being checked.
+    """
+    elapsed = now - window_start
+    weight = max(0.0, 1.0 - elapsed / window)
+    if prev * weight + curr + 1 <= limit:
+        return True, 0
+    if curr + 1 > limit:
+        # Wait for this window to roll over and decay enough as the previous one
+        need = window * (1.0 - (limit - 1) / curr) if curr else 0.0
+        wait = (window_start + window - now) + need
+    else:
+        need = window * (1.0 - (limit - curr - 1) / prev)
+        wait = window_start + need - now
+    return False, max(1, int(math.ceil(wait)))
+
+
+class InMemoryRateLimitBackend:
+    """Per-process store with LRU eviction; never holds more than max_keys entries."""
+
+    def __init__(self, max_keys: int = 10_000):
+        self.max_keys = max(1, int(max_keys))
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def hit(self, key: str, limit: int, window: int, now: float) -> Tuple[bool, int]:
+        idx = int(now // window)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = [idx, 0, 0]
+                self._entries[key] = entry
+                if len(self._entries) > self.max_keys:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+            if entry[0] != idx:
+                entry[2] = entry[1] if entry[0] == idx - 1 else 0
+                entry[1] = 0
+                entry[0] = idx
+            allowed, retry_after = sliding_window_decision(entry[1], entry[2], limit, now, idx * window, window)
+            if allowed:
+                entry[1] += 1
+            return allowed, retry_after
+
+
+class SharedMemoryRateLimitBackend:
+    """
+    Fixed-size hash table in a memory-mapped file (default under /dev/shm), shared by
+    every uvicorn worker on the host and guarded by an fcntl lock. Memory is bounded
+    by `slots`; when a probe run is full the least recently seen slot is evicted.
+    POSIX only.
+    """
+
+    MAGIC = 0x4D50484C  # "MPHL"
+    HEADER = struct.Struct("<II8x")
+    SLOT = struct.Struct("<QqIId")  # key hash, window index, curr, prev, last seen
+    PROBE = 8
+
+    def __init__(self, path: Optional[str] = None, slots: int = 10_000):
+        import fcntl
+        import mmap
+
+        self._fcntl = fcntl
+        self.slots = max(self.PROBE, int(slots))
+        if path is None:
+            base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            path = os.path.join(base, "mph_ratelimit.bin")
+        self.path = path
+        size = self.HEADER.size + self.slots * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._thread_lock = threading.Lock()
+        with self._locked():
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._mm = mmap.mmap(self._fd, size)
+            magic, slots_on_disk = self.HEADER.unpack_from(self._mm, 0)
+            if magic != self.MAGIC or slots_on_disk != self.slots:
+                self._mm[:] = bytes(size)
+                self.HEADER.pack_into(self._mm, 0, self.MAGIC, self.slots)
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        h = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        return h or 1
+
+    def _offset(self, slot: int) -> int:
+        return self.HEADER.size + slot * self.SLOT.size
+
+    def hit(self, key: str, limit: int, window: int, now: float) -> Tuple[bool, int]:
+        h = self._hash(key)
+        idx = int(now // window)
+        start = h % self.slots
+        with self._locked():
+            chosen = None
+            victim, victim_seen = None, None
+            for i in range(self.PROBE):
+                slot = (start + i) % self.slots
+                kh, widx, curr, prev, seen = self.SLOT.unpack_from(self._mm, self._offset(slot))
+                if kh == h:
+                    chosen = (slot, widx, curr, prev)
+                    break
+                if kh == 0:
+                    chosen = (slot, idx, 0, 0)
+                    break
+                if victim_seen is None or seen < victim_seen:
+                    victim, victim_seen = slot, seen
+            if chosen is None:
+                chosen = (victim, idx, 0, 0)
+            slot, widx, curr, prev = chosen
+            if widx != idx:
+                prev = curr if widx == idx - 1 else 0
+                curr = 0
+            allowed, retry_after = sliding_window_decision(curr, prev, limit, now, idx * window, window)
+            if allowed:
+                curr += 1
+            self.SLOT.pack_into(self._mm, self._offset(slot), h, idx, curr, prev, now)
+            return allowed, retry_after
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+
+class RedisRateLimitBackend:
+    """
+    Sliding-window counter on any Redis-protocol server, shared by every process
+    that points at it. Speaks RESP directly (GET/INCR/DECR/PEXPIRE) over one
+    pipelined socket round trip; keys expire after two windows.
+
+    The socket calls block, so RateLimiter.acheck runs them in a worker thread.
+    """
+
+    blocking_io = True
+
+    def __init__(self, url: str, prefix: str = "mph:rl:", timeout: float = 0.5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int((parsed.path or "/0").lstrip("/") or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._buf = b""
+        self._lock = threading.Lock()
+
+    # --- minimal RESP client ---
+    @staticmethod
+    def _encode(*args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            b = a if isinstance(a, bytes) else str(a).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(b), b))
+        return b"".join(out)
+
+    def _readline(self) -> bytes:
+        while b"\r\n" not in self._buf:
+            chunk = self._sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("redis connection closed")
+            self._buf += chunk
+        line, self._buf = self._buf.split(b"\r\n", 1)
+        return line
+
+    def _read_reply(self):
+        line = self._readline()
+        kind, rest = line[:1], line[1:]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            while len(self._buf) < n + 2:
+                chunk = self._sock.recv(4096)
+                if not chunk:
+                    raise ConnectionError("redis connection closed")
+                self._buf += chunk
+            data, self._buf = self._buf[:n], self._buf[n + 2:]
+            return data
+        if kind == b"*":
+            return [self._read_reply() for _ in range(int(rest))]
+        raise RuntimeError(f"unexpected RESP reply: {line!r}")
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock, self._buf = sock, b""
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            self._pipeline(setup)
+
+    def _pipeline(self, commands):
+        self._sock.sendall(b"".join(self._encode(*c) for c in commands))
+        return [self._read_reply() for _ in commands]
+
+    def execute(self, commands):
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._pipeline(commands)
+                except (OSError, ConnectionError):
+                    self.close()
+                    if attempt == 2:
+                        raise
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+    def hit(self, key: str, limit: int, window: int, now: float) -> Tuple[bool, int]:
+        idx = int(now // window)
+        curr_key = f"{self.prefix}{key}:{idx}"
+        prev_key = f"{self.prefix}{key}:{idx - 1}"
+        prev_raw, curr, _ = self.execute([
+            ("GET", prev_key),
+            ("INCR", curr_key),
+            ("PEXPIRE", curr_key, window * 2000),
+        ])
+        prev = int(prev_raw or 0)
+        # INCR already counted this request; undo it if it is rejected
+        allowed, retry_after = sliding_window_decision(curr - 1, prev, limit, now, idx * window, window)
+        if not allowed:
+            self.execute([("DECR", curr_key)])
+        return allowed, retry_after
+
+
 class RateLimiter:
-    def __init__(self):
-        self._store = {}
+    """
+    Applies per-route limits through a backend. When the backend fails, limits
+    degrade to a per-process in-memory store, and the backend is left alone for
+    `backend_retry_seconds` instead of being retried (and timing out) on every call.
+    """
+
+    def __init__(self, backend=None, window_seconds: int = DEFAULT_WINDOW_SECONDS, backend_retry_seconds: float = 30.0, clock=time.monotonic):
+        self.backend = backend or InMemoryRateLimitBackend()
+        self.window_seconds = window_seconds
+        self.backend_retry_seconds = float(backend_retry_seconds)
+        self._clock = clock
+        self._fallback = InMemoryRateLimitBackend()
+        self._backend_down_until = 0.0
+
+    def _hit(self, key: str, limit: int, now: float) -> Tuple[bool, int]:
+        if self._clock() >= self._backend_down_until:
+            try:
+                return self.backend.hit(key, limit, self.window_seconds, now)
+            except Exception:
+                # Shared store unreachable: degrade to per-process limits rather than failing requests
+                self._backend_down_until = self._clock() + self.backend_retry_seconds
+                logger.warning(
+                    "rate_limit_backend_unavailable backend=%s retry_in_s=%s",
+                    type(self.backend).__name__, self.backend_retry_seconds, exc_info=True,
+                )
+        return self._fallback.hit(key, limit, self.window_seconds, now)
 
     def check(self, ip: str, route_name: str, limit: int):
-        import os
         now = time.time()
         key = f"{route_name}:{ip}"
         ns = os.environ.get("PYTEST_CURRENT_TEST")
         if ns:
             key = f"{ns}|{key}"
-        window = int(now // 60)
-        entry = self._store.get(key)
-        if entry is None or entry[0] != window:
-            self._store[key] = (window, 1)
-        else:
-            count = entry[1] + 1
-            if count > limit:
-                retry_after = 60 - int(now % 60)
-                raise RateLimitException(route_name, retry_after)
-            self._store[key] = (window, count)
+        allowed, retry_after = self._hit(key, limit, now)
+        if not allowed:
+            RATE_LIMIT_REJECTIONS.labels(route_name).inc()
+            raise RateLimitException(route_name, retry_after)
+
+    async def acheck(self, ip: str, route_name: str, limit: int):
+        """check() for async handlers: a network backend's round trip runs off the event loop."""
+        if getattr(self.backend, "blocking_io", False) and self._clock() >= self._backend_down_until:
+            return await asyncio.to_thread(self.check, ip, route_name, limit)
+        return self.check(ip, route_name, limit)
+
+
+def build_rate_limit_backend(settings):
+    kind = (getattr(settings, "RATE_LIMIT_BACKEND", "memory") or "memory").lower()
+    max_keys = int(getattr(settings, "RATE_LIMIT_MAX_KEYS", 10_000))
+    if kind == "shared":
+        return SharedMemoryRateLimitBackend(getattr(settings, "RATE_LIMIT_SHARED_PATH", None), slots=max_keys)
+    if kind == "redis":
+        return RedisRateLimitBackend(getattr(settings, "RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0"))
+    if kind != "memory":
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {kind}")
+    return InMemoryRateLimitBackend(max_keys=max_keys)
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter shared by every route (login, generate, ...)."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        from app.models.config import get_settings
+        _rate_limiter = RateLimiter(build_rate_limit_backend(get_settings()))
+    return _rate_limiter
 
 def safe_compare(a: str, b: str) -> bool:
     return hmac.compare_digest(a, b)
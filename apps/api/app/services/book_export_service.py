@@ -1,5 +1,3 @@
-from docx import Document
-from docx.shared import Pt, Inches
 from pathlib import Path
 
 
@@ -8,7 +6,10 @@ class BookExportService:
     
     def export_chapter(self, chapter_name: str, transcribed_text: str, output_path: Path):
         """Export chapter as editable Word document"""
-        
+        # python-docx is only needed here; importing it lazily keeps API startup light
+        from docx import Document
+        from docx.shared import Inches, Pt
+
         doc = Document()
         
         # Add chapter title
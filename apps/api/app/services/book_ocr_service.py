@@ -1,56 +1,71 @@
 
-from openai import AsyncOpenAI
-from app.models.config import get_settings
+from app.services.openai_client import get_openai_client
 from typing import List
 import base64
-from app.services.openai_guard import call_openai_with_retry
-
-settings = get_settings()
+from app.observability import tracing
+from app.services.openai_scheduler import BULK, call_openai_scheduled, estimate_tokens
 
 
 class BookOCRService:
     """OCR service for book transcription - exact word-for-word transcription"""
     
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client or get_openai_client()
     
-    async def transcribe_pages(self, image_paths: List[str]) -> str:
-        """Transcribe multiple book pages in order, preserving exact text"""
+    async def transcribe_pages(self, image_paths: List[str], tenant: str = "default") -> str:
+        """Transcribe multiple book pages in order, preserving exact text.
+        `tenant` groups the pages for fair queuing against other bulk uploads."""
         parts: list[str] = []
         for i, image_path in enumerate(image_paths, 1):
             with open(image_path, "rb") as image_file:
                 image_data = base64.b64encode(image_file.read()).decode('utf-8')
 
-            async def _do_call():
-                return await self.client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
+            messages = [
+                {
+                    "role": "system",
+                    "content": (
+                        "Transcribe all visible text from the image(s) verbatim. Preserve line breaks. If a word is unclear, write [illegible]. Do not add commentary."
+                    )
+                },
+                {
+                    "role": "user",
+                    "content": [
                         {
-                            "role": "system",
-                            "content": (
-                                "Transcribe all visible text from the image(s) verbatim. Preserve line breaks. If a word is unclear, write [illegible]. Do not add commentary."
-                            )
+                            "type": "text",
+                            "text": f"Transcribe this page (Page {i}):"
                         },
                         {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": f"Transcribe this page (Page {i}):"
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{image_data}"
-                                    }
-                                }
-                            ]
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/jpeg;base64,{image_data}"
+                            }
                         }
-                    ],
+                    ]
+                }
+            ]
+
+            async def _do_call():
+                return await self.client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=messages,
                     max_tokens=2000
                 )
 
-            response = await call_openai_with_retry(_do_call, max_attempts=3, per_attempt_timeout_s=20.0)
+            # Book OCR is bulk work: it yields to interactive proposal/transcribe calls
+            with tracing.span("ocr.page", attributes={"page": i}):
+                response = await call_openai_scheduled(
+                    _do_call,
+                    priority=BULK,
+                    tenant=tenant,
+                    estimated_tokens=estimate_tokens(messages, 2000),
+                    max_attempts=3,
+                    per_attempt_timeout_s=20.0,
+                    operation="book_ocr",
+                )
             page_text = response.choices[0].message.content
             parts.append(f"--- Page {i} ---\n{page_text}")
         return "\n\n---\n\n".join(parts)
@@ -0,0 +1,66 @@
+"""
+Process-wide service instances.
+
+Routers and services used to build their own FileManager / ExportService /
+OCR service at import time (five FileManagers, each running mkdir and reading
+settings). They now share the instances held here. Each one is built on first
+access, so importing app.main touches no settings, disk or heavy render/OCR
+library. The FastAPI lifespan calls start() and aclose() around the server.
+
+Construction of every service is cheap; the expensive parts (openai, reportlab,
+pypdf, python-docx) are imported by the code paths that use them.
+"""
+from __future__ import annotations
+
+from functools import cached_property
+from typing import Optional
+
+
+class ServiceContainer:
+    @cached_property
+    def file_manager(self):
+        from app.storage.file_manager import FileManager
+        return FileManager()
+
+    @cached_property
+    def export_service(self):
+        from app.services.export_service import ExportService
+        return ExportService()
+
+    @cached_property
+    def book_export_service(self):
+        from app.services.book_export_service import BookExportService
+        return BookExportService()
+
+    @cached_property
+    def ocr_service(self):
+        from app.services.ocr_service import OCRService
+        return OCRService()
+
+    @cached_property
+    def book_ocr_service(self):
+        from app.services.book_ocr_service import BookOCRService
+        return BookOCRService()
+
+    @cached_property
+    def formatting_service(self):
+        from app.services.formatting_service import FormattingService
+        return FormattingService()
+
+    def start(self) -> None:
+        """Startup work that used to happen at import: the data directories."""
+        self.file_manager.ensure_dirs()
+
+    async def aclose(self) -> None:
+        from app.services.openai_client import close_openai_client
+        await close_openai_client()
+
+
+_services: Optional[ServiceContainer] = None
+
+
+def get_services() -> ServiceContainer:
+    global _services
+    if _services is None:
+        _services = ServiceContainer()
+    return _services
@@ -1,38 +1,21 @@
-CONTRACTOR_PROMPT_PREFIX = (
-    "You MUST return exactly one JSON object matching the ContractorDocV1 schema.\n"
-    "Do NOT return markdown. Do NOT wrap in code fences. Do NOT add any extra text.\n"
-    "No extra keys allowed. No explanations.\n"
-    "The top-level object MUST contain ONLY these keys: schema_version, client_name, client_address, line_items, total_cents.\n"
-    "Do NOT nest under another object. Do NOT add extra keys. Do NOT omit required keys.\n"
-    "\n"
-    "Example ContractorDocV1 JSON:\n"
-    "{\n"
-    "  \"schema_version\": \"v1\",\n"
-    "  \"client_name\": \"Jane Smith\",\n"
-    "  \"client_address\": \"123 Main St, Denver, CO\",\n"
-    "  \"line_items\": [\n"
-    "    {\n"
-    "      \"description\": \"Install carpet\",\n"
-    "      \"amount_cents\": 120000\n"
-    "    },\n"
-    "    {\n"
-    "      \"description\": \"Remove old carpet\",\n"
-    "      \"amount_cents\": 20000\n"
-    "    }\n"
-    "  ],\n"
-    "  \"total_cents\": 140000\n"
-    "}\n"
-)
-from app.services.openai_guard import call_openai_with_retry
-
-
-from openai import AsyncOpenAI
-from app.models.config import get_settings
+from app.services.openai_guard import OpenAIFailure, call_openai_with_retry, get_openai_guard
+from app.services.openai_scheduler import INTERACTIVE, call_openai_scheduled, estimate_tokens, openai_slot
+from app.services.openai_client import get_openai_client
+from app.services.response_cache import cache_key, get_response_cache
+from app.services.usage_tracker import extract_usage, get_usage_tracker
+from app.services.single_flight import single_flight
+from app.ai.prompts import AI_DOC, CONTRACTOR_DOC, REWRITE, SINGLE_CALL, notes_block
 from app.models.schemas import ProposalData
+import asyncio
+import hashlib
 import json
 import logging
+import threading
+import time
 logger = logging.getLogger("api.formatting_service")
-settings = get_settings()
+
+# Longest gap tolerated between streamed chunks before the stream counts as stalled
+STREAM_IDLE_TIMEOUT_S = 20.0
 
 from app.errors import StandardizedAIError
 from app.ai.validate import validate_ai_doc_v1
@@ -40,103 +23,273 @@ from app.ai.validate import validate_ai_doc_v1
 def _format_validation_errors(err: Exception) -> str:
     return str(err)[:2000]
 
-PROMPT_PREFIX = (
-    "You MUST return exactly one JSON object that matches the AiDocV1 schema.\n"
-    "The top-level object MUST contain ONLY these keys:\n"
-    "\"schema_version\"\n"
-    "\"currency\"\n"
-    "\"locale\"\n"
-    "\"client\"\n"
-    "\"project\"\n"
-    "\"line_items\"\n"
-    "\"totals\"\n"
-    "\"source\" (if applicable per schema)\n"
-    "Do NOT create an 'invoice' object.\n"
-    "Do NOT nest all fields under another object.\n"
-    "Do NOT add extra keys.\n"
-    "Do NOT omit required keys.\n"
-    "\n"
-    "Example of valid top-level structure:\n"
-    "{\n"
-    "  \"schema_version\": \"1.0\",\n"
-    "  \"currency\": \"USD\",\n"
-    "  \"locale\": \"en-US\",\n"
-    "  \"client\": { ... },\n"
-    "  \"project\": { ... },\n"
-    "  \"line_items\": [\n"
-    "    {\n"
-    "      \"description\": \"Demo carpet\",\n"
-    "      \"quantity\": 1,\n"
-    "      \"unit_price_cents\": 100000,\n"
-    "      \"total_cents\": 100000\n"
-    "    }\n"
-    "  ],\n"
-    "  \"totals\": {\n"
-    "    \"subtotal_cents\": 100000,\n"
-    "    \"total_cents\": 100000\n"
-    "  }\n"
-    "}\n"
-    "\n"
-    "Return ONLY JSON.\n"
-    "No markdown.\n"
-    "No explanations.\n"
-    "No extra wrapping objects.\n"
-)
-
-async def generate_doc(user_prompt, llm_client):
+
+class SchemaWinStats:
+    """How often each schema attempt produced the document generate_doc returned."""
+
+    OUTCOMES = ("contractor_v1", "ai_doc_v1", "ai_doc_v1_repair", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self.cancelled = 0
+
+    def record(self, mode: str, outcome: str) -> None:
+        with self._lock:
+            per_mode = self._counts.setdefault(mode, dict.fromkeys(self.OUTCOMES, 0))
+            per_mode[outcome] += 1
+
+    def record_cancelled(self) -> None:
+        with self._lock:
+            self.cancelled += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"wins": {mode: dict(c) for mode, c in self._counts.items()}, "cancelled_attempts": self.cancelled}
+
+
+schema_win_stats = SchemaWinStats()
+
+
+async def _cache_get(key: str, use_cache: bool):
+    cache = get_response_cache()
+    if cache is None or not use_cache:
+        return None
+    return await asyncio.to_thread(cache.get, key)
+
+
+async def _cache_set(key: str, value) -> None:
+    # Bypassed requests still refresh the entry
+    cache = get_response_cache()
+    if cache is not None:
+        await asyncio.to_thread(cache.set, key, value)
+
+
+def _speculative_enabled() -> bool:
+    from app.models import config
+    return bool(getattr(config.get_settings(), "GENERATE_DOC_SPECULATIVE", False))
+
+
+async def generate_doc(user_prompt, llm_client, speculative=None):
+    """
+    Produce a validated ContractorDocV1 or AiDocV1 from `user_prompt`.
+    Sequential mode tries ContractorDocV1, then AiDocV1, then one AiDocV1 repair.
+    Speculative mode (GENERATE_DOC_SPECULATIVE) sends the ContractorDocV1 and AiDocV1
+    prompts concurrently, keeps the first that validates and cancels the other.
+    It only runs while the OpenAI circuit breaker is closed: a recovering upstream
+    gets one probe at a time, not two racing requests.
+    """
     from app.ai.schema_contractor_v1 import validate_contractor_doc_v1
-    contractor_prompt = CONTRACTOR_PROMPT_PREFIX + user_prompt
-    async def call_model(prompt: str) -> str:
+    contractor_messages = CONTRACTOR_DOC.messages(user_prompt)
+    ai_doc_messages = AI_DOC.messages(user_prompt)
+    if speculative is None:
+        speculative = _speculative_enabled()
+    if speculative and get_openai_guard().breaker.snapshot()["state"] != "closed":
+        speculative = False
+    mode = "speculative" if speculative else "sequential"
+
+    async def call_model(messages: list) -> str:
         async def _do_call():
             return await llm_client.chat.completions.create(
                 model="gpt-4o",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
+                messages=messages,
                 temperature=0.0,
                 top_p=1.0,
                 presence_penalty=0.0,
                 frequency_penalty=0.0,
                 max_tokens=2000
             )
-        response = await call_openai_with_retry(_do_call, max_attempts=3, per_attempt_timeout_s=20.0)
-        return response.choices[0].message.content
+        async def _fetch():
+            response = await call_openai_scheduled(
+                _do_call,
+                priority=INTERACTIVE,
+                estimated_tokens=estimate_tokens(messages, 2000),
+                max_attempts=3,
+                per_attempt_timeout_s=20.0,
+                operation="generate_doc",
+            )
+            return response.choices[0].message.content
+        # Identical prompts in flight at once (double submit) share one upstream call
+        key = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+        return await single_flight("generate_doc", key, _fetch)
 
-    # Try ContractorDocV1 first
-    raw_contractor = await call_model(contractor_prompt)
-    try:
-        contractor_doc = validate_contractor_doc_v1(raw_contractor)
-        return contractor_doc
-    except Exception as contractor_exc:
-        logger.info("CONTRACTOR VALIDATION FAILED: %s", str(contractor_exc))
-        logger.info("CONTRACTOR RAW RESPONSE (truncated): %s", raw_contractor[:2000])
-        # Fallback to AiDocV1 logic unchanged
-        base_prompt = PROMPT_PREFIX + user_prompt
-        raw1 = await call_model(base_prompt)
+    async def attempt_contractor():
+        raw = await call_model(contractor_messages)
         try:
-            doc = validate_ai_doc_v1(raw1)
-            return doc
+            return validate_contractor_doc_v1(raw)
+        except Exception as contractor_exc:
+            logger.info("CONTRACTOR VALIDATION FAILED: %s", str(contractor_exc))
+            logger.info("CONTRACTOR RAW RESPONSE (truncated): %s", raw[:2000])
+            raise
+
+    async def attempt_ai_doc():
+        raw = await call_model(ai_doc_messages)
+        try:
+            return validate_ai_doc_v1(raw)
         except Exception as e1:
             logger.error("AIDOC VALIDATION FAILED: %s", str(e1))
-            logger.error("AIDOC RAW RESPONSE (truncated): %s", raw1[:2000])
-            err_txt = _format_validation_errors(e1)
-            retry_prompt = (
-                base_prompt
-                + "\n\nVALIDATION ERRORS:\n"
-                + err_txt
-                + "\n\nFix ONLY what is needed to satisfy AiDocV1. "
-                  "Return exactly one JSON object, no extra keys, no markdown."
+            logger.error("AIDOC RAW RESPONSE (truncated): %s", raw[:2000])
+            raise
+
+    async def repair_ai_doc(e1):
+        err_txt = _format_validation_errors(e1)
+        retry_messages = AI_DOC.messages(
+            user_prompt
+            + "\n\nVALIDATION ERRORS:\n"
+            + err_txt
+            + "\n\nFix ONLY what is needed to satisfy AiDocV1. "
+              "Return exactly one JSON object, no extra keys, no markdown."
+        )
+        raw2 = await call_model(retry_messages)
+        try:
+            doc2 = validate_ai_doc_v1(raw2)
+        except Exception as e2:
+            schema_win_stats.record(mode, "failed")
+            raise StandardizedAIError(
+                code="AI_SCHEMA_VALIDATION_FAILED",
+                message="AI output failed schema validation after retry.",
+                detail={"first_error": err_txt, "second_error": _format_validation_errors(e2)}
             )
-            raw2 = await call_model(retry_prompt)
-            try:
-                doc2 = validate_ai_doc_v1(raw2)
-                return doc2
-            except Exception as e2:
-                raise StandardizedAIError(
-                    code="AI_SCHEMA_VALIDATION_FAILED",
-                    message="AI output failed schema validation after retry.",
-                    detail={"first_error": err_txt, "second_error": _format_validation_errors(e2)}
-                )
+        schema_win_stats.record(mode, "ai_doc_v1_repair")
+        return doc2
+
+    if not speculative:
+        # Try ContractorDocV1 first
+        try:
+            doc = await attempt_contractor()
+            schema_win_stats.record(mode, "contractor_v1")
+            return doc
+        except (OpenAIFailure, asyncio.CancelledError):
+            raise
+        except Exception:
+            pass
+        # Fallback to AiDocV1 logic unchanged
+        try:
+            doc = await attempt_ai_doc()
+            schema_win_stats.record(mode, "ai_doc_v1")
+            return doc
+        except (OpenAIFailure, asyncio.CancelledError):
+            raise
+        except Exception as e1:
+            return await repair_ai_doc(e1)
+
+    tasks = {
+        asyncio.ensure_future(attempt_contractor()): "contractor_v1",
+        asyncio.ensure_future(attempt_ai_doc()): "ai_doc_v1",
+    }
+    ai_doc_error = None
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                exc = task.exception()
+                if exc is None:
+                    schema_win_stats.record(mode, tasks[task])
+                    return task.result()
+                if isinstance(exc, OpenAIFailure):
+                    raise exc
+                if tasks[task] == "ai_doc_v1":
+                    ai_doc_error = exc
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+                schema_win_stats.record_cancelled()
+        # Let cancelled attempts unwind so scheduler slots are released before returning
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return await repair_ai_doc(ai_doc_error)
+
+
+
+
+
+def build_rewrite_messages(combined_text: str) -> list:
+    return REWRITE.messages(notes_block(combined_text))
+
+
+def normalize_proposal_data(data: dict, ocr_text: str = "") -> dict:
+    """Map model output (ContractorDocV1, AiDocV1-ish or ad-hoc keys) onto ProposalData fields in place."""
+    # Client name mapping
+    def _get_nested(dct, *keys):
+        for k in keys:
+            if isinstance(dct, dict) and k in dct and dct[k]:
+                return dct[k]
+        return None
+
+    if not data.get("client_name"):
+        data["client_name"] = (
+            data.get("customer_name")
+            or data.get("name")
+            or data.get("bill_to_name")
+            or _get_nested(data.get("client", {}), "name")
+            or _get_nested(data.get("bill_to", {}), "name")
+        )
+
+    # Project address mapping (keep existing logic, add nested)
+    if data.get("client_address") and not data.get("project_address"):
+        data["project_address"] = data["client_address"]
+    if data.get("address") and not data.get("project_address"):
+        data["project_address"] = data["address"]
+    # Nested: client["address"], bill_to["address"]
+    if not data.get("project_address"):
+        nested_addr = (
+            _get_nested(data.get("client", {}), "address")
+            or _get_nested(data.get("bill_to", {}), "address")
+        )
+        if nested_addr:
+            data["project_address"] = nested_addr
+    if data.get("project_address") and not data.get("client_address"):
+        data["client_address"] = data["project_address"]
+
+    # Line items mapping + cents->dollars
+    if isinstance(data.get("line_items"), list):
+        for item in data["line_items"]:
+            # amount_cents -> amount
+            if "amount_cents" in item and "amount" not in item:
+                try:
+                    item["amount"] = float(item["amount_cents"]) / 100.0
+                except Exception:
+                    pass
+            # description mapping
+            if not item.get("description"):
+                desc = item.get("item") or item.get("name")
+                if desc:
+                    item["description"] = desc
+
+    # Total cents->dollars
+    if not data.get("total") and data.get("total_cents"):
+        try:
+            data["total"] = float(data["total_cents"]) / 100.0
+        except Exception:
+            pass
+
+    # --- Fallback extraction from original input text (OCR/professional_text) ---
+    lines = [line.strip() for line in ocr_text.splitlines() if line.strip()]
+
+    # Fallback client_name extraction
+    if not data.get("client_name") and lines:
+        for line in lines:
+            for prefix in ("Client:", "Bill To:", "Customer:"):
+                if line.startswith(prefix):
+                    val = line[len(prefix):].strip()
+                    if val:
+                        data["client_name"] = val
+                        break
+            if data.get("client_name"):
+                break
+
+    # Fallback project_address extraction
+    if not data.get("project_address") and lines:
+        import re
+        address_pattern = re.compile(r"\b\d+\b.*\b(St|Ave|Rd|Dr|Way|Ln|Blvd|Ct)\b", re.IGNORECASE)
+        for line in lines[:10]:  # Only check first 10 lines
+            if address_pattern.search(line):
+                data["project_address"] = line
+                break
+
+    return data
+
 
 class FormattingService:
     async def structure_proposal(self, *args, **kwargs):
@@ -169,142 +322,25 @@ class FormattingService:
                 "Proposal output was not a JSON object."
             )
         # --- ProposalData normalization block ---
-        # Client name mapping
-        def _get_nested(dct, *keys):
-            for k in keys:
-                if isinstance(dct, dict) and k in dct and dct[k]:
-                    return dct[k]
-            return None
-
-        if not data.get("client_name"):
-            data["client_name"] = (
-                data.get("customer_name")
-                or data.get("name")
-                or data.get("bill_to_name")
-                or _get_nested(data.get("client", {}), "name")
-                or _get_nested(data.get("bill_to", {}), "name")
-            )
-
-        # Project address mapping (keep existing logic, add nested)
-        if data.get("client_address") and not data.get("project_address"):
-            data["project_address"] = data["client_address"]
-        if data.get("address") and not data.get("project_address"):
-            data["project_address"] = data["address"]
-        # Nested: client["address"], bill_to["address"]
-        if not data.get("project_address"):
-            nested_addr = (
-                _get_nested(data.get("client", {}), "address")
-                or _get_nested(data.get("bill_to", {}), "address")
-            )
-            if nested_addr:
-                data["project_address"] = nested_addr
-        if data.get("project_address") and not data.get("client_address"):
-            data["client_address"] = data["project_address"]
-
-        # Line items mapping + cents->dollars
-        if isinstance(data.get("line_items"), list):
-            for item in data["line_items"]:
-                # amount_cents -> amount
-                if "amount_cents" in item and "amount" not in item:
-                    try:
-                        item["amount"] = float(item["amount_cents"]) / 100.0
-                    except Exception:
-                        pass
-                # description mapping
-                if not item.get("description"):
-                    desc = item.get("item") or item.get("name")
-                    if desc:
-                        item["description"] = desc
-
-        # Total cents->dollars
-        if not data.get("total") and data.get("total_cents"):
-            try:
-                data["total"] = float(data["total_cents"]) / 100.0
-            except Exception:
-                pass
-
-        # --- Fallback extraction from original input text (OCR/professional_text) ---
         # Use the first OCR input as the source text
         ocr_text = ocr[0] if ocr and isinstance(ocr[0], str) else ""
-        lines = [line.strip() for line in ocr_text.splitlines() if line.strip()]
-
-        # Fallback client_name extraction
-        if not data.get("client_name") and lines:
-            for line in lines:
-                for prefix in ("Client:", "Bill To:", "Customer:"):
-                    if line.startswith(prefix):
-                        val = line[len(prefix):].strip()
-                        if val:
-                            data["client_name"] = val
-                            break
-                if data.get("client_name"):
-                    break
-
-        # Fallback project_address extraction
-        if not data.get("project_address") and lines:
-            import re
-            address_pattern = re.compile(r"\b\d+\b.*\b(St|Ave|Rd|Dr|Way|Ln|Blvd|Ct)\b", re.IGNORECASE)
-            for line in lines[:10]:  # Only check first 10 lines
-                if address_pattern.search(line):
-                    data["project_address"] = line
-                    break
-
-        # --- End ProposalData normalization block ---
-        return data
-
-    async def rewrite_structured_proposal(self, ocr_texts: list[str]) -> str:
+        return normalize_proposal_data(data, ocr_text)
+
+    async def rewrite_structured_proposal(self, ocr_texts: list[str], use_cache: bool = True) -> str:
         filtered = [t for t in ocr_texts if t.strip()]
         combined_text = "\n\n".join(filtered)
-        prompt = (
-            "You are turning handwritten notes into a clean invoice/proposal scope list.\n"
-            "Hard rules:\n"
-            "- Plain text only. No markdown.\n"
-            "- Output each line as plain text. Do NOT include bullets (no '•', no '-', no numbering).\n"
-            "- Do NOT include client name, address, or any header information in the output body.\n"
-            "- Do NOT include printed/letterhead content (company slogans, phone, email, address).\n"
-            "- Do NOT include 'Session:' or 'Page:' lines.\n"
-            "- Do NOT output stand-alone numbers or an 'Amount' section.\n"
-            "Pricing Rules:\n"
-            "- If the handwritten notes contain no dollar amounts anywhere, do NOT invent pricing.\n"
-            "- In that case, output the scope only and include a final line:\n"
-            "  'Total: TO BE DETERMINED'\n"
-            "- If a line shows a price range (example: 5000-7000 or 5,000 – 7,000):\n"
-            "  Format it exactly as:\n"
-            "  'Description — $5,000.00 – $7,000.00'\n"
-            "- If any line uses a range price, the final total must also show a range:\n"
-            "  'Total: $X,XXX.XX – $Y,YYY.YY'\n"
-            "- Always normalize money with '$' and two decimals.\n"
-            "- Never output stand-alone number columns.\n"
-            "Output format:\n"
-            "- Produce a list of line items.\n"
-            "- Each line item must include a description. A price is optional.\n"
-            "- If priced:  'Description — $1,234.56'\n"
-            "- If unpriced: 'Description'\n"
-            "- Do not invent prices. Do not assign the final total to a random line item.\n"
-            "- If the notes show an amount off to the right (like '650 00'), treat it as $650.00.\n"
-            "- If an amount has no '$' or no decimals, normalize it to dollars with two decimals.\n"
-            "- If you cannot confidently find a price for a scope line, KEEP the line but output it with NO price.\n"
-            "- Stand-alone numbers (e.g. 192, 12600) should only be used as Total if clearly the final total; otherwise ignore them.\n"
-            "- Do NOT merge separate scope lines into one combined line, even if they are adjacent.\n"
-            "- If two separate amounts appear (e.g., 175 and 75), keep them as separate line items.\n"
-            "- If a final handwritten total exists (e.g., 12,600), use ONLY that as the Total.\n"
-            "- Do NOT recompute or sum line items.\n"
-            "- Never add line items together to create new totals.\n"
-            "Voice:\n"
-            "Older, friendly, experienced construction owner: plain, direct, practical wording."
-        )
-        full_prompt = (
-            prompt
-            + "\n\n=== BEGIN HANDWRITTEN NOTES ===\n"
-            + combined_text
-            + "\n=== END HANDWRITTEN NOTES ===\n"
-        )
+        key = cache_key("rewrite", combined_text, REWRITE.version, "gpt-4o", 0.0)
+        cached = await _cache_get(key, use_cache)
+        if cached is not None:
+            logger.info("=== REWRITE_CACHE_HIT === %s", key[:12])
+            return cached
+        messages = build_rewrite_messages(combined_text)
         async def _do_call():
             model_name = "gpt-4o"
             temperature_value = 0.0
             max_tokens_value = 4000
-            system_prompt_string = None
-            user_prompt_string = full_prompt
+            system_prompt_string = messages[0]["content"]
+            user_prompt_string = messages[1]["content"]
             logger.info("=== REWRITE_MODEL === %s", model_name)
             logger.info("=== REWRITE_TEMPERATURE === %s", temperature_value)
             logger.info("=== REWRITE_MAX_TOKENS === %s", max_tokens_value)
@@ -321,22 +357,142 @@ class FormattingService:
             logger.info("=== REWRITE_USER_PROMPT_START ===\n%s\n=== REWRITE_USER_PROMPT_END ===", fp_log)
             return await self.client.chat.completions.create(
                 model=model_name,
-                messages=[
-                    {"role": "user", "content": full_prompt}
-                ],
+                messages=messages,
                 max_tokens=max_tokens_value,
                 temperature=temperature_value
             )
-        response = await call_openai_with_retry(_do_call, max_attempts=3, per_attempt_timeout_s=20.0)
-        return response.choices[0].message.content.strip()
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        async def _rewrite():
+            response = await call_openai_scheduled(
+                _do_call,
+                priority=INTERACTIVE,
+                estimated_tokens=estimate_tokens(messages, 4000),
+                max_attempts=3,
+                per_attempt_timeout_s=20.0,
+                operation="rewrite",
+            )
+            result = response.choices[0].message.content.strip()
+            await _cache_set(key, result)
+            return result
+        return await single_flight("rewrite", key, _rewrite)
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client or get_openai_client()
 
     @staticmethod
     async def generate_doc(user_prompt, llm_client):
         return await generate_doc(user_prompt, llm_client)
 
-    async def rewrite_professional(self, user_prompt: str) -> str:
+    async def rewrite_professional(self, user_prompt: str, use_cache: bool = True) -> str:
         # Restore original behavior: return only clean professional prose text
         # This should not return JSON or dict, only formatted text
-        return await self.rewrite_structured_proposal([user_prompt])
+        return await self.rewrite_structured_proposal([user_prompt], use_cache=use_cache)
+
+    async def stream_rewrite_professional(self, user_prompt: str, use_cache: bool = True):
+        """
+        Streaming variant of rewrite_professional: yields text deltas as GPT-4o
+        produces them. The full text is cached like the non-streaming call, and a
+        cache hit is yielded as a single chunk.
+        """
+        combined_text = "\n\n".join(t for t in [user_prompt] if t.strip())
+        key = cache_key("rewrite", combined_text, REWRITE.version, "gpt-4o", 0.0)
+        cached = await _cache_get(key, use_cache)
+        if cached is not None:
+            yield cached
+            return
+        messages = build_rewrite_messages(combined_text)
+        guard = get_openai_guard()
+
+        async with openai_slot(priority=INTERACTIVE, estimated_tokens=estimate_tokens(messages, 4000)) as ticket:
+            async def _open_stream():
+                return await self.client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=messages,
+                    max_tokens=4000,
+                    temperature=0.0,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+            # Retries only cover opening the stream; once tokens flow we cannot replay them
+            started = time.monotonic()
+            stream = await call_openai_with_retry(_open_stream, max_attempts=3, per_attempt_timeout_s=20.0, operation="rewrite_stream_open")
+            chunks = stream.__aiter__()
+            parts = []
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=STREAM_IDLE_TIMEOUT_S)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        guard.breaker.record_failure()
+                        raise OpenAIFailure("OPENAI_TIMEOUT", "OpenAI stream stalled", 1)
+                    except OpenAIFailure:
+                        raise
+                    except Exception as e:
+                        guard.breaker.record_failure()
+                        raise OpenAIFailure("OPENAI_UPSTREAM_ERROR", str(e), 1)
+                    usage = extract_usage(chunk)
+                    if usage is not None:
+                        # Only the final chunk carries usage (stream_options.include_usage)
+                        ticket.actual_tokens = usage[0] + usage[1]
+                        get_usage_tracker().record("rewrite_stream", getattr(chunk, "model", None), usage, time.monotonic() - started)
+                    for choice in getattr(chunk, "choices", None) or []:
+                        delta = getattr(getattr(choice, "delta", None), "content", None)
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    await close()
+        await _cache_set(key, "".join(parts).strip())
+
+    async def generate_proposal_single_call(self, raw_text: str, document_type: str = "proposal", use_cache: bool = True) -> tuple[str, dict]:
+        """
+        One structured-output call returning both the professional text and the
+        ContractorDocV1 fields (replaces rewrite_professional + structure_proposal).
+        Returns (professional_text, ProposalData-compatible dict).
+        """
+        from app.ai.schema_contractor_v1 import CONTRACTOR_PROPOSAL_V1_RESPONSE_FORMAT, validate_contractor_proposal_v1
+        messages = SINGLE_CALL.messages(f"Document type: {document_type}\n\n" + notes_block(raw_text))
+        key = cache_key(
+            "single_call", raw_text, SINGLE_CALL.version, "gpt-4o", 0.0,
+            document_type=document_type,
+        )
+        raw = await _cache_get(key, use_cache)
+        if raw is None:
+            async def _do_call():
+                return await self.client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=messages,
+                    max_tokens=4000,
+                    temperature=0.0,
+                    response_format=CONTRACTOR_PROPOSAL_V1_RESPONSE_FORMAT,
+                )
+            async def _fetch():
+                response = await call_openai_scheduled(
+                    _do_call,
+                    priority=INTERACTIVE,
+                    estimated_tokens=estimate_tokens(messages, 4000),
+                    max_attempts=3,
+                    per_attempt_timeout_s=20.0,
+                    operation="generate_single_call",
+                )
+                return response.choices[0].message.content or ""
+            raw = await single_flight("single_call", key, _fetch)
+        try:
+            doc = validate_contractor_proposal_v1(raw)
+        except Exception as e:
+            logger.info("SINGLE CALL VALIDATION FAILED: %s", str(e)[:500])
+            raise StandardizedAIError(
+                "AI_SCHEMA_VALIDATION_FAILED",
+                "Single-call output failed ContractorDocV1 validation.",
+                detail={"error": _format_validation_errors(e)},
+            )
+        # Only outputs that validated are cached
+        await _cache_set(key, raw)
+        data = doc.model_dump(exclude={"professional_text", "schema_version"})
+        return doc.professional_text.strip(), normalize_proposal_data(data, raw_text)
@@ -0,0 +1,372 @@
+"""
+Durable background jobs for work that outlives a proxy timeout (generate, book upload).
+
+Jobs are rows in a SQLite database (data/jobs.sqlite3 by default) so queued work
+survives a restart: on start, jobs left `running` by a dead process go back to
+`queued`. Being handed back on shutdown or recovered after a crash does not use
+up an attempt (attempts count real failures); a job found running after
+MAX_INTERRUPTIONS crashes is failed instead, so one that kills the process
+cannot loop forever. A fixed pool of asyncio workers, started
+from the app lifespan, claims jobs one at a time, which bounds how many long
+operations run concurrently. Handlers are registered per job kind with
+@job_handler and return a JSON-serialisable result; raising JobFailed records a
+client-facing error, OpenAIFailure is retried while attempts remain.
+
+SQLite calls are blocking, so they run via asyncio.to_thread on one shared
+connection guarded by a lock.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.observability import tracing
+from app.services.openai_guard import OpenAIFailure
+
+logger = logging.getLogger("mph.jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL = (SUCCEEDED, FAILED)
+# Crashed-process recoveries tolerated per job before it is failed as JOB_INTERRUPTED
+MAX_INTERRUPTIONS = 3
+
+JOB_HANDLERS: Dict[str, Callable[[dict], Awaitable[dict]]] = {}
+
+
+def job_handler(kind: str):
+    """Register `async fn(payload) -> result` as the handler for jobs of `kind`."""
+    def decorator(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+class JobFailed(Exception):
+    """Terminal, client-facing job failure (mirrors error_response fields)."""
+
+    def __init__(self, code: str, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    interruptions INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobStore:
+    def __init__(self, path: Path, clock=time.time):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Autocommit mode; multi-statement updates use explicit BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "interruptions" not in columns:
+            # Databases created before interruptions were tracked separately from attempts
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN interruptions INTEGER NOT NULL DEFAULT 0")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row(row) -> Optional[dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        for field in ("result", "error"):
+            job[field] = json.loads(job[field]) if job[field] is not None else None
+        return job
+
+    def submit(self, kind: str, payload: dict, max_attempts: int) -> dict:
+        now = self._clock()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, max_attempts, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(payload), max(1, int(max_attempts)), now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._row(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def claim(self) -> Optional[dict]:
+        """Atomically move the oldest queued job to running and return it."""
+        now = self._clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, now, now, row["id"]),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._row(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def _finish(self, job_id: str, status: str, result=None, error=None) -> None:
+        now = self._clock()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    json.dumps(error) if error is not None else None,
+                    now if status in TERMINAL else None,
+                    now,
+                    job_id,
+                ),
+            )
+
+    def complete(self, job_id: str, result: dict) -> None:
+        self._finish(job_id, SUCCEEDED, result=result)
+
+    def fail(self, job_id: str, error: dict) -> None:
+        self._finish(job_id, FAILED, error=error)
+
+    def requeue(self, job_id: str, error: Optional[dict] = None) -> None:
+        """Queue a failed attempt for retry (the attempt stays counted)."""
+        self._finish(job_id, QUEUED, error=error)
+
+    def release(self, job_id: str) -> None:
+        """Hand a running job back without using up its attempt (shutdown mid-job)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = MAX(0, attempts - 1), updated_at = ? WHERE id = ? AND status = ?",
+                (QUEUED, self._clock(), job_id, RUNNING),
+            )
+
+    def recover(self) -> int:
+        """Requeue jobs a previous process left running, attempt refunded; fail repeat crashers."""
+        now = self._clock()
+        interrupted = json.dumps({"error_code": "JOB_INTERRUPTED", "message": "Job was interrupted too many times.", "status_code": 500})
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, interruptions = interruptions + 1, finished_at = ?, updated_at = ? "
+                    "WHERE status = ? AND interruptions + 1 >= ?",
+                    (FAILED, interrupted, now, now, RUNNING, MAX_INTERRUPTIONS),
+                )
+                cur = self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = MAX(0, attempts - 1), interruptions = interruptions + 1, updated_at = ? WHERE status = ?",
+                    (QUEUED, now, RUNNING),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return cur.rowcount
+
+    def purge(self, older_than_seconds: float) -> int:
+        cutoff = self._clock() - older_than_seconds
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (*TERMINAL, cutoff)
+            )
+            return cur.rowcount
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys((QUEUED, RUNNING, SUCCEEDED, FAILED), 0)
+        counts.update({r["status"]: r["n"] for r in rows})
+        return counts
+
+
+class JobQueue:
+    """Worker pool over a JobStore, started and stopped by the app lifespan."""
+
+    def __init__(self, store: JobStore, workers: int = 2, max_attempts: int = 2, poll_interval_s: float = 1.0, retention_seconds: float = 7 * 86400):
+        self.store = store
+        self.workers = max(1, int(workers))
+        self.max_attempts = max(1, int(max_attempts))
+        self.poll_interval_s = poll_interval_s
+        self.retention_seconds = retention_seconds
+        self.processed = 0
+        self.failed = 0
+        self._tasks: list = []
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._active: Dict[str, float] = {}
+
+    @classmethod
+    def from_settings(cls, settings) -> "JobQueue":
+        from app.storage.file_manager import BASE_DIR
+        path = getattr(settings, "JOB_DB_PATH", None) or (BASE_DIR / "data" / "jobs.sqlite3")
+        return cls(
+            JobStore(Path(path)),
+            workers=getattr(settings, "JOB_WORKERS", 2),
+            max_attempts=getattr(settings, "JOB_MAX_ATTEMPTS", 2),
+            poll_interval_s=getattr(settings, "JOB_POLL_INTERVAL_SECONDS", 1.0),
+            retention_seconds=getattr(settings, "JOB_RETENTION_SECONDS", 7 * 86400),
+        )
+
+    # --- client side ---
+    async def submit(self, kind: str, payload: dict) -> dict:
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"unknown job kind: {kind}")
+        job = await asyncio.to_thread(self.store.submit, kind, payload, self.max_attempts)
+        self._notify()
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def _notify(self) -> None:
+        # Submissions may arrive on another loop (tests, threads): wake workers thread-safely
+        if self._loop is not None and self._wake is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    # --- workers ---
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        recovered = await asyncio.to_thread(self.store.recover)
+        purged = await asyncio.to_thread(self.store.purge, self.retention_seconds)
+        if recovered or purged:
+            logger.info(json.dumps({"event": "jobs_recovered", "requeued": recovered, "purged": purged}))
+        self._tasks = [self._loop.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.store.close)
+
+    async def _next_job(self) -> dict:
+        while True:
+            job = await asyncio.to_thread(self.store.claim)
+            if job is not None:
+                return job
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval_s)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self._next_job()
+            self._active[job["id"]] = time.monotonic()
+            try:
+                await self.run_job(job)
+            except asyncio.CancelledError:
+                # Shutdown mid-job: hand it back, attempt refunded, so the next process picks it up
+                await asyncio.shield(asyncio.to_thread(self.store.release, job["id"]))
+                raise
+            finally:
+                self._active.pop(job["id"], None)
+
+    async def run_job(self, job: dict) -> None:
+        handler = JOB_HANDLERS.get(job["kind"])
+        try:
+            if handler is None:
+                raise JobFailed("JOB_KIND_UNKNOWN", f"No handler for job kind {job['kind']!r}.")
+            # Attempts of one job share a trace keyed by the job id (one root span per attempt)
+            with tracing.span(f"job {job['kind']}", trace_id=tracing.trace_id_for(job["id"]), attributes={"job_id": job["id"], "attempt": job["attempts"]}):
+                result = await handler(job["payload"])
+        except asyncio.CancelledError:
+            raise
+        except JobFailed as e:
+            await self._fail(job, {"error_code": e.code, "message": e.message, "status_code": e.status_code})
+            return
+        except OpenAIFailure as e:
+            error = {"error_code": e.code, "message": "Upstream AI service unavailable.", "status_code": 503}
+            if job["attempts"] < job["max_attempts"]:
+                logger.info(json.dumps({"event": "job_retry", "job_id": job["id"], "kind": job["kind"], "error_code": e.code}))
+                await asyncio.to_thread(self.store.requeue, job["id"], error)
+                return
+            await self._fail(job, error)
+            return
+        except Exception:
+            logger.exception("job_unhandled_error job_id=%s kind=%s", job["id"], job["kind"])
+            await self._fail(job, {"error_code": "INTERNAL_ERROR", "message": "Job failed.", "status_code": 500})
+            return
+        await asyncio.to_thread(self.store.complete, job["id"], result)
+        self.processed += 1
+        logger.info(json.dumps({"event": "job_succeeded", "job_id": job["id"], "kind": job["kind"], "attempts": job["attempts"]}))
+
+    async def _fail(self, job: dict, error: dict) -> None:
+        await asyncio.to_thread(self.store.fail, job["id"], error)
+        self.failed += 1
+        logger.info(json.dumps({"event": "job_failed", "job_id": job["id"], "kind": job["kind"], **error}))
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": len(self._active),
+            "processed": self.processed,
+            "failed": self.failed,
+            "counts": self.store.counts(),
+        }
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> Optional[JobQueue]:
+    """Process-wide queue, or None when JOBS_ENABLED is off."""
+    global _queue
+    from app.models.config import get_settings
+    settings = get_settings()
+    if not getattr(settings, "JOBS_ENABLED", True):
+        return None
+    if _queue is None:
+        _queue = JobQueue.from_settings(settings)
+    return _queue
+
+
+async def close_job_queue() -> None:
+    """Stop the workers and drop the singleton (lifespan shutdown)."""
+    global _queue
+    queue, _queue = _queue, None
+    if queue is not None:
+        await queue.stop()
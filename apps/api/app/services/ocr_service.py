@@ -1,16 +1,21 @@
 import base64
+import hashlib
 from pathlib import Path
 
-from openai import AsyncOpenAI
+from app.services.openai_client import get_openai_client
 from app.models.config import get_settings
-from app.services.openai_guard import call_openai_with_retry
-
-settings = get_settings()
+from app.observability import tracing
+from app.services.openai_scheduler import INTERACTIVE, call_openai_scheduled, estimate_tokens
+from app.services.single_flight import single_flight
 
 
 class OCRService:
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client or get_openai_client()
 
     async def transcribe_pages(self, image_paths: list[str]) -> list[str]:
         import logging
@@ -28,40 +33,55 @@ class OCRService:
         """Transcribe handwritten text from image using GPT-4 Vision"""
         import os
         import logging
-        logging.warning(f"bool(settings.openai_api_key)={bool(settings.openai_api_key)}, bool(os.getenv('OPENAI_API_KEY'))={bool(os.getenv('OPENAI_API_KEY'))}")
-        # Read and encode image
+        logging.warning(f"bool(settings.openai_api_key)={bool(get_settings().openai_api_key)}, bool(os.getenv('OPENAI_API_KEY'))={bool(os.getenv('OPENAI_API_KEY'))}")
         with open(image_path, "rb") as img_file:
-            image_data = base64.b64encode(img_file.read()).decode("utf-8")
+            image_bytes = img_file.read()
+        # Identical images transcribed concurrently share one upstream call
+        key = hashlib.sha256(image_bytes).hexdigest()
+        with tracing.span("ocr.page", attributes={"image": Path(image_path).name, "bytes": len(image_bytes)}):
+            return await single_flight("ocr", key, lambda: self._transcribe_bytes(image_bytes))
+
+    async def _transcribe_bytes(self, image_bytes: bytes) -> str:
+        image_data = base64.b64encode(image_bytes).decode("utf-8")
+
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": (
+                            "Extract ONLY HANDWRITTEN text from the image.\n"
+                            "Ignore ALL printed text, letterhead, logos, slogans, phone/email labels, addresses, and template headings.\n"
+                            "If you are not sure whether something is printed or handwritten, DO NOT include it.\n"
+                            "Do not add commentary. Do not add page/session markers.\n"
+                            "Return plain text only.\n"
+                            "Preserve line breaks roughly as written."
+                        )
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{image_data}"
+                        }
+                    }
+                ]
+            }
+        ]
 
         async def _do_call():
             return await self.client.chat.completions.create(
                 model="gpt-4o",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": (
-                                    "Extract ONLY HANDWRITTEN text from the image.\n"
-                                    "Ignore ALL printed text, letterhead, logos, slogans, phone/email labels, addresses, and template headings.\n"
-                                    "If you are not sure whether something is printed or handwritten, DO NOT include it.\n"
-                                    "Do not add commentary. Do not add page/session markers.\n"
-                                    "Return plain text only.\n"
-                                    "Preserve line breaks roughly as written."
-                                )
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_data}"
-                                }
-                            }
-                        ]
-                    }
-                ],
+                messages=messages,
                 max_tokens=2000
             )
 
-        response = await call_openai_with_retry(_do_call, max_attempts=3, per_attempt_timeout_s=20.0)
+        response = await call_openai_scheduled(
+            _do_call,
+            priority=INTERACTIVE,
+            estimated_tokens=estimate_tokens(messages, 2000),
+            max_attempts=3,
+            per_attempt_timeout_s=20.0,
+            operation="ocr",
+        )
         return response.choices[0].message.content
@@ -0,0 +1,271 @@
+"""
+Record/replay of OpenAI chat.completions traffic ("cassettes").
+
+OPENAI_CASSETTE_MODE=record wraps the shared OpenAI HTTP transport: every
+/chat/completions exchange made by OCRService, BookOCRService and
+FormattingService is appended to OPENAI_CASSETTE_PATH as one JSON line with the
+request body, the raw response body (SSE text for streams), status, operation,
+route and latency. Base64 image payloads are replaced by "sha256:<hex>" of the
+image bytes, so a cassette holds prompts and outputs but no customer images.
+A path ending in .gz is written gzip-compressed.
+
+OPENAI_CASSETTE_MODE=replay serves those responses without network access.
+Requests are matched on a hash of the normalized body (model, messages with
+image hashes, sampling and response_format), so the same image or notes give
+the same answer; repeated recordings of one request are replayed in order and
+then cycled. A request with no recording gets a 404 `cassette_miss` error
+(logged with its operation). Replays run at full speed unless
+OPENAI_CASSETTE_REPLAY_LATENCY is on, in which case each response takes its
+recorded latency; streams wait for the recorded time to first byte and spread
+the rest over their chunks.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import binascii
+import copy
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger("mph.openai_cassette")
+
+RECORD = "record"
+REPLAY = "replay"
+# Request fields that decide the response; anything else (stream_options, user, ...) is ignored for matching
+_MATCH_FIELDS = ("model", "messages", "temperature", "top_p", "max_tokens", "response_format", "stream", "n", "seed")
+_KEPT_RESPONSE_HEADERS = ("content-type", "retry-after", "x-request-id")
+
+
+def _open(path: Path, mode: str):
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _hash_data_url(url: str) -> str:
+    header, _, data = url.partition(",")
+    try:
+        raw = base64.b64decode(data, validate=False) if ";base64" in header else data.encode("utf-8")
+    except (binascii.Error, ValueError):
+        raw = url.encode("utf-8")
+    return "sha256:" + hashlib.sha256(raw).hexdigest()
+
+
+def normalize_request(body: dict) -> dict:
+    """Copy of a chat.completions body with inline images replaced by their hashes."""
+    body = copy.deepcopy(body)
+    for message in body.get("messages") or []:
+        content = message.get("content")
+        if not isinstance(content, list):
+            continue
+        for part in content:
+            image = part.get("image_url") if isinstance(part, dict) else None
+            if isinstance(image, dict) and str(image.get("url", "")).startswith("data:"):
+                image["url"] = _hash_data_url(image["url"])
+    return body
+
+
+def request_key(normalized: dict) -> str:
+    subset = {k: normalized[k] for k in _MATCH_FIELDS if k in normalized}
+    return hashlib.sha256(json.dumps(subset, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _context() -> dict:
+    from app import request_context
+    from app.services.openai_guard import current_operation
+    ctx = request_context.current()
+    return {"operation": current_operation(), "route": ctx.path if ctx else None}
+
+
+class CassetteWriter:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def append(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with _open(self.path, "a") as f:
+                f.write(line)
+
+
+def load_cassette(path) -> List[dict]:
+    entries = []
+    with _open(Path(path), "r") as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+class _TeeStream(httpx.AsyncByteStream):
+    """Passes the upstream body through unchanged and records it once fully read."""
+
+    def __init__(self, inner, on_complete):
+        self._inner = inner
+        self._chunks: List[bytes] = []
+        self._on_complete = on_complete
+        self._done = False
+
+    async def __aiter__(self):
+        async for chunk in self._inner:
+            self._chunks.append(chunk)
+            yield chunk
+        await self._finish()
+
+    async def aclose(self) -> None:
+        try:
+            await self._inner.aclose()
+        finally:
+            await self._finish()
+
+    async def _finish(self) -> None:
+        if not self._done:
+            self._done = True
+            await self._on_complete(b"".join(self._chunks))
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, inner: httpx.AsyncBaseTransport, writer: CassetteWriter):
+        self._inner = inner
+        self._writer = writer
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+            return await self._inner.handle_async_request(request)
+        try:
+            body = json.loads(await request.aread())
+        except ValueError:
+            return await self._inner.handle_async_request(request)
+        normalized = normalize_request(body)
+        meta = _context()
+        # Transports see the encoded body; ask for identity so the recording is plain text
+        request.headers["accept-encoding"] = "identity"
+        started = time.monotonic()
+        response = await self._inner.handle_async_request(request)
+        ttfb_ms = (time.monotonic() - started) * 1000.0
+
+        async def record(raw: bytes) -> None:
+            entry = {
+                "key": request_key(normalized),
+                **meta,
+                "recorded_at": time.time(),
+                "request": normalized,
+                "status": response.status_code,
+                "headers": {k: v for k, v in response.headers.items() if k.lower() in _KEPT_RESPONSE_HEADERS},
+                "body": raw.decode("utf-8", errors="replace"),
+                "ttfb_ms": round(ttfb_ms, 1),
+                "latency_ms": round((time.monotonic() - started) * 1000.0, 1),
+            }
+            try:
+                await asyncio.to_thread(self._writer.append, entry)
+            except Exception:
+                logger.warning("cassette_record_failed path=%s", self._writer.path, exc_info=True)
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_TeeStream(response.stream, record),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class _PacedStream(httpx.AsyncByteStream):
+    """Replays an SSE body event by event, sleeping `gap_s` between events."""
+
+    def __init__(self, body: bytes, gap_s: float):
+        self._events = [e + b"\n\n" for e in body.split(b"\n\n") if e.strip()]
+        self._gap_s = gap_s
+
+    async def __aiter__(self):
+        for event in self._events:
+            if self._gap_s > 0:
+                await asyncio.sleep(self._gap_s)
+            yield event
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, entries: List[dict], replay_latency: bool = False):
+        self.replay_latency = replay_latency
+        self._entries: Dict[str, List[dict]] = defaultdict(list)
+        self._next: Dict[str, int] = defaultdict(int)
+        for entry in entries:
+            self._entries[entry["key"]].append(entry)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._entries.values())
+
+    @classmethod
+    def from_path(cls, path, replay_latency: bool = False) -> "ReplayTransport":
+        return cls(load_cassette(path), replay_latency=replay_latency)
+
+    def _pick(self, key: str) -> Optional[dict]:
+        recorded = self._entries.get(key)
+        if not recorded:
+            return None
+        i = self._next[key]
+        self._next[key] = i + 1
+        return recorded[i % len(recorded)]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            body = json.loads(await request.aread())
+        except ValueError:
+            body = {}
+        key = request_key(normalize_request(body))
+        entry = self._pick(key)
+        if entry is None:
+            self.misses += 1
+            logger.warning("cassette_miss key=%s operation=%s", key[:16], _context()["operation"])
+            error = {"error": {"message": f"No cassette entry for request {key[:16]}", "type": "cassette_miss", "param": None, "code": "cassette_miss"}}
+            return httpx.Response(404, json=error, request=request)
+        self.hits += 1
+
+        raw = entry["body"].encode("utf-8")
+        streamed = "text/event-stream" in entry.get("headers", {}).get("content-type", "")
+        gap_s = 0.0
+        if self.replay_latency:
+            if streamed:
+                await asyncio.sleep(entry.get("ttfb_ms", 0.0) / 1000.0)
+                remaining_s = max(0.0, entry.get("latency_ms", 0.0) - entry.get("ttfb_ms", 0.0)) / 1000.0
+                gap_s = remaining_s / max(1, raw.count(b"\n\n"))
+            else:
+                await asyncio.sleep(entry.get("latency_ms", 0.0) / 1000.0)
+        headers = entry.get("headers") or {}
+        if streamed:
+            return httpx.Response(entry["status"], headers=headers, stream=_PacedStream(raw, gap_s), request=request)
+        return httpx.Response(entry["status"], headers=headers, content=raw, request=request)
+
+
+def cassette_transport(settings, inner_factory) -> Optional[httpx.AsyncBaseTransport]:
+    """Transport for OPENAI_CASSETTE_MODE, or None when cassettes are off."""
+    mode = (getattr(settings, "OPENAI_CASSETTE_MODE", "") or "").strip().lower()
+    if not mode or mode == "off":
+        return None
+    path = getattr(settings, "OPENAI_CASSETTE_PATH", "") or ""
+    if not path:
+        raise RuntimeError("OPENAI_CASSETTE_PATH must be set when OPENAI_CASSETTE_MODE is on.")
+    if mode == RECORD:
+        logger.info("openai_cassette_recording path=%s", path)
+        return RecordingTransport(inner_factory(), CassetteWriter(Path(path)))
+    if mode == REPLAY:
+        transport = ReplayTransport.from_path(path, replay_latency=bool(getattr(settings, "OPENAI_CASSETTE_REPLAY_LATENCY", False)))
+        logger.info("openai_cassette_replaying path=%s requests=%d", path, len(transport))
+        return transport
+    raise RuntimeError(f"Unknown OPENAI_CASSETTE_MODE {mode!r} (off, record or replay).")
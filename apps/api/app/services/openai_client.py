@@ -0,0 +1,125 @@
+"""
+Application-scoped AsyncOpenAI client.
+
+OCRService, BookOCRService and FormattingService all share one client backed by
+a single tuned httpx connection pool (keep-alive, HTTP/2 when `h2` is installed),
+so TLS handshakes and sockets are reused across every AI call. The FastAPI
+lifespan creates it on startup and closes it on shutdown; outside the lifespan
+(scripts, TestClient without `with`) it is created lazily on first use.
+
+httpx pools are bound to the event loop that opened their connections, so a
+client is rebuilt if it is requested from a different loop; the old pool is
+closed on its own loop when that loop is still open.
+
+OPENAI_BASE_URL points the client at another OpenAI-compatible server; load
+tests use the local stand-in in loadtest/fake_openai.py. OPENAI_CASSETTE_MODE
+records or replays the traffic instead (see openai_cassette).
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger("mph.openai_client")
+
+_client = None
+_http_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+# Pending closes of pools left behind by a loop change (kept so they aren't garbage collected)
+_closing: set = set()
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_http_client(settings) -> httpx.AsyncClient:
+    http2 = bool(getattr(settings, "OPENAI_HTTP2", True))
+    if http2 and not http2_available():
+        logger.warning("openai_http2_unavailable: install httpx[http2]; falling back to HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=int(getattr(settings, "OPENAI_MAX_CONNECTIONS", 20)),
+        max_keepalive_connections=int(getattr(settings, "OPENAI_MAX_KEEPALIVE_CONNECTIONS", 10)),
+        keepalive_expiry=float(getattr(settings, "OPENAI_KEEPALIVE_EXPIRY_SECONDS", 30.0)),
+    )
+    # Overall per-attempt deadlines are enforced by call_openai_with_retry; these only bound
+    # connection setup and pool waits so a dead socket fails fast.
+    timeout = httpx.Timeout(
+        60.0,
+        connect=float(getattr(settings, "OPENAI_CONNECT_TIMEOUT_SECONDS", 5.0)),
+        pool=float(getattr(settings, "OPENAI_CONNECT_TIMEOUT_SECONDS", 5.0)),
+    )
+    from app.services.openai_cassette import cassette_transport
+    transport = cassette_transport(settings, lambda: httpx.AsyncHTTPTransport(http2=http2, limits=limits))
+    if transport is not None:
+        return httpx.AsyncClient(transport=transport, timeout=timeout)
+    return httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout)
+
+
+def _current_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+async def _aclose_quietly(http_client: httpx.AsyncClient) -> None:
+    try:
+        await http_client.aclose()
+    except Exception:
+        logger.debug("openai_client_close_failed", exc_info=True)
+
+
+def _discard_http_client(http_client: Optional[httpx.AsyncClient], loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """Close a pool that belongs to another event loop, on that loop when it is still open."""
+    if http_client is None or http_client.is_closed:
+        return
+    if loop is not None and not loop.is_closed():
+        future = asyncio.run_coroutine_threadsafe(_aclose_quietly(http_client), loop)
+        _closing.add(future)
+        future.add_done_callback(_closing.discard)
+        return
+    # Its loop is gone (e.g. a finished asyncio.run): best-effort close from the current one
+    current = _current_loop()
+    if current is not None:
+        task = current.create_task(_aclose_quietly(http_client))
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
+
+
+def get_openai_client():
+    """Shared AsyncOpenAI client for the running event loop."""
+    global _client, _http_client, _client_loop
+    loop = _current_loop()
+    if _client is not None and (loop is None or _client_loop is None or loop is _client_loop):
+        if _client_loop is None:
+            _client_loop = loop
+        return _client
+    # The SDK (and its generated types) is a large share of API import time; load it on first use
+    from openai import AsyncOpenAI
+    from app.models.config import get_settings
+    settings = get_settings()
+    _discard_http_client(_http_client, _client_loop)
+    _http_client = build_http_client(settings)
+    # Retries are owned by call_openai_with_retry; SDK-level retries would multiply them
+    _client = AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        base_url=getattr(settings, "OPENAI_BASE_URL", None) or None,
+        http_client=_http_client,
+        max_retries=0,
+    )
+    _client_loop = loop
+    return _client
+
+
+async def close_openai_client() -> None:
+    global _client, _http_client, _client_loop
+    http_client = _http_client
+    _client, _http_client, _client_loop = None, None, None
+    if http_client is not None and not http_client.is_closed:
+        await http_client.aclose()
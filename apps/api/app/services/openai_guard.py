@@ -1,14 +1,35 @@
+"""
+Resilience layer for upstream OpenAI calls.
+
+call_openai_with_retry() wraps every attempt with:
+  - a circuit breaker (closed -> open after consecutive upstream failures ->
+    half-open probe after a cool-down -> closed on success); while open, calls
+    fail immediately with AI_UPSTREAM_UNAVAILABLE instead of burning timeouts
+  - adaptive per-attempt timeouts derived from the observed p95 latency of
+    successful calls for the same operation, capped by per_attempt_timeout_s
+  - a retry budget: retries are only spent while they stay under a fixed ratio
+    of recent requests, so an outage does not multiply upstream load
+"""
 import asyncio
 import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional
+
+from app.observability import tracing
+from app.observability.metrics import OPENAI_ATTEMPT_SECONDS, OPENAI_FAILURES, OPENAI_RETRIES
 
 
 class OpenAIFailure(Exception):
     """Typed exception for OpenAI call failures with stable .code property."""
-    def __init__(self, code, message, attempts):
+    def __init__(self, code, message, attempts, retry_after=None):
         super().__init__(message)
         self.code = code
         self.message = message
         self.attempts = attempts
+        self.retry_after = retry_after
 
 def is_retryable(exc):
     import openai
@@ -20,14 +41,267 @@ def is_retryable(exc):
         asyncio.TimeoutError,
     ))
 
-async def call_openai_with_retry(fn, max_attempts=3, per_attempt_timeout_s=20.0):
+
+def is_upstream_failure(exc):
+    """Failures that say something about upstream health (and count against the breaker)."""
+    import openai
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError, asyncio.TimeoutError, openai.InternalServerError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(status, int) and status >= 500
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, recovery_seconds: float = 30.0, half_open_max_calls: int = 1, clock=time.monotonic):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.recovery_seconds = float(recovery_seconds)
+        self.half_open_max_calls = max(1, int(half_open_max_calls))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probes = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def _maybe_half_open(self) -> None:
+        if self.state == OPEN and self._clock() - self.opened_at >= self.recovery_seconds:
+            self.state = HALF_OPEN
+            self._probes = 0
+
+    def retry_after(self) -> int:
+        if self.opened_at is None:
+            return 1
+        return max(1, int(self.opened_at + self.recovery_seconds - self._clock() + 0.999))
+
+    def check(self) -> None:
+        """Fail fast without claiming a half-open probe slot (used before queueing)."""
+        with self._lock:
+            self._maybe_half_open()
+            if self.state == OPEN:
+                self.rejected += 1
+                raise OpenAIFailure("AI_UPSTREAM_UNAVAILABLE", "OpenAI circuit breaker is open", 0, retry_after=self.retry_after())
+
+    def acquire(self) -> None:
+        """Admit one attempt or raise AI_UPSTREAM_UNAVAILABLE."""
+        with self._lock:
+            self._maybe_half_open()
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return
+            self.rejected += 1
+            raise OpenAIFailure("AI_UPSTREAM_UNAVAILABLE", "OpenAI circuit breaker is open", 0, retry_after=self.retry_after())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = self._clock()
+                self.times_opened += 1
+
+    def record_neutral(self) -> None:
+        """An attempt finished without saying anything about upstream health (e.g. a 400)."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "retry_after_seconds": self.retry_after() if self.state == OPEN else 0,
+            }
+
+
+class LatencyTracker:
+    """Rolling latency samples of successful attempts, per operation."""
+
+    def __init__(self, samples: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class RetryBudget:
+    """Allow retries only while they stay under `ratio` of requests in the trailing window."""
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10, window_seconds: float = 10.0, clock=time.monotonic):
+        self.ratio = float(ratio)
+        self.min_retries = int(min_retries)
+        self.window_seconds = float(window_seconds)
+        self._clock = clock
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+        self.exhausted = 0
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        for q in (self._requests, self._retries):
+            while q and q[0] < cutoff:
+                q.popleft()
+
+    def record_request(self) -> None:
+        with self._lock:
+            now = self._clock()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            now = self._clock()
+            self._trim(now)
+            if len(self._retries) < max(self.min_retries, self.ratio * len(self._requests)):
+                self._retries.append(now)
+                return True
+            self.exhausted += 1
+            return False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._trim(self._clock())
+            return {
+                "requests_in_window": len(self._requests),
+                "retries_in_window": len(self._retries),
+                "ratio": self.ratio,
+                "exhausted": self.exhausted,
+            }
+
+
+class OpenAIGuard:
+    def __init__(self, breaker: CircuitBreaker, retry_budget: RetryBudget, adaptive_timeouts: bool = True, min_timeout_s: float = 5.0, p95_multiplier: float = 2.0):
+        self.breaker = breaker
+        self.retry_budget = retry_budget
+        self.adaptive_timeouts = adaptive_timeouts
+        self.min_timeout_s = float(min_timeout_s)
+        self.p95_multiplier = float(p95_multiplier)
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def latency(self, operation: str) -> LatencyTracker:
+        with self._lock:
+            tracker = self._latency.get(operation)
+            if tracker is None:
+                tracker = self._latency[operation] = LatencyTracker()
+            return tracker
+
+    def attempt_timeout(self, operation: str, ceiling_s: float) -> float:
+        if not self.adaptive_timeouts:
+            return ceiling_s
+        p95 = self.latency(operation).p95()
+        if p95 is None:
+            return ceiling_s
+        return min(ceiling_s, max(self.min_timeout_s, p95 * self.p95_multiplier))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            operations = dict(self._latency)
+        return {
+            "breaker": self.breaker.snapshot(),
+            "retry_budget": self.retry_budget.snapshot(),
+            "latency": {
+                name: {"samples": len(tracker), "p95_seconds": tracker.p95()}
+                for name, tracker in operations.items()
+            },
+        }
+
+    @classmethod
+    def from_settings(cls, settings) -> "OpenAIGuard":
+        return cls(
+            CircuitBreaker(
+                failure_threshold=getattr(settings, "OPENAI_BREAKER_FAILURE_THRESHOLD", 5),
+                recovery_seconds=getattr(settings, "OPENAI_BREAKER_RECOVERY_SECONDS", 30.0),
+            ),
+            RetryBudget(ratio=getattr(settings, "OPENAI_RETRY_BUDGET_RATIO", 0.2)),
+            adaptive_timeouts=getattr(settings, "OPENAI_ADAPTIVE_TIMEOUT", True),
+            min_timeout_s=getattr(settings, "OPENAI_TIMEOUT_MIN_SECONDS", 5.0),
+            p95_multiplier=getattr(settings, "OPENAI_TIMEOUT_P95_MULTIPLIER", 2.0),
+        )
+
+
+_guard: Optional[OpenAIGuard] = None
+
+
+def get_openai_guard() -> OpenAIGuard:
+    global _guard
+    if _guard is None:
+        from app.models.config import get_settings
+        _guard = OpenAIGuard.from_settings(get_settings())
+    return _guard
+
+
+_operation: ContextVar[Optional[str]] = ContextVar("mph_openai_operation", default=None)
+
+
+def current_operation() -> Optional[str]:
+    """Operation name of the call_openai_with_retry() call in progress, if any."""
+    return _operation.get()
+
+
+async def call_openai_with_retry(fn, max_attempts=3, per_attempt_timeout_s=20.0, operation="default"):
+    token = _operation.set(operation)
+    try:
+        return await _call_with_retry(fn, max_attempts, per_attempt_timeout_s, operation)
+    finally:
+        _operation.reset(token)
+
+
+async def _call_with_retry(fn, max_attempts, per_attempt_timeout_s, operation):
     import openai
+    guard = get_openai_guard()
+    guard.retry_budget.record_request()
     last_exc = None
     for attempt in range(1, max_attempts + 1):
+        guard.breaker.acquire()
+        timeout_s = guard.attempt_timeout(operation, per_attempt_timeout_s)
+        attempt_span = tracing.start_span("openai.attempt", kind=tracing.KIND_CLIENT, attributes={"operation": operation, "attempt": attempt, "timeout_s": timeout_s})
+        started = time.monotonic()
         try:
-            return await asyncio.wait_for(fn(), timeout=per_attempt_timeout_s)
+            result = await asyncio.wait_for(fn(), timeout=timeout_s)
         except Exception as e:
             last_exc = e
+            elapsed = time.monotonic() - started
+            attempt_span.record_exception(e)
+            attempt_span.end()
+            if is_upstream_failure(e):
+                guard.breaker.record_failure()
+            else:
+                guard.breaker.record_neutral()
             # Map to stable code
             if isinstance(e, openai.RateLimitError):
                 code = "OPENAI_RATE_LIMITED"
@@ -37,9 +311,27 @@ async def call_openai_with_retry(fn, max_attempts=3, per_attempt_timeout_s=20.0)
                 code = "OPENAI_TIMEOUT"
             else:
                 code = "OPENAI_UNKNOWN_ERROR"
-            if not is_retryable(e) or attempt == max_attempts:
+            OPENAI_ATTEMPT_SECONDS.labels(operation, code).observe(elapsed)
+            if not is_retryable(e) or attempt == max_attempts or not guard.retry_budget.try_spend():
+                OPENAI_FAILURES.labels(operation, code).inc()
                 raise OpenAIFailure(code, str(last_exc), attempt)
+            OPENAI_RETRIES.labels(operation, code).inc()
+        except BaseException as e:
+            # Cancelled by the caller (e.g. the losing speculative attempt): says nothing about
+            # upstream health, but a half-open probe slot must be given back
+            attempt_span.record_exception(e)
+            attempt_span.end()
+            guard.breaker.record_neutral()
+            raise
+        else:
+            elapsed = time.monotonic() - started
+            attempt_span.end()
+            guard.breaker.record_success()
+            guard.latency(operation).observe(elapsed)
+            OPENAI_ATTEMPT_SECONDS.labels(operation, "ok").observe(elapsed)
+            return result
         # Exponential backoff with jitter (max 4s)
         sleep_s = min(0.5 * (2 ** (attempt - 1)), 4.0)
         sleep_s = sleep_s * (0.8 + 0.4 * random.random())
-        await asyncio.sleep(sleep_s)
+        with tracing.span("openai.backoff", attributes={"operation": operation, "attempt": attempt, "sleep_s": round(sleep_s, 3)}):
+            await asyncio.sleep(sleep_s)
@@ -0,0 +1,382 @@
+"""
+Central admission scheduler for upstream OpenAI calls.
+
+Every OCR/formatting call goes through call_openai_scheduled(), which waits for a
+slot before running call_openai_with_retry():
+  - priority classes: INTERACTIVE (proposal generate, transcribe) is dispatched
+    before BULK (book OCR), except that while bulk work is waiting every
+    `bulk_every`-th grant goes to it, so sustained interactive load cannot
+    starve book uploads and jobs
+  - request-per-minute and token-per-minute budgets (continuously refilled token
+    buckets), reconciled with the real `usage` reported by the API
+  - a global concurrency cap
+  - fair queuing: within a priority class, tenants are served round-robin so one
+    large book upload cannot monopolise the bulk lane
+
+State is guarded by a threading lock and waiters are plain futures woken with
+call_soon_threadsafe, so one scheduler can serve several event loops (TestClient
+runs each request on its own loop).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app import request_context
+from app.observability import tracing
+from app.services.openai_guard import OpenAIFailure, call_openai_with_retry, get_openai_guard
+from app.services.usage_tracker import extract_usage, get_usage_tracker
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+# Rough cost of one image_url part; OpenAI bills 85-1105 tokens per image depending on size
+IMAGE_TOKEN_ESTIMATE = 1000
+WAIT_SAMPLES = 512
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, clock):
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def refill(self) -> None:
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate if self.rate > 0 else float("inf")
+
+
+@dataclass
+class _Waiter:
+    priority: int
+    tenant: str
+    tokens: int
+    future: asyncio.Future
+    enqueued_at: float
+
+
+@dataclass
+class Ticket:
+    priority: int
+    tenant: str
+    tokens: int
+    wait_seconds: float
+    # Set by the holder once the API reports real usage; reconciled on release
+    actual_tokens: Optional[int] = None
+
+
+@dataclass
+class _ClassStats:
+    granted: int = 0
+    timeouts: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    samples: deque = field(default_factory=lambda: deque(maxlen=WAIT_SAMPLES))
+
+
+class OpenAIScheduler:
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: int = 500, tokens_per_minute: int = 30_000, bulk_every: int = 4, clock=time.monotonic):
+        self.max_concurrency = max(1, int(max_concurrency))
+        # 0 disables the bulk share (strict priority)
+        self.bulk_every = max(0, int(bulk_every))
+        self._interactive_streak = 0
+        self._clock = clock
+        self._rpm = TokenBucket(requests_per_minute, clock)
+        self._tpm = TokenBucket(tokens_per_minute, clock)
+        self._lock = threading.Lock()
+        # priority -> tenant -> FIFO of waiters; tenant order is the round-robin order
+        self._queues = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self._in_flight = 0
+        self._timer_deadline: Optional[float] = None
+        self._timer_handle = None
+        self._timer_generation = 0
+        self._stats = {p: _ClassStats() for p in PRIORITY_NAMES}
+
+    # --- admission ---
+    def _cost(self, tokens: int) -> int:
+        # A single call larger than the whole budget must still be admissible
+        return min(int(tokens), int(self._tpm.capacity))
+
+    def _head(self):
+        order = sorted(self._queues)
+        if self.bulk_every and self._interactive_streak >= self.bulk_every - 1:
+            order = [BULK, INTERACTIVE]  # bulk's turn
+        for priority in order:
+            tenants = self._queues[priority]
+            if tenants:
+                tenant, waiters = next(iter(tenants.items()))
+                return priority, tenant, waiters
+        return None
+
+    def _dispatch_locked(self) -> list:
+        """Grant as many head-of-line waiters as budgets allow. Returns waiters to wake."""
+        granted = []
+        self._rpm.refill()
+        self._tpm.refill()
+        while self._in_flight < self.max_concurrency:
+            head = self._head()
+            if head is None:
+                break
+            priority, tenant, waiters = head
+            waiter = waiters[0]
+            if waiter.future.done():  # cancelled while queued
+                self._pop(priority, tenant)
+                continue
+            cost = self._cost(waiter.tokens)
+            delay = max(self._rpm.seconds_until(1), self._tpm.seconds_until(cost))
+            if delay > 0:
+                self._arm_timer(waiter.future, delay)
+                break
+            self._pop(priority, tenant)
+            self._rpm.level -= 1
+            self._tpm.level -= cost
+            self._in_flight += 1
+            # Count interactive grants made while bulk work waits; any bulk grant resets the count
+            self._interactive_streak = self._interactive_streak + 1 if priority == INTERACTIVE and self._queues[BULK] else 0
+            granted.append(waiter)
+        return granted
+
+    def _pop(self, priority: int, tenant: str) -> None:
+        tenants = self._queues[priority]
+        waiters = tenants[tenant]
+        waiters.popleft()
+        if waiters:
+            tenants.move_to_end(tenant)  # round-robin: next tenant goes first
+        else:
+            del tenants[tenant]
+
+    def _arm_timer(self, future: asyncio.Future, delay: float) -> None:
+        now = self._clock()
+        deadline = now + delay
+        # Keep a pending timer unless this waiter is due sooner. A timer armed on a loop
+        # that has since closed never fires, so one that is overdue is replaced as well.
+        if self._timer_deadline is not None and deadline >= self._timer_deadline and now < self._timer_deadline + 1.0:
+            return
+        self._cancel_timer_locked()
+        self._timer_deadline = deadline
+        loop = future.get_loop()
+        generation = self._timer_generation
+
+        def _schedule():
+            handle = loop.call_later(delay, _fire)
+            with self._lock:
+                if generation == self._timer_generation:
+                    self._timer_handle = (loop, handle)
+                    return
+            handle.cancel()  # superseded before it was scheduled
+
+        def _fire():
+            with self._lock:
+                if generation != self._timer_generation:
+                    return
+                self._timer_deadline = None
+                self._timer_handle = None
+            self._dispatch()
+
+        loop.call_soon_threadsafe(_schedule)
+
+    def _cancel_timer_locked(self) -> None:
+        # Bumping the generation turns a superseded timer into a no-op even if it fires
+        self._timer_generation += 1
+        if self._timer_handle is not None:
+            loop, handle = self._timer_handle
+            self._timer_handle = None
+            try:
+                loop.call_soon_threadsafe(handle.cancel)
+            except RuntimeError:  # loop already closed
+                pass
+
+    def _dispatch(self) -> None:
+        with self._lock:
+            granted = self._dispatch_locked()
+        now = self._clock()
+        for waiter in granted:
+            ticket = Ticket(waiter.priority, waiter.tenant, self._cost(waiter.tokens), now - waiter.enqueued_at)
+            waiter.future.get_loop().call_soon_threadsafe(_resolve, waiter.future, ticket, self)
+
+    async def acquire(self, priority: int = INTERACTIVE, tenant: str = "default", tokens: int = 0, timeout: Optional[float] = None) -> Ticket:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, tenant, int(tokens), loop.create_future(), self._clock())
+        with self._lock:
+            self._queues[priority].setdefault(tenant, deque()).append(waiter)
+        self._dispatch()
+        try:
+            ticket = await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if not waiter.future.done():
+                waiter.future.cancel()
+            elif not waiter.future.cancelled():
+                # Granted at the same moment we gave up: hand the slot back
+                self.release(waiter.future.result())
+            if isinstance(exc, asyncio.TimeoutError):
+                with self._lock:
+                    self._stats[priority].timeouts += 1
+            self._dispatch()
+            raise
+        with self._lock:
+            stats = self._stats[priority]
+            stats.granted += 1
+            stats.wait_seconds_total += ticket.wait_seconds
+            stats.wait_seconds_max = max(stats.wait_seconds_max, ticket.wait_seconds)
+            stats.samples.append(ticket.wait_seconds)
+        return ticket
+
+    def charge(self, ticket: Ticket) -> None:
+        """Draw one more request and the ticket's tokens from the budgets without waiting (used for retries)."""
+        with self._lock:
+            self._rpm.refill()
+            self._tpm.refill()
+            self._rpm.level -= 1
+            self._tpm.level -= ticket.tokens
+
+    def release(self, ticket: Ticket, actual_tokens: Optional[int] = None) -> None:
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if actual_tokens is not None:
+                # Reconcile the estimate with real usage (refund or charge the difference)
+                self._tpm.refill()
+                self._tpm.level = min(self._tpm.capacity, self._tpm.level + ticket.tokens - int(actual_tokens))
+        self._dispatch()
+
+    # --- metrics ---
+    def stats(self) -> dict:
+        with self._lock:
+            self._rpm.refill()
+            self._tpm.refill()
+            classes = {}
+            for priority, name in PRIORITY_NAMES.items():
+                s = self._stats[priority]
+                samples = sorted(s.samples)
+                classes[name] = {
+                    "queue_depth": sum(len(w) for w in self._queues[priority].values()),
+                    "tenants_waiting": len(self._queues[priority]),
+                    "granted": s.granted,
+                    "timeouts": s.timeouts,
+                    "wait_seconds_total": round(s.wait_seconds_total, 6),
+                    "wait_seconds_max": round(s.wait_seconds_max, 6),
+                    "wait_seconds_p50": round(samples[len(samples) // 2], 6) if samples else 0.0,
+                    "wait_seconds_p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 6) if samples else 0.0,
+                }
+            return {
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "requests_budget_remaining": round(self._rpm.level, 2),
+                "tokens_budget_remaining": round(self._tpm.level, 2),
+                "classes": classes,
+            }
+
+
+def _resolve(future: asyncio.Future, ticket: Ticket, scheduler: OpenAIScheduler) -> None:
+    if future.done():
+        # Cancelled between grant and wake-up: return the slot
+        scheduler.release(ticket)
+        return
+    future.set_result(ticket)
+
+
+def estimate_tokens(messages, max_tokens: int = 0) -> int:
+    """Cheap upper-bound estimate (~4 chars/token) used to reserve TPM budget before a call."""
+    chars = 0
+    images = 0
+    for msg in messages or []:
+        content = msg.get("content") if isinstance(msg, dict) else None
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    chars += len(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    images += 1
+        elif content is not None:
+            chars += len(json.dumps(content))
+    return chars // 4 + images * IMAGE_TOKEN_ESTIMATE + int(max_tokens or 0)
+
+
+def _usage_tokens(response) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    total = getattr(usage, "total_tokens", None) if usage is not None else None
+    return int(total) if isinstance(total, (int, float)) else None
+
+
+_scheduler: Optional[OpenAIScheduler] = None
+
+
+def get_openai_scheduler() -> OpenAIScheduler:
+    global _scheduler
+    if _scheduler is None:
+        from app.models.config import get_settings
+        settings = get_settings()
+        _scheduler = OpenAIScheduler(
+            max_concurrency=getattr(settings, "OPENAI_MAX_CONCURRENCY", 8),
+            requests_per_minute=getattr(settings, "OPENAI_REQUESTS_PER_MINUTE", 500),
+            tokens_per_minute=getattr(settings, "OPENAI_TOKENS_PER_MINUTE", 30_000),
+            bulk_every=getattr(settings, "OPENAI_BULK_EVERY", 4),
+        )
+    return _scheduler
+
+
+@asynccontextmanager
+async def openai_slot(*, priority: int = INTERACTIVE, tenant: Optional[str] = None, estimated_tokens: int = 0):
+    """
+    Hold a scheduler slot for the duration of the block (used directly by streaming
+    calls, whose slot must outlive the initial request). Set `ticket.actual_tokens`
+    to reconcile the budget with real usage on exit. Without an explicit tenant,
+    calls made while serving a request are queued under the caller's IP.
+    """
+    if tenant is None:
+        ctx = request_context.current()
+        tenant = (ctx.client_ip if ctx is not None else None) or "default"
+    from app.models.config import get_settings
+    # Don't queue behind an open circuit breaker: fail fast instead
+    get_openai_guard().breaker.check()
+    scheduler = get_openai_scheduler()
+    queue_timeout = getattr(get_settings(), "OPENAI_QUEUE_TIMEOUT_SECONDS", 0) or None
+    try:
+        with tracing.span("openai.queue", attributes={"priority": priority, "tenant": tenant, "estimated_tokens": estimated_tokens}):
+            ticket = await scheduler.acquire(priority, tenant, estimated_tokens, timeout=queue_timeout)
+    except asyncio.TimeoutError:
+        raise OpenAIFailure("OPENAI_RATE_LIMITED", "Timed out waiting for OpenAI capacity", 0)
+    try:
+        yield ticket
+    finally:
+        scheduler.release(ticket, actual_tokens=ticket.actual_tokens)
+
+
+async def call_openai_scheduled(fn, *, priority: int = INTERACTIVE, tenant: Optional[str] = None, estimated_tokens: int = 0, max_attempts: int = 3, per_attempt_timeout_s: float = 20.0, operation: str = "default"):
+    """
+    call_openai_with_retry behind the scheduler. Queue timeouts surface as
+    OPENAI_RATE_LIMITED. The ticket's slot covers every attempt; each retry is
+    charged to the RPM/TPM budgets as it is made, so retry storms slow later callers.
+    """
+    scheduler = get_openai_scheduler()
+    async with openai_slot(priority=priority, tenant=tenant, estimated_tokens=estimated_tokens) as ticket:
+        attempts = 0
+
+        async def _attempt():
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1:
+                scheduler.charge(ticket)
+            return await fn()
+
+        started = time.monotonic()
+        response = await call_openai_with_retry(_attempt, max_attempts=max_attempts, per_attempt_timeout_s=per_attempt_timeout_s, operation=operation)
+        ticket.actual_tokens = _usage_tokens(response)
+        get_usage_tracker().record(operation, getattr(response, "model", None), extract_usage(response), time.monotonic() - started)
+        return response
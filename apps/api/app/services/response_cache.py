@@ -0,0 +1,186 @@
+"""
+Response cache for deterministic (temperature 0.0) formatting calls.
+
+Keys are sha256 of the normalized input text plus everything that changes the
+output: call kind, prompt template version, model and temperature. Entries live
+in an in-memory LRU (bounded by max_entries) and are persisted as one JSON file
+per key under data/cache/responses/<ab>/<key>.json, so regenerating the same
+proposal after a restart is still a hit. Entries older than ttl_seconds are
+treated as misses and deleted.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from app.storage.atomic_write import atomic_write_bytes_sync
+
+logger = logging.getLogger("mph.response_cache")
+
+_MISSING = object()
+_WS_RE = re.compile(r"[ \t\u00a0]+")
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace/Unicode-insensitive form of OCR text (case and line order are kept)."""
+    text = unicodedata.normalize("NFC", text or "")
+    lines = [_WS_RE.sub(" ", line).strip() for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(line for line in lines if line)
+
+
+def prompt_version(*templates: str) -> str:
+    """Short content hash of the prompt templates; editing a prompt invalidates its entries."""
+    h = hashlib.sha256()
+    for t in templates:
+        h.update(t.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:12]
+
+
+def cache_key(kind: str, text: str, version: str, model: str, temperature: float, **extra) -> str:
+    material = json.dumps(
+        {
+            "kind": kind,
+            "text": normalize_text(text),
+            "prompt_version": version,
+            "model": model,
+            "temperature": float(temperature),
+            **extra,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, directory: Optional[Path], max_entries: int = 1000, ttl_seconds: float = 86400, clock=time.time):
+        self.directory = Path(directory) if directory else None
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (created_at, value); value is _MISSING while only the disk copy is known
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.directory is not None:
+            self._load_index()
+
+    # --- disk ---
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _load_index(self) -> None:
+        """Register persisted keys (newest last) without reading their values; drop expired/overflow."""
+        if not self.directory.exists():
+            return
+        now = self._clock()
+        found = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                found.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        found.sort()
+        for mtime, path in found:
+            if now - mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                continue
+            self._entries[path.stem] = (mtime, _MISSING)
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest()
+
+    def _read(self, key: str):
+        try:
+            record = json.loads(self._path(key).read_text(encoding="utf-8"))
+            return record["created_at"], record["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _evict_oldest(self) -> None:
+        key, _ = self._entries.popitem(last=False)
+        self.evictions += 1
+        if self.directory is not None:
+            self._path(key).unlink(missing_ok=True)
+
+    # --- public API ---
+    def get(self, key: str):
+        """Cached value or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is _MISSING:
+                loaded = self._read(key)
+                entry = loaded
+                if loaded is None:
+                    self._entries.pop(key, None)
+                else:
+                    self._entries[key] = loaded
+            if entry is None:
+                self.misses += 1
+                return None
+            created_at, value = entry
+            if self._clock() - created_at > self.ttl_seconds:
+                self._entries.pop(key, None)
+                if self.directory is not None:
+                    self._path(key).unlink(missing_ok=True)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value) -> None:
+        created_at = self._clock()
+        with self._lock:
+            self._entries[key] = (created_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+        if self.directory is not None:
+            try:
+                payload = json.dumps({"created_at": created_at, "value": value}, ensure_ascii=False)
+                atomic_write_bytes_sync(self._path(key), payload.encode("utf-8"))
+            except OSError:
+                # Memory copy still serves this process; persistence is best-effort
+                logger.warning("response_cache_write_failed key=%s", key, exc_info=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide cache, or None when RESPONSE_CACHE_ENABLED is off."""
+    global _cache
+    from app.models.config import get_settings
+    settings = get_settings()
+    if not getattr(settings, "RESPONSE_CACHE_ENABLED", True):
+        return None
+    if _cache is None:
+        from app.storage.file_manager import BASE_DIR
+        directory = getattr(settings, "RESPONSE_CACHE_DIR", None) or (BASE_DIR / "data" / "cache" / "responses")
+        _cache = ResponseCache(
+            directory,
+            max_entries=getattr(settings, "RESPONSE_CACHE_MAX_ENTRIES", 1000),
+            ttl_seconds=getattr(settings, "RESPONSE_CACHE_TTL_SECONDS", 7 * 86400),
+        )
+    return _cache
@@ -0,0 +1,104 @@
+"""
+Single-flight coalescing for identical concurrent AI calls.
+
+While a call for (namespace, key) is running, later callers with the same key
+await its result instead of issuing their own OpenAI request. The key is a
+content hash (image bytes for OCR, the response-cache key for formatting), so
+a double-submitted form or one page shared by a proposal and an invoice
+costs a single upstream call. Nothing is kept after the call finishes:
+completed results are the response cache's job, not this layer's.
+
+Followers share the leader's result or exception. If the leader is cancelled
+(its client went away), one follower takes over instead of inheriting the
+cancellation. Futures are concurrent.futures so followers on any event loop
+can wait on them.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_LEADER_CANCELLED = object()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: dict = {}
+        self._stats: dict = {}
+
+    def _count(self, namespace: str, field: str) -> None:
+        per_ns = self._stats.setdefault(namespace, {"calls": 0, "executed": 0, "coalesced": 0})
+        per_ns[field] += 1
+
+    async def do(self, namespace: str, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run `fn()` unless an identical call is in flight; then share its outcome."""
+        full_key = (namespace, key)
+        with self._lock:
+            self._count(namespace, "calls")
+        while True:
+            with self._lock:
+                future = self._inflight.get(full_key)
+                leader = future is None
+                if leader:
+                    future = self._inflight[full_key] = concurrent.futures.Future()
+                    self._count(namespace, "executed")
+                else:
+                    self._count(namespace, "coalesced")
+            if leader:
+                return await self._lead(full_key, future, fn)
+            result = await asyncio.wrap_future(future)
+            if result is not _LEADER_CANCELLED:
+                return result
+            # Leader was cancelled before finishing: contend to run it ourselves
+            with self._lock:
+                self._stats[namespace]["coalesced"] -= 1
+
+    async def _lead(self, full_key, future: concurrent.futures.Future, fn):
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._settle(full_key, future, result=_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            self._settle(full_key, future, exc=e)
+            raise
+        self._settle(full_key, future, result=result)
+        return result
+
+    def _settle(self, full_key, future, result=None, exc: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self._inflight.pop(full_key, None)
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._inflight),
+                "by_namespace": {ns: dict(counts) for ns, counts in self._stats.items()},
+            }
+
+
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
+
+
+async def single_flight(namespace: str, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+    """Coalesce through the process-wide SingleFlight (pass-through when SINGLE_FLIGHT_ENABLED is off)."""
+    from app.models.config import get_settings
+    if not getattr(get_settings(), "SINGLE_FLIGHT_ENABLED", True):
+        return await fn()
+    return await get_single_flight().do(namespace, key, fn)
@@ -0,0 +1,151 @@
+"""
+Per-call OpenAI token accounting.
+
+Every completed call's `usage` (prompt, completion and cached prompt tokens) is
+recorded with its operation, model and latency, and aggregated per operation,
+per route and per session. The route/session a call belongs to comes from the
+`usage_scope` the request handler entered, so services don't have to thread it
+through. `report()` turns the totals into an estimated cost, including what
+upstream prompt caching saved.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# USD per 1M tokens; cached prompt tokens are billed at the discounted rate
+MODEL_PRICES_PER_MILLION = {
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+}
+DEFAULT_MODEL = "gpt-4o"
+
+_scope: ContextVar[tuple] = ContextVar("openai_usage_scope", default=("-", None))
+
+
+@contextmanager
+def usage_scope(route: str, session_id: Optional[str] = None):
+    """Attribute OpenAI calls made inside the block to `route` and `session_id`."""
+    token = _scope.set((route, session_id))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def extract_usage(response) -> Optional[tuple]:
+    """(prompt_tokens, completion_tokens, cached_tokens) from a response or final stream chunk."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    prompt = getattr(usage, "prompt_tokens", None)
+    completion = getattr(usage, "completion_tokens", None)
+    if not isinstance(prompt, (int, float)) or not isinstance(completion, (int, float)):
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    return int(prompt), int(completion), int(cached) if isinstance(cached, (int, float)) else 0
+
+
+def _model_prices(model: str) -> dict:
+    for name in sorted(MODEL_PRICES_PER_MILLION, key=len, reverse=True):
+        # Dated snapshots ("gpt-4o-2024-08-06") bill like their base model
+        if model.startswith(name):
+            return MODEL_PRICES_PER_MILLION[name]
+    return MODEL_PRICES_PER_MILLION[DEFAULT_MODEL]
+
+
+class _Totals:
+    __slots__ = ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "latency_s", "cost_usd", "saved_usd")
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.latency_s = 0.0
+        self.cost_usd = 0.0
+        self.saved_usd = 0.0
+
+    def add(self, prompt, completion, cached, latency_s, cost, saved):
+        self.calls += 1
+        self.prompt_tokens += prompt
+        self.completion_tokens += completion
+        self.cached_tokens += cached
+        self.latency_s += latency_s
+        self.cost_usd += cost
+        self.saved_usd += saved
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+            "avg_latency_ms": round(1000 * self.latency_s / self.calls, 1) if self.calls else None,
+            "cost_usd": round(self.cost_usd, 6),
+            "prompt_cache_savings_usd": round(self.saved_usd, 6),
+        }
+
+
+class UsageTracker:
+    def __init__(self, max_sessions: int = 1000):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._total = _Totals()
+        self._by_operation = {}
+        self._by_route = {}
+        # Most recently active sessions only; older ones roll off
+        self._by_session: "OrderedDict[str, _Totals]" = OrderedDict()
+
+    def record(self, operation: str, model: Optional[str], usage: Optional[tuple], latency_s: float) -> None:
+        if usage is None:
+            return
+        prompt, completion, cached = usage
+        prices = _model_prices(model or DEFAULT_MODEL)
+        cost = ((prompt - cached) * prices["input"] + cached * prices["cached_input"] + completion * prices["output"]) / 1e6
+        saved = cached * (prices["input"] - prices["cached_input"]) / 1e6
+        route, session_id = _scope.get()
+        args = (prompt, completion, cached, latency_s, cost, saved)
+        with self._lock:
+            self._total.add(*args)
+            self._by_operation.setdefault(operation, _Totals()).add(*args)
+            self._by_route.setdefault(route, _Totals()).add(*args)
+            if session_id:
+                totals = self._by_session.get(session_id)
+                if totals is None:
+                    totals = self._by_session[session_id] = _Totals()
+                    while len(self._by_session) > self.max_sessions:
+                        self._by_session.popitem(last=False)
+                self._by_session.move_to_end(session_id)
+                totals.add(*args)
+
+    def session(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            totals = self._by_session.get(session_id)
+            return totals.as_dict() if totals is not None else None
+
+    def report(self, top_sessions: int = 20) -> dict:
+        with self._lock:
+            sessions = sorted(self._by_session.items(), key=lambda kv: kv[1].cost_usd, reverse=True)[:top_sessions]
+            return {
+                "total": self._total.as_dict(),
+                "by_operation": {k: v.as_dict() for k, v in self._by_operation.items()},
+                "by_route": {k: v.as_dict() for k, v in self._by_route.items()},
+                "top_sessions": {k: v.as_dict() for k, v in sessions},
+                "prices_per_million": MODEL_PRICES_PER_MILLION,
+            }
+
+
+_tracker: Optional[UsageTracker] = None
+
+
+def get_usage_tracker() -> UsageTracker:
+    global _tracker
+    if _tracker is None:
+        _tracker = UsageTracker()
+    return _tracker
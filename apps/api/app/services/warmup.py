@@ -0,0 +1,106 @@
+"""
+Startup warm-up, run by the FastAPI lifespan before the app reports ready.
+
+The first generate after a deploy used to pay for everything that is loaded
+lazily: the AI schema modules and their pydantic validators, reportlab's font
+metrics, the invoice template PDFs and the TLS handshake to OpenAI. Warm-up
+does that work up front:
+
+  validators  import the AI/proposal schemas and validate a sample document
+  templates   read the invoice template PDFs into ExportService's cache
+  pdf         render a throwaway invoice through ExportService (temp dir)
+  openai      open the pooled OpenAI connection (GET /models, no tokens spent)
+
+Each step is best-effort: a failure is logged and recorded, never fatal, and
+the whole stage is bounded by WARMUP_TIMEOUT_SECONDS. GET /ready answers 503
+until it has finished. WARMUP_ENABLED=0 skips it (ready immediately) and
+WARMUP_OPENAI=0 skips only the network step.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+logger = logging.getLogger("mph.warmup")
+
+_SAMPLE_DOC = (
+    '{"client_name": "Warm-up Client", "client_address": "1 Main St", '
+    '"line_items": [{"description": "Paint walls", "amount_cents": 120000}], '
+    '"professional_text": "Paint walls"}'
+)
+
+
+def warm_validators() -> None:
+    from app.ai.schema_contractor_v1 import validate_contractor_proposal_v1
+    from app.ai.schema_v1 import AiDocV1  # noqa: F401
+    from app.models.schemas import ProposalData
+
+    validate_contractor_proposal_v1(_SAMPLE_DOC)
+    ProposalData.model_validate({"client_name": "Warm-up Client", "line_items": [{"description": "Paint walls", "amount": 1200.0}]})
+
+
+def warm_templates() -> None:
+    from app.services.export_service import load_templates
+    load_templates()
+
+
+def warm_pdf() -> None:
+    from app.models.schemas import ProposalData
+    from app.services.container import get_services
+
+    data = ProposalData(
+        client_name="Warm-up Client",
+        project_address="1 Main St",
+        line_items=[{"description": "Paint walls", "amount": 1200.0}],
+        total=1200.0,
+    )
+    with tempfile.TemporaryDirectory(prefix="mph_warmup_") as tmp:
+        get_services().export_service._generate_pdf("warmup", data, "", Path(tmp) / "invoice.pdf", document_type="invoice")
+
+
+async def warm_openai(timeout: float) -> None:
+    import openai
+    from app.services.openai_client import get_openai_client
+
+    client = get_openai_client()
+    try:
+        await client.with_options(timeout=timeout).models.list()
+    except openai.APIStatusError:
+        # Any HTTP answer means the connection (and TLS session) is pooled
+        pass
+
+
+async def run_warmup(settings) -> Dict[str, dict]:
+    """Run every warm-up step; returns {step: {"ok": bool, "ms": float}}."""
+    timeout = float(getattr(settings, "WARMUP_TIMEOUT_SECONDS", 30.0))
+    steps = [
+        ("validators", lambda: asyncio.to_thread(warm_validators)),
+        ("templates", lambda: asyncio.to_thread(warm_templates)),
+        ("pdf", lambda: asyncio.to_thread(warm_pdf)),
+    ]
+    if getattr(settings, "WARMUP_OPENAI", True):
+        steps.append(("openai", lambda: warm_openai(timeout)))
+
+    results: Dict[str, dict] = {}
+    deadline = time.monotonic() + timeout
+    for name, step in steps:
+        started = time.perf_counter()
+        remaining = deadline - time.monotonic()
+        try:
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            await asyncio.wait_for(step(), timeout=remaining)
+            ok = True
+        except asyncio.TimeoutError:
+            ok = False
+            logger.warning("warmup_step_timeout step=%s timeout_s=%s", name, timeout)
+        except Exception:
+            ok = False
+            logger.warning("warmup_step_failed step=%s", name, exc_info=True)
+        results[name] = {"ok": ok, "ms": round((time.perf_counter() - started) * 1000.0, 1)}
+    logger.info("warmup_complete %s", " ".join(f"{k}={v['ms']}ms{'' if v['ok'] else '(failed)'}" for k, v in results.items()))
+    return results
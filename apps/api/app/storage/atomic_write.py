@@ -5,6 +5,8 @@ from typing import Union
 
 import aiofiles
 
+from app.observability.metrics import STORAGE_BYTES_WRITTEN
+
 async def atomic_write_bytes(path: Union[str, Path], data: bytes, mode: str = 'wb'):
     """
     Atomically write bytes to a file. Writes to a temp file and moves it into place.
@@ -18,6 +20,7 @@ async def atomic_write_bytes(path: Union[str, Path], data: bytes, mode: str = 'w
         async with aiofiles.open(tmp_path, mode) as f:
             await f.write(data)
         os.replace(tmp_path, path)
+        STORAGE_BYTES_WRITTEN.labels("async").inc(len(data))
     except Exception:
         if os.path.exists(tmp_path):
             os.remove(tmp_path)
@@ -28,3 +31,21 @@ async def atomic_write_text(path: Union[str, Path], text: str, encoding: str = '
     Atomically write text to a file. Writes to a temp file and moves it into place.
     """
     await atomic_write_bytes(path, text.encode(encoding), mode='wb')
+
+def atomic_write_bytes_sync(path: Union[str, Path], data: bytes):
+    """
+    Blocking variant of atomic_write_bytes for worker threads (no event loop).
+    """
+    path = Path(path)
+    dir_path = path.parent
+    dir_path.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dir_path, prefix=path.name + ".tmp.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        STORAGE_BYTES_WRITTEN.labels("sync").inc(len(data))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -1,32 +1,96 @@
 
 from pathlib import Path
 from fastapi import UploadFile
-from typing import Optional
+from typing import Iterator, Optional
+import hashlib
 import json
+import re
 import aiofiles
 from app.models.schemas import ProposalData
 from app.storage.atomic_write import atomic_write_bytes, atomic_write_text
 
 BASE_DIR = Path(__file__).parent.parent.parent.parent
 
+# Shard directory names: two lowercase hex chars (sessions/ab/cd/<id>)
+SHARD_RE = re.compile(r"^[0-9a-f]{2}$")
+
+
+def shard_path(root: Path, entity_id: str) -> Path:
+    """Hash-prefix sharded location for an entity: <root>/ab/cd/<entity_id>."""
+    digest = hashlib.sha256(entity_id.encode("utf-8")).hexdigest()
+    return root / digest[:2] / digest[2:4] / entity_id
+
+
+def iter_entity_dirs(root: Path) -> Iterator[Path]:
+    """Yield every entity dir under root, in both the sharded and legacy flat layouts."""
+    if not root.exists():
+        return
+    for entry in root.iterdir():
+        if not entry.is_dir():
+            continue
+        if not SHARD_RE.match(entry.name):
+            yield entry  # legacy flat <root>/<id>
+            continue
+        for level2 in entry.iterdir():
+            if not level2.is_dir() or not SHARD_RE.match(level2.name):
+                continue
+            for leaf in level2.iterdir():
+                if leaf.is_dir():
+                    yield leaf
+
 
 class FileManager:
-    def __init__(self):
+    def __init__(self, sharded: Optional[bool] = None):
+        # Construction is free of I/O and settings reads: the layout flag is resolved on
+        # first use, and every write creates the directories it needs (readers already
+        # treat a missing root as empty).
+        self._sharded = None if sharded is None else bool(sharded)
         self.data_dir = BASE_DIR / "data"
         self.uploads_dir = self.data_dir / "raw_uploads"
         self.sessions_dir = self.data_dir / "sessions"
         self.ground_truth_dir = self.data_dir / "ground_truth"
         self.books_dir = self.data_dir / "books"
-        
-        # Create directories
-        self.uploads_dir.mkdir(parents=True, exist_ok=True)
-        self.sessions_dir.mkdir(parents=True, exist_ok=True)
-        self.ground_truth_dir.mkdir(parents=True, exist_ok=True)
-        self.books_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def sharded(self) -> bool:
+        # When False, new entities are still created flat (rollback switch); lookups
+        # always check both layouts.
+        if self._sharded is None:
+            from app.models.config import get_settings
+            self._sharded = bool(getattr(get_settings(), "STORAGE_SHARDED_LAYOUT", True))
+        return self._sharded
+
+    def ensure_dirs(self) -> None:
+        """Create the top-level data directories (startup / maintenance scripts)."""
+        for d in (self.uploads_dir, self.sessions_dir, self.ground_truth_dir, self.books_dir):
+            d.mkdir(parents=True, exist_ok=True)
+
+    def _resolve(self, root: Path, entity_id: str) -> Path:
+        sharded = shard_path(root, entity_id)
+        if sharded.exists():
+            return sharded
+        legacy = root / entity_id
+        if legacy.exists():
+            return legacy
+        return sharded if self.sharded else legacy
+
+    def session_dir(self, session_id: str) -> Path:
+        """Directory for a session, preferring the sharded layout and falling back to legacy."""
+        return self._resolve(self.sessions_dir, session_id)
+
+    def chapter_dir(self, chapter_id: str) -> Path:
+        """Directory for a book chapter, preferring the sharded layout and falling back to legacy."""
+        return self._resolve(self.books_dir, chapter_id)
+
+    def iter_session_dirs(self) -> Iterator[Path]:
+        return iter_entity_dirs(self.sessions_dir)
+
+    def iter_chapter_dirs(self) -> Iterator[Path]:
+        return iter_entity_dirs(self.books_dir)
     
     async def save_upload(self, session_id: str, file: UploadFile) -> Path:
         """Save uploaded image to raw_uploads and session directory"""
-        session_dir = self.sessions_dir / session_id
+        session_dir = self.session_dir(session_id)
         session_dir.mkdir(parents=True, exist_ok=True)
         file_path = session_dir / f"original_{file.filename}"
         content = await file.read()
@@ -35,13 +99,13 @@ class FileManager:
     
     async def save_transcription(self, session_id: str, text: str):
         """Save raw transcription to session directory"""
-        session_dir = self.sessions_dir / session_id
+        session_dir = self.session_dir(session_id)
         session_dir.mkdir(parents=True, exist_ok=True)
         await atomic_write_text(session_dir / "transcription.txt", text, encoding="utf-8")
     
     async def save_proposal(self, session_id: str, proposal_data, document_type: str = "proposal"):
         """Save structured proposal/invoice data to session directory. Accepts Pydantic model or dict."""
-        session_dir = self.sessions_dir / session_id
+        session_dir = self.session_dir(session_id)
         session_dir.mkdir(parents=True, exist_ok=True)
         filename = f"{document_type}.json"
         if hasattr(proposal_data, "model_dump_json"):
@@ -53,7 +117,7 @@ class FileManager:
     
     async def load_proposal(self, session_id: str, document_type: str = "proposal") -> Optional[ProposalData]:
         """Load proposal/invoice data from session directory"""
-        session_dir = self.sessions_dir / session_id
+        session_dir = self.session_dir(session_id)
         filename = f"{document_type}.json"
         proposal_path = session_dir / filename
         if not proposal_path.exists():
@@ -73,7 +137,7 @@ class FileManager:
         """Save multiple uploaded pages for a chapter, each with a unique name"""
         from uuid import uuid4
         import re
-        chapter_dir = self.books_dir / chapter_id
+        chapter_dir = self.chapter_dir(chapter_id)
         chapter_dir.mkdir(parents=True, exist_ok=True)
         saved_paths = []
         for i, file in enumerate(files, 1):
@@ -88,7 +152,7 @@ class FileManager:
     
     async def save_chapter_data(self, chapter_id: str, chapter_name: str, transcribed_text: str, page_count: int):
         """Save chapter metadata and transcription"""
-        chapter_dir = self.books_dir / chapter_id
+        chapter_dir = self.chapter_dir(chapter_id)
         chapter_dir.mkdir(parents=True, exist_ok=True)
         data = {
             "chapter_id": chapter_id,
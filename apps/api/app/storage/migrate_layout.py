@@ -0,0 +1,78 @@
+"""
+Online migration of legacy flat session/chapter directories to the sharded layout.
+
+    python -m app.storage.migrate_layout [--dry-run]
+
+Safe to run while the API is serving traffic: FileManager resolves both layouts,
+each directory is moved with a single os.rename, and a legacy directory that is
+recreated by a concurrent write after its move is merged into the sharded copy
+on the next run. Re-run until it reports nothing left to move.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+from app.storage.file_manager import SHARD_RE, FileManager, shard_path
+
+
+def _merge_into(src: Path, dst: Path) -> None:
+    """Move entries from src into dst, keeping the newer file on conflicts."""
+    for entry in src.iterdir():
+        target = dst / entry.name
+        if entry.is_dir():
+            target.mkdir(exist_ok=True)
+            _merge_into(entry, target)
+            continue
+        if target.exists() and target.stat().st_mtime >= entry.stat().st_mtime:
+            entry.unlink()
+            continue
+        os.replace(entry, target)
+    src.rmdir()
+
+
+def migrate_root(root: Path, dry_run: bool = False) -> dict:
+    result = {"moved": 0, "merged": 0, "errors": 0}
+    if not root.exists():
+        return result
+    for legacy in list(root.iterdir()):
+        if not legacy.is_dir() or SHARD_RE.match(legacy.name):
+            continue
+        target = shard_path(root, legacy.name)
+        if dry_run:
+            result["merged" if target.exists() else "moved"] += 1
+            continue
+        try:
+            if target.exists():
+                _merge_into(legacy, target)
+                result["merged"] += 1
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.rename(legacy, target)
+                result["moved"] += 1
+        except OSError:
+            result["errors"] += 1
+    return result
+
+
+def migrate_to_sharded(file_manager: FileManager, dry_run: bool = False) -> dict:
+    return {
+        "sessions": migrate_root(file_manager.sessions_dir, dry_run=dry_run),
+        "books": migrate_root(file_manager.books_dir, dry_run=dry_run),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Move flat data/sessions and data/books dirs into the sharded layout.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be moved.")
+    args = parser.parse_args(argv)
+    result = migrate_to_sharded(FileManager(), dry_run=args.dry_run)
+    print(json.dumps(result))
+    errors = result["sessions"]["errors"] + result["books"]["errors"]
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,306 @@
+"""
+Retention and compaction for data/sessions, data/books and data/raw_uploads.
+
+A single pass (run_retention_pass) applies three policies:
+  - age-based deletion of whole session/chapter directories and raw uploads
+  - recompression of original photos into a lower-quality JPEG archive tier
+  - removal of orphaned files (atomic-write leftovers, debug overlay PDFs,
+    leaked template copies in the temp dir, empty session directories)
+
+RetentionWorker runs the pass periodically from the FastAPI lifespan, in a
+worker thread so directory scans never block the event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import logging
+import re
+import shutil
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+from app.storage.atomic_write import atomic_write_bytes_sync
+from app.storage.file_manager import SHARD_RE, iter_entity_dirs
+
+logger = logging.getLogger("mph.retention")
+
+# Prefix of the per-render template copies older ExportService versions wrote to the
+# system temp dir; still swept so a crashed render from a previous deploy is cleaned up
+TEMPLATE_TMP_PREFIX = "mph_template_"
+# Suffix marking originals already moved to the archive tier
+ARCHIVE_SUFFIX = ".archived.jpg"
+# Debug artifacts written next to the PDF when STRESS_TEST_DEBUG=1
+DEBUG_ARTIFACTS = ("invoice_overlay.pdf", "invoice_template.pdf")
+# atomic_write_bytes temp files: "<name>.tmp.<random>"
+ATOMIC_TMP_RE = re.compile(r"\.tmp\.[A-Za-z0-9_]+$")
+# Book page files: "001_<uuid hex>_<name>"
+BOOK_PAGE_RE = re.compile(r"^\d{3}_[0-9a-f]{32}_")
+ARCHIVABLE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+
+DAY_SECONDS = 86400
+
+
+@dataclass
+class RetentionPolicy:
+    max_age_days: int = 0
+    archive_after_days: int = 0
+    archive_quality: int = 60
+    archive_max_dimension: int = 2000
+    orphan_grace_seconds: int = 3600
+
+    @classmethod
+    def from_settings(cls, settings) -> "RetentionPolicy":
+        return cls(
+            max_age_days=int(getattr(settings, "RETENTION_MAX_AGE_DAYS", 0)),
+            archive_after_days=int(getattr(settings, "RETENTION_ARCHIVE_AFTER_DAYS", 0)),
+            archive_quality=int(getattr(settings, "RETENTION_ARCHIVE_QUALITY", 60)),
+            archive_max_dimension=int(getattr(settings, "RETENTION_ARCHIVE_MAX_DIMENSION", 2000)),
+            orphan_grace_seconds=int(getattr(settings, "RETENTION_ORPHAN_GRACE_SECONDS", 3600)),
+        )
+
+
+@dataclass
+class RetentionStats:
+    scanned_entries: int = 0
+    deleted_files: int = 0
+    deleted_dirs: int = 0
+    recompressed_files: int = 0
+    reclaimed_bytes: int = 0
+    scan_seconds: float = 0.0
+    errors: int = 0
+
+    def add(self, other: "RetentionStats") -> None:
+        for name, value in asdict(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+
+def _tree_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    for p in path.rglob("*"):
+        try:
+            if p.is_file():
+                total += p.stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+def _last_modified(path: Path) -> float:
+    """Newest mtime of a directory and its direct children (dir mtime alone misses rewrites)."""
+    newest = path.stat().st_mtime
+    for p in path.iterdir():
+        try:
+            newest = max(newest, p.stat().st_mtime)
+        except OSError:
+            pass
+    return newest
+
+
+def _remove(path: Path, stats: RetentionStats) -> None:
+    try:
+        size = _tree_size(path)
+        if path.is_dir():
+            shutil.rmtree(path)
+            stats.deleted_dirs += 1
+        else:
+            path.unlink()
+            stats.deleted_files += 1
+        stats.reclaimed_bytes += size
+    except FileNotFoundError:
+        pass
+    except OSError:
+        logger.exception("retention_remove_failed path=%s", path)
+        stats.errors += 1
+
+
+def _recompress(path: Path, policy: RetentionPolicy, stats: RetentionStats) -> None:
+    """Rewrite an original photo as a downscaled JPEG; keep it only if it is smaller."""
+    from PIL import Image
+
+    try:
+        original_size = path.stat().st_size
+        with Image.open(path) as img:
+            img = img.convert("RGB")
+            img.thumbnail((policy.archive_max_dimension, policy.archive_max_dimension))
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=policy.archive_quality, optimize=True)
+    except Exception:
+        # Unreadable/unsupported formats (e.g. HEIC without a plugin) stay as-is
+        stats.errors += 1
+        return
+    data = buf.getvalue()
+    if len(data) >= original_size:
+        return
+    archived = path.with_name(path.stem + ARCHIVE_SUFFIX)
+    atomic_write_bytes_sync(archived, data)
+    path.unlink()
+    stats.recompressed_files += 1
+    stats.reclaimed_bytes += original_size - len(data)
+
+
+def _is_archivable(path: Path, in_books: bool) -> bool:
+    if path.name.endswith(ARCHIVE_SUFFIX) or path.suffix.lower() not in ARCHIVABLE_EXTS:
+        return False
+    if in_books:
+        return bool(BOOK_PAGE_RE.match(path.name))
+    return path.name.startswith("original_")
+
+
+def _sweep_entity_dir(entity_dir: Path, policy: RetentionPolicy, now: float, stats: RetentionStats, in_books: bool) -> None:
+    """Apply age, archive and orphan policies to one session/chapter directory."""
+    try:
+        last_modified = _last_modified(entity_dir)
+    except FileNotFoundError:
+        return
+    age = now - last_modified
+    if policy.max_age_days > 0 and age > policy.max_age_days * DAY_SECONDS:
+        _remove(entity_dir, stats)
+        return
+
+    children = list(entity_dir.iterdir())
+    if not children:
+        if age > policy.orphan_grace_seconds:
+            _remove(entity_dir, stats)
+        return
+
+    for child in children:
+        stats.scanned_entries += 1
+        if not child.is_file():
+            continue
+        try:
+            child_age = now - child.stat().st_mtime
+        except FileNotFoundError:
+            continue
+        if child_age > policy.orphan_grace_seconds and (
+            ATOMIC_TMP_RE.search(child.name) or child.name in DEBUG_ARTIFACTS
+        ):
+            _remove(child, stats)
+            continue
+        if (
+            policy.archive_after_days > 0
+            and child_age > policy.archive_after_days * DAY_SECONDS
+            and _is_archivable(child, in_books)
+        ):
+            _recompress(child, policy, stats)
+
+
+def _prune_empty_shards(root: Path) -> None:
+    """Drop shard directories (<root>/ab/cd) left empty after entity deletion."""
+    for level1 in list(root.iterdir()):
+        if not level1.is_dir() or not SHARD_RE.match(level1.name):
+            continue
+        for level2 in list(level1.iterdir()):
+            if level2.is_dir() and SHARD_RE.match(level2.name):
+                try:
+                    level2.rmdir()
+                except OSError:
+                    pass  # not empty
+        try:
+            level1.rmdir()
+        except OSError:
+            pass
+
+
+def run_retention_pass(file_manager, policy: RetentionPolicy, now: Optional[float] = None, temp_dir: Optional[Path] = None) -> RetentionStats:
+    """Run one blocking retention pass over the FileManager's data directories."""
+    started = time.perf_counter()
+    now = time.time() if now is None else now
+    stats = RetentionStats()
+
+    for root, in_books in ((file_manager.sessions_dir, False), (file_manager.books_dir, True)):
+        if not root.exists():
+            continue
+        for entity_dir in list(iter_entity_dirs(root)):
+            stats.scanned_entries += 1
+            _sweep_entity_dir(entity_dir, policy, now, stats, in_books)
+        _prune_empty_shards(root)
+
+    uploads_dir = file_manager.uploads_dir
+    if policy.max_age_days > 0 and uploads_dir.exists():
+        for upload in list(uploads_dir.iterdir()):
+            stats.scanned_entries += 1
+            try:
+                if now - upload.stat().st_mtime > policy.max_age_days * DAY_SECONDS:
+                    _remove(upload, stats)
+            except FileNotFoundError:
+                pass
+
+    temp_dir = Path(temp_dir or tempfile.gettempdir())
+    for leaked in temp_dir.glob(f"{TEMPLATE_TMP_PREFIX}*.pdf"):
+        stats.scanned_entries += 1
+        try:
+            if now - leaked.stat().st_mtime > policy.orphan_grace_seconds:
+                _remove(leaked, stats)
+        except FileNotFoundError:
+            pass
+
+    stats.scan_seconds = time.perf_counter() - started
+    return stats
+
+
+class RetentionWorker:
+    """Periodic retention pass, started and stopped by the app lifespan."""
+
+    def __init__(self, file_manager, policy: RetentionPolicy, interval_seconds: int = 3600):
+        self.file_manager = file_manager
+        self.policy = policy
+        self.interval_seconds = max(int(interval_seconds), 1)
+        self.last_stats: Optional[RetentionStats] = None
+        self.totals = RetentionStats()
+        self.passes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, settings) -> "RetentionWorker":
+        from app.services.container import get_services
+        return cls(
+            get_services().file_manager,
+            RetentionPolicy.from_settings(settings),
+            interval_seconds=getattr(settings, "RETENTION_INTERVAL_SECONDS", 3600),
+        )
+
+    async def run_once(self) -> RetentionStats:
+        stats = await asyncio.to_thread(run_retention_pass, self.file_manager, self.policy)
+        self.last_stats = stats
+        self.totals.add(stats)
+        self.passes += 1
+        logger.info(json.dumps({"event": "retention_pass", **asdict(stats)}))
+        return stats
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("retention_pass_failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def snapshot(self) -> dict:
+        return {
+            "passes": self.passes,
+            "last": asdict(self.last_stats) if self.last_stats else None,
+            "totals": asdict(self.totals),
+        }
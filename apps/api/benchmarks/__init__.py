@@ -0,0 +1 @@
+"""Micro/macro benchmarks for the API hot paths. Run with `python -m benchmarks` from apps/api."""
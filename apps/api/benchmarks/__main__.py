@@ -0,0 +1,85 @@
+"""
+python -m benchmarks [-k SUBSTRING] [--quick] [--threshold 0.25] [--save-baseline] [--json PATH]
+
+Exits 1 when any case's p50 is more than `threshold` above benchmarks/baseline.json.
+Re-record the baseline (--save-baseline) on the machine that runs the comparison.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+# Same environment the test suite uses; nothing here talks to OpenAI over the network
+os.environ.setdefault("DEMO_PASSWORD", "bench-demo")
+os.environ.setdefault("ADMIN_PASSWORD", "bench-admin")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
+os.environ.setdefault("JOBS_ENABLED", "0")
+# Replayed OpenAI calls must not queue behind the upstream rate budgets
+os.environ.setdefault("OPENAI_REQUESTS_PER_MINUTE", "100000000")
+os.environ.setdefault("OPENAI_TOKENS_PER_MINUTE", "100000000000")
+
+from benchmarks import cases  # noqa: E402,F401  (registers the cases)
+from benchmarks.harness import (  # noqa: E402
+    CASES,
+    DEFAULT_THRESHOLD,
+    compare,
+    format_table,
+    load_baseline,
+    run_case,
+    save_baseline,
+    warn_if_foreign_baseline,
+)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Hot-path benchmarks with baseline regression check.")
+    parser.add_argument("-k", dest="filter", default="", help="only run cases whose name contains this substring")
+    parser.add_argument("--quick", action="store_true", help="one tenth of the iterations (smoke run; no regression gate)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed p50 slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="write results to benchmarks/baseline.json")
+    parser.add_argument("--json", dest="json_path", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    # Pipeline INFO logs would dominate the timings of the small cases
+    logging.disable(logging.INFO)
+    selected = [c for c in CASES if args.filter in c.name]
+    if not selected:
+        print(f"no cases match {args.filter!r}", file=sys.stderr)
+        return 2
+
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        for case in selected:
+            iterations = max(1, case.iterations // 10) if args.quick else case.iterations
+            results[case.name] = run_case(case, iterations=iterations, loop=loop)
+            print(f"  {case.name}: p50 {results[case.name]['p50_ms']:.4f} ms", file=sys.stderr)
+    finally:
+        loop.close()
+
+    if args.save_baseline:
+        baseline = load_baseline() or {"results": {}}
+        save_baseline({**baseline.get("results", {}), **results})
+        print("baseline saved", file=sys.stderr)
+        baseline = load_baseline()
+    else:
+        baseline = load_baseline()
+        warn_if_foreign_baseline(baseline)
+
+    rows = compare(results, baseline, args.threshold)
+    print(format_table(rows))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"threshold": args.threshold, "cases": rows}, f, indent=2)
+    regressed = [r["name"] for r in rows if r["regressed"]]
+    if regressed and not args.quick:
+        print(f"\nREGRESSION (> {args.threshold:.0%} slower p50): {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
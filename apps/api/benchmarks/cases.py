@@ -0,0 +1,230 @@
+"""
+Benchmark cases. Inputs are fixed (no randomness, no network). The OpenAI
+client is never called over the network: structure_proposal gets a canned model
+response and the replay case serves a recorded cassette (cassettes/).
+"""
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from openai import AsyncOpenAI as _AsyncOpenAI  # bound at import; test harnesses swap openai.AsyncOpenAI
+
+from benchmarks.harness import benchmark
+
+_TMP = Path(tempfile.mkdtemp(prefix="mph-bench-"))
+atexit.register(shutil.rmtree, _TMP, True)
+
+_SMALL_ITEMS = [
+    {"description": "Demo and haul away existing carpet", "amount": 450.0},
+    {"description": "Install new carpet pad and carpet, living room and hallway", "amount": 2350.0},
+    {"description": "Paint living room walls, two coats", "amount": 1200.0},
+    {"description": "Replace baseboard trim", "amount": 640.5},
+    {"description": "Touch-up", "amount": 150.0},
+]
+_LONG_DESCRIPTION = (
+    "Remove existing drywall, inspect framing for water damage, replace damaged studs, install "
+    "moisture-resistant drywall, tape, mud, sand and prime, including all materials and cleanup"
+)
+_LARGE_ITEMS = [
+    {"description": f"{i + 1}. {_LONG_DESCRIPTION}" if i % 3 else f"Line item {i + 1}", "amount": (None if i % 7 == 0 else 100.0 + i)}
+    for i in range(400)
+]
+_PROFESSIONAL_TEXT = "\n".join(f"{item['description']} — ${item['amount'] or 0:,.2f}" for item in _SMALL_ITEMS)
+
+_RAW_NOTES = "\n".join([
+    "--- Page 1 ---",
+    "",
+    "PROPOSAL",
+    "Jane Homeowner",
+    "1234 Maple Ave",
+    "Springfield",
+    "- demo carpet living room ~ 450",
+    "- install carpet + pad 2350",
+    "- paint walls 2 coats 1200",
+    "- base shoe / trim 640.50",
+] + [f"- misc scope line {i} labor + material {i * 10}" for i in range(30)])
+
+_MODEL_OUTPUT = {
+    "customer_name": "Jane Homeowner",
+    "address": "1234 Maple Ave",
+    "line_items": [
+        {"item": f"Scope line {i}", "amount_cents": 12_500 + i} if i % 2 else {"name": f"Scope line {i}", "amount": 125.0 + i}
+        for i in range(40)
+    ],
+    "total_cents": 512_345,
+}
+
+
+def _proposal(items):
+    from app.models.schemas import ProposalData
+    return ProposalData(
+        client_name="Jane Homeowner",
+        project_address="1234 Maple Ave",
+        line_items=items,
+        total=sum(item["amount"] or 0 for item in items),
+    )
+
+
+def _render(data):
+    from app.services.export_service import ExportService
+    ExportService()._generate_pdf("bench", data, _PROFESSIONAL_TEXT, _TMP / "bench.pdf", document_type="proposal")
+
+
+_small = None
+_large = None
+
+
+@benchmark("export.generate_pdf.small_5_items", iterations=30, warmup=3)
+def generate_pdf_small():
+    global _small
+    _small = _small or _proposal(_SMALL_ITEMS)
+    _render(_small)
+
+
+@benchmark("export.generate_pdf.large_400_items", iterations=5, warmup=1)
+def generate_pdf_large():
+    global _large
+    _large = _large or _proposal(_LARGE_ITEMS)
+    _render(_large)
+
+
+@benchmark("export.wrap_text_to_width", iterations=500, warmup=20)
+def wrap_text():
+    from app.services.export_service import wrap_text_to_width
+    wrap_text_to_width(_LONG_DESCRIPTION * 3, "Helvetica", 10, 300)
+
+
+_MONEY_VALUES = [None, "", 0, 12, 1234.5, "1234.5", "$1,234.50", "9999999", -42.125, "n/a"] * 10
+
+
+@benchmark("export.format_money.x100", iterations=500, warmup=20)
+def format_money():
+    from app.services.export_service import ExportService
+    fmt = ExportService.format_money
+    for value in _MONEY_VALUES:
+        fmt(value)
+
+
+@benchmark("proposals.parse_fallback_header", iterations=1000, warmup=50)
+def fallback_header():
+    from app.api.proposals import parse_fallback_header
+    parse_fallback_header(_RAW_NOTES)
+
+
+def _canned_formatting_service():
+    """FormattingService whose model call returns a fixed ContractorDoc-ish payload."""
+    from app.services.formatting_service import FormattingService
+
+    class CannedFormattingService(FormattingService):
+        async def rewrite_structured_proposal(self, ocr_texts, use_cache=True):
+            return _MODEL_OUTPUT_JSON
+
+    return CannedFormattingService(client=object())
+
+
+_MODEL_OUTPUT_JSON = json.dumps(_MODEL_OUTPUT)
+_formatting = None
+
+
+@benchmark("formatting.structure_proposal.normalize", iterations=1000, warmup=50)
+async def structure_proposal():
+    global _formatting
+    _formatting = _formatting or _canned_formatting_service()
+    await _formatting.structure_proposal(_RAW_NOTES)
+
+
+@benchmark("formatting.normalize_proposal_data", iterations=1000, warmup=50, setup=lambda: copy.deepcopy(_MODEL_OUTPUT))
+def normalize(data):
+    from app.services.formatting_service import normalize_proposal_data
+    normalize_proposal_data(data, _RAW_NOTES)
+
+
+_CASSETTE = Path(__file__).parent / "cassettes" / "formatting.jsonl"
+_replay_formatting = None
+
+
+def _replay_formatting_service():
+    """FormattingService on a real AsyncOpenAI client whose transport replays the cassette.
+
+    Re-record with OPENAI_CASSETTE_MODE=record against loadtest.fake_openai
+    (or the real API) whenever the single-call prompt changes.
+    """
+    import httpx
+    from app.services.formatting_service import FormattingService
+    from app.services.openai_cassette import ReplayTransport
+
+    transport = ReplayTransport.from_path(_CASSETTE)
+    client = _AsyncOpenAI(api_key="benchmark", base_url="http://cassette/v1", http_client=httpx.AsyncClient(transport=transport), max_retries=0)
+    return FormattingService(client=client)
+
+
+@benchmark("formatting.single_call.cassette_replay", iterations=300, warmup=20)
+async def single_call_replay():
+    global _replay_formatting
+    _replay_formatting = _replay_formatting or _replay_formatting_service()
+    await _replay_formatting.generate_proposal_single_call(_RAW_NOTES, "proposal", use_cache=False)
+
+
+_client = None
+
+
+def _test_client():
+    global _client
+    if _client is None:
+        from fastapi.testclient import TestClient
+        from app.main import app
+        _client = TestClient(app)
+    return _client
+
+
+def _admin_headers():
+    from app.models.config import get_settings
+    return {"Authorization": f"Bearer {get_settings().admin_password}"}
+
+
+@benchmark("middleware.stack.get_health", iterations=300, warmup=20)
+def middleware_health():
+    _test_client().get("/health")
+
+
+@benchmark("middleware.stack.authed_json_404", iterations=300, warmup=20)
+def middleware_authed_404():
+    _test_client().get("/api/history/bench-missing", headers=_admin_headers())
+
+
+# Cold start: fresh interpreters, so these include ~20 ms of Python startup each
+_API_DIR = Path(__file__).resolve().parents[1]
+
+
+def _cold_python(code: str) -> None:
+    env = {**os.environ, "RETENTION_ENABLED": "0", "JOBS_ENABLED": "0"}
+    subprocess.run([sys.executable, "-c", code], cwd=_API_DIR, env=env, check=True, capture_output=True)
+
+
+@benchmark("startup.import_app_main", iterations=10, warmup=1)
+def cold_import():
+    _cold_python("import app.main")
+
+
+@benchmark("startup.first_request", iterations=10, warmup=1)
+def cold_first_request():
+    # The lifespan creates the data directories; keep them out of the repo's data/
+    _cold_python(
+        "import tempfile\n"
+        "from pathlib import Path\n"
+        "from fastapi.testclient import TestClient\n"
+        "from app.storage import file_manager\n"
+        "with tempfile.TemporaryDirectory(prefix='mph_bench_') as tmp:\n"
+        "    file_manager.BASE_DIR = Path(tmp)\n"
+        "    from app.main import app\n"
+        "    with TestClient(app) as client:\n"
+        "        assert client.get('/health').status_code == 200\n"
+    )
@@ -0,0 +1,134 @@
+"""
+Timing harness: registry of cases, latency statistics and baseline comparison.
+
+Each case runs `warmup` untimed iterations and then `iterations` timed ones.
+Per-iteration setup (fresh inputs for functions that mutate them) is not
+timed. The report gives ops/s over the timed iterations and p50/p99/mean
+latency. A case regresses when its p50 exceeds the stored baseline's by more
+than the threshold. p99 is reported but not gated; it is too noisy on shared
+machines.
+"""
+from __future__ import annotations
+
+import asyncio
+import gc
+import inspect
+import json
+import platform
+import random
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+DEFAULT_THRESHOLD = 0.25
+
+
+@dataclass
+class Case:
+    name: str
+    fn: Callable
+    setup: Optional[Callable] = None
+    iterations: int = 200
+    warmup: int = 10
+
+
+CASES: List[Case] = []
+
+
+def benchmark(name: str, *, iterations: int = 200, warmup: int = 10, setup: Optional[Callable] = None):
+    """Register `fn` as a case. `fn(arg)` gets `setup()`'s result when a setup is given; coroutines are awaited."""
+    def register(fn):
+        CASES.append(Case(name, fn, setup, iterations, warmup))
+        return fn
+    return register
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def run_case(case: Case, iterations: Optional[int] = None, loop: Optional[asyncio.AbstractEventLoop] = None) -> dict:
+    iterations = max(1, iterations or case.iterations)
+    is_async = inspect.iscoroutinefunction(case.fn)
+    random.seed(0)
+
+    def call(arg):
+        result = case.fn(arg) if case.setup is not None else case.fn()
+        if is_async:
+            loop.run_until_complete(result)
+
+    for _ in range(min(case.warmup, iterations)):
+        call(case.setup() if case.setup is not None else None)
+    gc.collect()
+    samples = []
+    total = 0.0
+    for _ in range(iterations):
+        arg = case.setup() if case.setup is not None else None
+        started = time.perf_counter()
+        call(arg)
+        elapsed = time.perf_counter() - started
+        samples.append(elapsed)
+        total += elapsed
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "ops_per_s": round(iterations / total, 2) if total else None,
+        "mean_ms": round(total / iterations * 1000, 4),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 4),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 4),
+    }
+
+
+def environment() -> dict:
+    return {"python": platform.python_version(), "implementation": platform.python_implementation(), "machine": platform.machine(), "system": platform.system()}
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Optional[dict]:
+    if not path.is_file():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_baseline(results: dict, path: Path = BASELINE_PATH) -> None:
+    path.write_text(json.dumps({"environment": environment(), "results": results}, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def compare(results: dict, baseline: Optional[dict], threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """One row per case: current stats, baseline p50, ratio and whether it regressed."""
+    base_results = (baseline or {}).get("results", {})
+    rows = []
+    for name, stats in results.items():
+        base = base_results.get(name)
+        ratio = None
+        if base and base.get("p50_ms"):
+            ratio = stats["p50_ms"] / base["p50_ms"]
+        rows.append({
+            "name": name,
+            **stats,
+            "baseline_p50_ms": base.get("p50_ms") if base else None,
+            "ratio": round(ratio, 3) if ratio is not None else None,
+            "regressed": ratio is not None and ratio > 1 + threshold,
+        })
+    return rows
+
+
+def format_table(rows: List[dict]) -> str:
+    header = f"{'case':<44} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'base p50':>10} {'ratio':>7}"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        base = f"{r['baseline_p50_ms']:.4f}" if r["baseline_p50_ms"] is not None else "-"
+        ratio = f"{r['ratio']:.2f}" if r["ratio"] is not None else "-"
+        flag = "  REGRESSED" if r["regressed"] else ""
+        lines.append(f"{r['name']:<44} {r['ops_per_s'] or 0:>10.1f} {r['p50_ms']:>10.4f} {r['p99_ms']:>10.4f} {base:>10} {ratio:>7}{flag}")
+    return "\n".join(lines)
+
+
+def warn_if_foreign_baseline(baseline: Optional[dict]) -> None:
+    if baseline and baseline.get("environment") != environment():
+        print(f"note: baseline was recorded on {baseline.get('environment')}; this run is {environment()}", file=sys.stderr)
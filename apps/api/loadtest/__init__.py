@@ -0,0 +1 @@
+"""Local OpenAI stand-in and load driver. See loadtest/fake_openai.py and loadtest/driver.py."""
@@ -0,0 +1,254 @@
+"""
+Load driver: concurrent transcribe, generate and book flows against a running
+API, with latency percentiles per flow.
+
+Point the API at the fake (OPENAI_BASE_URL=http://127.0.0.1:8100/v1) and raise
+GENERATE_RATE_LIMIT, or pass --spawn to start both on free ports:
+
+    python -m loadtest.driver --spawn --latency lognormal:0.8,0.5 --concurrency 16 --requests 200
+    python -m loadtest.driver --api-url http://127.0.0.1:8000 --flows generate --duration 60
+
+Every worker loops over the selected flows in turn until --requests requests
+have been sent in total or --duration seconds have passed. A request counts as
+failed on any non-2xx status or transport error; both are reported per status.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.harness import percentile
+
+API_DIR = Path(__file__).resolve().parents[1]
+FLOWS = ("transcribe", "generate", "book")
+
+NOTES = [
+    "Jane Homeowner\n1234 Maple Ave\ndemo carpet living room 450\ninstall carpet + pad 2350\npaint walls 2 coats 1200",
+    "Bob Builder\n77 Oak St\nreplace water heater 1850\nhaul away old unit 150\npermit 95",
+    "Ana Client\n9 Birch Ln\nregrout shower 600\nreplace vanity 1400\nnew faucet 240.50\ncaulk tub 80",
+]
+
+
+def _png(label: str) -> bytes:
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (320, 200), "white")
+    ImageDraw.Draw(image).text((10, 10), label, fill="black")
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class Driver:
+    def __init__(self, client: httpx.AsyncClient, password: str, flows: List[str]):
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {password}"}
+        self.flows = flows
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self._page = _png("demo carpet 450")
+        self._seq = 0
+
+    def _next(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    async def transcribe(self) -> httpx.Response:
+        files = [("files", ("page1.png", self._page, "image/png"))]
+        return await self.client.post("/api/transcribe/upload", files=files, headers=self.headers)
+
+    async def generate(self) -> httpx.Response:
+        n = self._next()
+        payload = {
+            "session_id": f"load-{uuid.uuid4().hex[:12]}",
+            # Unique text per request so the response cache and single-flight do not absorb the load
+            "raw_text": f"{NOTES[n % len(NOTES)]}\nload run {n} 1{n % 1000:03d}",
+            "document_type": "invoice" if n % 2 else "proposal",
+        }
+        return await self.client.post("/api/proposals/generate", json=payload, headers={**self.headers, "X-Cache-Bypass": "1"})
+
+    async def book(self) -> httpx.Response:
+        files = [("files", (f"p{i}.png", self._page, "image/png")) for i in range(1, 3)]
+        data = {"chapter_name": f"Load chapter {self._next()}"}
+        return await self.client.post("/api/book/upload", data=data, files=files, headers=self.headers)
+
+    async def run_one(self, flow: str) -> None:
+        started = time.perf_counter()
+        try:
+            resp = await getattr(self, flow)()
+            status = str(resp.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        self.latencies[flow].append(time.perf_counter() - started)
+        self.statuses[flow][status] += 1
+
+    async def run(self, concurrency: int, total: Optional[int], duration: Optional[float]) -> float:
+        deadline = time.monotonic() + duration if duration else None
+        remaining = {"n": total if total is not None else -1}
+
+        async def worker(offset: int) -> None:
+            i = offset
+            while True:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                if remaining["n"] == 0:
+                    return
+                if remaining["n"] > 0:
+                    remaining["n"] -= 1
+                await self.run_one(self.flows[i % len(self.flows)])
+                i += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> List[dict]:
+        rows = []
+        for flow in self.flows:
+            values = sorted(self.latencies.get(flow, []))
+            statuses = self.statuses.get(flow, Counter())
+            ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+            rows.append({
+                "flow": flow,
+                "requests": len(values),
+                "ok": ok,
+                "errors": len(values) - ok,
+                "statuses": dict(statuses),
+                "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+                "p90_ms": round(percentile(values, 0.90) * 1000, 1),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1) if values else 0.0,
+            })
+        return rows
+
+
+def format_report(rows: List[dict]) -> str:
+    header = f"{'flow':<12}{'reqs':>7}{'errors':>8}{'rps':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        statuses = " ".join(f"{k}={v}" for k, v in sorted(r["statuses"].items()))
+        lines.append(
+            f"{r['flow']:<12}{r['requests']:>7}{r['errors']:>8}{r['rps']:>8}"
+            f"{r['p50_ms']:>10}{r['p90_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}  {statuses}"
+        )
+    return "\n".join(lines)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+@contextmanager
+def spawn_stack(args):
+    """Fake OpenAI + API (uvicorn) as subprocesses; yields (api_url, fake_url)."""
+    fake_port, api_port = _free_port(), _free_port()
+    fake_cmd = [
+        sys.executable, "-m", "loadtest.fake_openai", "--port", str(fake_port), "--latency", args.latency,
+        "--rate-limit-ratio", str(args.rate_limit_ratio), "--error-ratio", str(args.error_ratio),
+        "--timeout-ratio", str(args.timeout_ratio), "--hang-seconds", str(args.hang_seconds),
+    ]
+    env = {
+        **os.environ,
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "loadtest"),
+        "DEMO_PASSWORD": os.environ.get("DEMO_PASSWORD", "loadtest-demo"),
+        "ADMIN_PASSWORD": args.password,
+        "GENERATE_RATE_LIMIT": "1000000",
+        "OPENAI_HTTP2": "0",
+    }
+    api_cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(api_port), "--log-level", "warning"]
+    output = None if args.verbose else subprocess.DEVNULL
+    procs = [subprocess.Popen(fake_cmd, cwd=API_DIR, env=env, stdout=output, stderr=output)]
+    try:
+        _wait_ready(f"http://127.0.0.1:{fake_port}/_stats")
+        procs.append(subprocess.Popen(api_cmd, cwd=API_DIR, env=env, stdout=output, stderr=output))
+        _wait_ready(f"http://127.0.0.1:{api_port}/health")
+        yield f"http://127.0.0.1:{api_port}", f"http://127.0.0.1:{fake_port}"
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+async def _drive(args, api_url: str) -> List[dict]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=api_url, timeout=args.request_timeout, limits=limits) as client:
+        driver = Driver(client, args.password, args.flows)
+        elapsed = await driver.run(args.concurrency, None if args.duration else args.requests, args.duration)
+        return driver.report(elapsed)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m loadtest.driver", description="Concurrent transcribe/generate/book load with latency percentiles.")
+    parser.add_argument("--api-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--password", default=os.environ.get("ADMIN_PASSWORD", "loadtest-admin"), help="bearer password (default $ADMIN_PASSWORD)")
+    parser.add_argument("--flows", default=",".join(FLOWS), help="comma-separated subset of transcribe,generate,book")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="total requests across all flows")
+    parser.add_argument("--duration", type=float, default=None, help="run for this many seconds instead of --requests")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--json", dest="json_path", help="also write the report as JSON")
+    spawn = parser.add_argument_group("--spawn: start the fake OpenAI server and the API locally")
+    spawn.add_argument("--spawn", action="store_true")
+    spawn.add_argument("--latency", default="lognormal:0.8,0.5")
+    spawn.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    spawn.add_argument("--error-ratio", type=float, default=0.0)
+    spawn.add_argument("--timeout-ratio", type=float, default=0.0)
+    spawn.add_argument("--hang-seconds", type=float, default=120.0)
+    spawn.add_argument("--verbose", action="store_true", help="show the spawned servers' logs")
+    args = parser.parse_args(argv)
+
+    args.flows = [f.strip() for f in args.flows.split(",") if f.strip()]
+    unknown = sorted(set(args.flows) - set(FLOWS))
+    if unknown or not args.flows:
+        parser.error(f"unknown flows: {', '.join(unknown) or '(none given)'}")
+
+    if args.spawn:
+        with spawn_stack(args) as (api_url, fake_url):
+            rows = asyncio.run(_drive(args, api_url))
+            fake_stats = httpx.get(f"{fake_url}/_stats").json()
+    else:
+        rows = asyncio.run(_drive(args, args.api_url))
+        fake_stats = None
+
+    print(format_report(rows))
+    if fake_stats is not None:
+        print("fake openai:", " ".join(f"{k}={v}" for k, v in sorted(fake_stats.items())))
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"flows": rows, "fake_openai": fake_stats}, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
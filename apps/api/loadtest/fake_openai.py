@@ -0,0 +1,369 @@
+"""
+Local OpenAI stand-in for load tests.
+
+Serves /v1/chat/completions well enough for AsyncOpenAI pointed at it through
+`base_url` (OPENAI_BASE_URL for the API). Responses are canned but shaped like
+the real ones, picked from the request the same way the model would read it:
+  - image_url content: a handwritten-notes transcription, or a book page when
+    the system prompt asks for verbatim text
+  - response_format json_schema (single-call generate): ContractorProposalV1
+  - system prompt naming ContractorDocV1 / AiDocV1: a document that validates
+    against that schema
+  - anything else (the rewrite prompt): "Description — $1,234.56" lines
+  - stream=True: the same content as SSE chunks, usage on the last chunk
+Line items come from numbers in the notes, so different inputs give different
+documents.
+
+Latency and failures are injected per request:
+  --latency fixed:0.4 | uniform:0.2,1.5 | lognormal:0.8,0.5 (median seconds, sigma)
+  --rate-limit-ratio 0.1   429 with Retry-After
+  --error-ratio 0.02       500 server_error
+  --timeout-ratio 0.02     hang for --hang-seconds before answering
+POST /_control with any of those (JSON, underscores) changes them at runtime;
+GET /_stats returns request and injection counts.
+
+    python -m loadtest.fake_openai --port 8100 --latency lognormal:0.8,0.5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from typing import Callable, List, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Latency spec -> sampler returning seconds."""
+    kind, _, args = (spec or "fixed:0").partition(":")
+    try:
+        params = [float(a) for a in args.split(",") if a.strip()]
+    except ValueError:
+        raise ValueError(f"invalid latency spec: {spec!r}")
+    kind = kind.strip().lower()
+    if kind == "fixed" and len(params) == 1:
+        return lambda rng: params[0]
+    if kind == "uniform" and len(params) == 2:
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == "lognormal" and len(params) == 2:
+        mu = math.log(max(params[0], 1e-6))
+        return lambda rng: rng.lognormvariate(mu, params[1])
+    raise ValueError(f"invalid latency spec: {spec!r} (fixed:S | uniform:LO,HI | lognormal:MEDIAN,SIGMA)")
+
+
+@dataclass
+class FakeConfig:
+    latency: str = "fixed:0"
+    rate_limit_ratio: float = 0.0
+    error_ratio: float = 0.0
+    timeout_ratio: float = 0.0
+    hang_seconds: float = 120.0
+    retry_after_seconds: float = 1.0
+    seed: Optional[int] = None
+
+
+HANDWRITTEN_NOTES = "\n".join([
+    "Jane Homeowner",
+    "1234 Maple Ave",
+    "demo carpet living room 450",
+    "install carpet + pad 2350",
+    "paint walls 2 coats 1200",
+    "base shoe / trim 640.50",
+])
+
+BOOK_PAGE = (
+    "Chapter One\n\n"
+    "The house on Maple Avenue had stood empty for three winters before the\n"
+    "Homeowners bought it. Nobody in town could say why it had taken so long;\n"
+    "the roof was sound, the porch only needed paint, and the kitchen caught\n"
+    "the morning light the way every kitchen in a catalogue promises to."
+)
+
+_AMOUNT_RE = re.compile(r"^(?P<desc>.*?[A-Za-z].*?)[\s:~\-—$]+(?P<amount>\d[\d,]*(?:\.\d{1,2})?)\s*$")
+_ADDRESS_RE = re.compile(r"^\d+\s+\w+.*\b(St|Ave|Rd|Dr|Way|Ln|Blvd|Ct)\b", re.IGNORECASE)
+_MAX_ITEMS = 12  # AiDocV1 caps line_items
+
+
+def _notes(messages: list) -> str:
+    """Text of the last user message (the per-request notes)."""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content")
+            if isinstance(content, str):
+                return content
+            return "\n".join(part.get("text", "") for part in content or [] if isinstance(part, dict))
+    return ""
+
+
+def _system(messages: list) -> str:
+    return "\n".join(m.get("content", "") for m in messages if m.get("role") == "system" and isinstance(m.get("content"), str))
+
+
+def _has_image(messages: list) -> bool:
+    return any(
+        isinstance(m.get("content"), list) and any(isinstance(p, dict) and p.get("type") == "image_url" for p in m["content"])
+        for m in messages
+    )
+
+
+def extract_items(notes: str) -> Tuple[Optional[str], Optional[str], List[Tuple[str, int]]]:
+    """(client_name, address, [(description, amount_cents)]) read off free-form notes."""
+    client_name = address = None
+    items: List[Tuple[str, int]] = []
+    for raw in notes.splitlines():
+        line = raw.strip().lstrip("-•* ").strip()
+        if not line or line.startswith(("---", "===")) or line.lower().startswith(("document type", "session", "page")):
+            continue
+        if address is None and _ADDRESS_RE.match(line):
+            address = line
+            continue
+        match = _AMOUNT_RE.match(line)
+        if match:
+            cents = int(round(float(match.group("amount").replace(",", "")) * 100))
+            if len(items) < _MAX_ITEMS:
+                items.append((match.group("desc").strip(" -—:~")[:80].capitalize(), cents))
+        elif client_name is None and not any(ch.isdigit() for ch in line) and len(line.split()) <= 4:
+            client_name = line[:80]
+    if not items:
+        items = [("General labor", 50_000), ("Materials", 25_000)]
+    return client_name or "Jane Homeowner", address, items
+
+
+def _money(cents: int) -> str:
+    return f"${cents / 100:,.2f}"
+
+
+def rewrite_text(items) -> str:
+    lines = [f"{desc} — {_money(cents)}" for desc, cents in items]
+    lines.append(f"Total: {_money(sum(c for _, c in items))}")
+    return "\n".join(lines)
+
+
+def contractor_doc(client_name, address, items) -> dict:
+    return {
+        "schema_version": "v1",
+        "client_name": client_name,
+        "client_address": address,
+        "line_items": [{"description": desc, "amount_cents": cents} for desc, cents in items],
+        "total_cents": sum(c for _, c in items),
+    }
+
+
+def ai_doc(client_name, address, items, doc_type: str = "proposal") -> dict:
+    subtotal = sum(c for _, c in items)
+    return {
+        "schema_version": "v1",
+        "doc_type": doc_type,
+        "doc_id": f"DOC-{uuid.uuid4().hex[:8].upper()}",
+        "currency": "USD",
+        "locale": "en-US",
+        "client": {"name": client_name, "address": {"street": address} if address else None, "email": None, "phone": None},
+        "project": {"title": "Home improvement", "description": None},
+        "line_items": [
+            {
+                "id": f"LI-{i:03d}",
+                "title": desc,
+                "description": None,
+                "kind": "service",
+                "unit": "lump_sum",
+                "quantity": 1,
+                "unit_price_cents": cents,
+                "amount_cents": cents,
+            }
+            for i, (desc, cents) in enumerate(items, 1)
+        ],
+        "totals": {"subtotal_cents": subtotal, "discount_cents": 0, "tax_cents": 0, "total_cents": subtotal, "balance_cents": subtotal},
+        "terms": {"payment_terms": None},
+        "notes": [],
+        "assumptions": [],
+        "source": {"system": "fake-openai"},
+    }
+
+
+def canned_content(body: dict) -> Tuple[str, str]:
+    """(kind, assistant content) for a chat.completions request body."""
+    messages = body.get("messages") or []
+    system = _system(messages)
+    if _has_image(messages):
+        if "verbatim" in system:
+            return "vision_book", BOOK_PAGE
+        return "vision", HANDWRITTEN_NOTES
+    notes = _notes(messages)
+    client_name, address, items = extract_items(notes)
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        doc = contractor_doc(client_name, address, items)
+        return "single_call", json.dumps({"professional_text": rewrite_text(items), **doc})
+    if "ContractorDocV1" in system:
+        return "contractor_doc", json.dumps(contractor_doc(client_name, address, items))
+    if "AiDocV1" in system:
+        doc_type = "invoice" if "invoice" in notes.lower() else "proposal"
+        return "ai_doc", json.dumps(ai_doc(client_name, address, items, doc_type))
+    return "rewrite", rewrite_text(items)
+
+
+def _usage(body: dict, content: str) -> dict:
+    prompt_tokens = max(1, len(json.dumps(body.get("messages") or [])) // 4)
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+def _error(status: int, message: str, error_type: str, code: str, headers: Optional[dict] = None) -> JSONResponse:
+    return JSONResponse(
+        {"error": {"message": message, "type": error_type, "param": None, "code": code}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+def create_app(config: Optional[FakeConfig] = None) -> Starlette:
+    state = {"config": config or FakeConfig()}
+    state["sampler"] = parse_latency(state["config"].latency)
+    rng = random.Random(state["config"].seed)
+    stats: Counter = Counter()
+
+    def configure(new: FakeConfig) -> None:
+        state["sampler"] = parse_latency(new.latency)
+        state["config"] = new
+
+    async def chat_completions(request: Request):
+        cfg: FakeConfig = state["config"]
+        body = await request.json()
+        stats["requests"] += 1
+        await asyncio.sleep(max(0.0, state["sampler"](rng)))
+
+        roll = rng.random()
+        if roll < cfg.rate_limit_ratio:
+            stats["injected_429"] += 1
+            return _error(
+                429, "Rate limit reached (fake)", "requests", "rate_limit_exceeded",
+                headers={"retry-after": f"{cfg.retry_after_seconds:g}"},
+            )
+        roll -= cfg.rate_limit_ratio
+        if roll < cfg.error_ratio:
+            stats["injected_500"] += 1
+            return _error(500, "The server had an error (fake)", "server_error", "server_error")
+        roll -= cfg.error_ratio
+        if roll < cfg.timeout_ratio:
+            stats["injected_timeout"] += 1
+            await asyncio.sleep(cfg.hang_seconds)
+
+        kind, content = canned_content(body)
+        stats[f"kind.{kind}"] += 1
+        model = body.get("model") or "gpt-4o"
+        completion_id = f"chatcmpl-fake-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        usage = _usage(body, content)
+
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+            def chunk(delta: dict, finish_reason=None, chunk_usage=None) -> str:
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if chunk_usage is None else [],
+                    "usage": chunk_usage,
+                }
+                return f"data: {json.dumps(payload)}\n\n"
+
+            async def events():
+                yield chunk({"role": "assistant", "content": ""})
+                for piece in re.findall(r"\S+\s*|\s+", content):
+                    yield chunk({"content": piece})
+                    await asyncio.sleep(0)
+                yield chunk({}, finish_reason="stop")
+                if include_usage:
+                    yield chunk({}, chunk_usage=usage)
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "refusal": None},
+                "logprobs": None,
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    async def models(request: Request):
+        return JSONResponse({"object": "list", "data": [{"id": "gpt-4o", "object": "model", "created": 0, "owned_by": "fake"}]})
+
+    async def control(request: Request):
+        if request.method == "POST":
+            changes = await request.json()
+            known = {f.name for f in fields(FakeConfig)}
+            unknown = sorted(set(changes) - known)
+            if unknown:
+                return JSONResponse({"error": f"unknown settings: {', '.join(unknown)}"}, status_code=400)
+            try:
+                configure(FakeConfig(**{**asdict(state["config"]), **changes}))
+            except ValueError as e:
+                return JSONResponse({"error": str(e)}, status_code=400)
+        return JSONResponse(asdict(state["config"]))
+
+    async def get_stats(request: Request):
+        return JSONResponse(dict(stats))
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/v1/models", models, methods=["GET"]),
+        Route("/_control", control, methods=["GET", "POST"]),
+        Route("/_stats", get_stats, methods=["GET"]),
+    ])
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m loadtest.fake_openai", description="Local OpenAI stand-in for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S | uniform:LO,HI | lognormal:MEDIAN,SIGMA (seconds)")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--error-ratio", type=float, default=0.0)
+    parser.add_argument("--timeout-ratio", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--retry-after-seconds", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    config = FakeConfig(
+        latency=args.latency,
+        rate_limit_ratio=args.rate_limit_ratio,
+        error_ratio=args.error_ratio,
+        timeout_ratio=args.timeout_ratio,
+        hang_seconds=args.hang_seconds,
+        retry_after_seconds=args.retry_after_seconds,
+        seed=args.seed,
+    )
+    parse_latency(config.latency)
+
+    import uvicorn
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -60,6 +60,46 @@ def patch_openai_everywhere(monkeypatch):
 			if hasattr(c, "chat") and hasattr(c, "responses"):
 				monkeypatch.setattr(mod, "client", FakeOpenAI())
 
+@pytest.fixture(autouse=True)
+def fresh_openai_scheduler(monkeypatch):
+	# Fake responses carry no usage, so budgets would never be refunded across tests
+	from app.services import openai_guard, openai_scheduler, usage_tracker
+	monkeypatch.setattr(openai_scheduler, "_scheduler", None)
+	monkeypatch.setattr(openai_guard, "_guard", None)
+	monkeypatch.setattr(usage_tracker, "_tracker", None)
+	from app.services import job_queue
+	monkeypatch.setattr(job_queue, "_queue", None)
+	from app.middleware import idempotency
+	monkeypatch.setattr(idempotency, "_store", None)
+	from app.services import single_flight
+	monkeypatch.setattr(single_flight, "_single_flight", None)
+	from app.observability import tracing
+	monkeypatch.setattr(tracing, "_tracer", None)
+	from app.observability import profiling
+	monkeypatch.setattr(profiling, "_store", None)
+	from app.middleware import admission
+	monkeypatch.setattr(admission, "_loop_lag_monitor", None)
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(monkeypatch, tmp_path):
+	# Sessions, books, the job DB, cached responses and profiles go to tmp_path, never the repo's data/
+	from app.models.config import get_settings
+	from app.services import response_cache
+	from app.services.container import get_services
+	from app.storage import file_manager
+	settings = get_settings()
+	monkeypatch.setattr(settings, "JOB_DB_PATH", str(tmp_path / "data" / "jobs.sqlite3"))
+	monkeypatch.setattr(settings, "RESPONSE_CACHE_DIR", str(tmp_path / "data" / "cache" / "responses"))
+	monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path / "data" / "profiles"))
+	monkeypatch.setattr(response_cache, "_cache", None)
+	monkeypatch.setattr(file_manager, "BASE_DIR", tmp_path)
+	# Routers hold the shared FileManager from import time; point it at the same base
+	shared = get_services().file_manager
+	fresh = file_manager.FileManager()
+	for attr in ("data_dir", "uploads_dir", "sessions_dir", "ground_truth_dir", "books_dir"):
+		monkeypatch.setattr(shared, attr, getattr(fresh, attr))
+	return tmp_path / "data"
+
 @pytest.fixture(scope="function")
 def client():
 	# Import app.main only after patching OpenAI
@@ -71,3 +111,8 @@ import os
 os.environ["DEMO_PASSWORD"] = "demo2026"
 os.environ["ADMIN_PASSWORD"] = "admin2026"
 os.environ["OPENAI_API_KEY"] = "dummy"
+os.environ.setdefault("OPENAI_TOKENS_PER_MINUTE", "1000000")
+# Cached responses would leak between tests (and runs) that use different fakes
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
+# Lifespan tests don't need a warm PDF renderer; test_warmup.py turns it on
+os.environ.setdefault("WARMUP_ENABLED", "0")
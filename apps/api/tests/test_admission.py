@@ -0,0 +1,155 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.middleware import admission
+from app.middleware.admission import AdmissionControlMiddleware, AdmissionGate, LoopLagMonitor
+from app.models import config
+
+GENERATE = "/api/proposals/generate"
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    settings = config.get_settings()
+    for name, value in {
+        "ADMISSION_ENABLED": True,
+        "ADMISSION_GENERATE_CONCURRENCY": 1,
+        "ADMISSION_QUEUE_DEPTH": 0,
+        "ADMISSION_MAX_QUEUE_SECONDS": 5.0,
+        "ADMISSION_MAX_LOOP_LAG_MS": 500.0,
+        "ADMISSION_RETRY_AFTER_SECONDS": 2,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    return settings
+
+
+def _blocking_app():
+    """ASGI app whose generate requests hold their admission slot until `release` is set."""
+    release = asyncio.Event()
+
+    async def inner(scope, receive, send):
+        if scope["path"] == GENERATE:
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = AdmissionControlMiddleware(inner)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test")
+    return middleware, client, release
+
+
+async def _until(predicate):
+    for _ in range(200):
+        if predicate():
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError("condition not reached")
+
+
+def test_sheds_when_queue_is_full(settings):
+    async def go():
+        middleware, client, release = _blocking_app()
+        first = asyncio.create_task(client.post(GENERATE))
+        await _until(lambda: middleware.gates["generate"].in_flight == 1)
+        shed = await client.post(GENERATE)
+        other_route = await client.post("/api/auth/login")
+        release.set()
+        return shed, other_route, await first, middleware
+
+    shed, other_route, first, middleware = asyncio.run(go())
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "2"
+    body = shed.json()
+    assert body["error_code"] == "OVERLOADED"
+    assert body["request_id"] == shed.headers["x-request-id"]
+    assert other_route.status_code == 200
+    assert first.status_code == 200
+    assert middleware.gates["generate"].in_flight == 0
+
+
+def test_queued_request_gets_slot_in_order_or_times_out(settings, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_DEPTH", 2)
+
+    async def go():
+        middleware, client, release = _blocking_app()
+        gate = middleware.gates["generate"]
+        first = asyncio.create_task(client.post(GENERATE))
+        await _until(lambda: gate.in_flight == 1)
+        queued = asyncio.create_task(client.post(GENERATE))
+        await _until(lambda: gate.queued == 1)
+        release.set()
+        results = [await first, await queued]
+
+        # Slot held again, and this time the wait runs out
+        monkeypatch.setattr(settings, "ADMISSION_MAX_QUEUE_SECONDS", 0.05)
+        release.clear()
+        holder = asyncio.create_task(client.post(GENERATE))
+        await _until(lambda: gate.in_flight == 1)
+        timed_out = await client.post(GENERATE)
+        release.set()
+        await holder
+        return results, timed_out, gate
+
+    (first, queued), timed_out, gate = asyncio.run(go())
+    assert first.status_code == queued.status_code == 200
+    assert timed_out.status_code == 503 and timed_out.json()["error_code"] == "OVERLOADED"
+    assert (gate.in_flight, gate.queued) == (0, 0)
+
+
+def test_sheds_while_event_loop_lags(settings, monkeypatch):
+    monitor = LoopLagMonitor()
+    monitor.lag_s = 3.2
+    monkeypatch.setattr(admission, "_loop_lag_monitor", monitor)
+
+    async def go():
+        _, client, release = _blocking_app()
+        release.set()
+        return await client.post(GENERATE), await client.get("/health")
+
+    shed, health = asyncio.run(go())
+    assert shed.status_code == 503 and shed.headers["retry-after"] == "4"
+    assert health.status_code == 200
+
+
+def test_loop_lag_monitor_measures_blocked_loop():
+    async def go():
+        monitor = LoopLagMonitor(interval_s=0.01)
+        monitor.start()
+        await asyncio.sleep(0.02)
+        time.sleep(0.2)  # block the loop
+        await asyncio.sleep(0.02)
+        lag = monitor.lag_s
+        await monitor.stop()
+        return lag
+
+    assert asyncio.run(go()) >= 0.15
+
+
+def test_gate_hands_released_slot_to_oldest_waiter():
+    gate = AdmissionGate()
+    assert gate.try_acquire(1, 2) is True
+    first, second = gate.try_acquire(1, 2), gate.try_acquire(1, 2)
+    assert gate.try_acquire(1, 2) is None
+    assert gate.abandon(second) is True
+    gate.release(1)
+    assert first.result() is True and gate.in_flight == 1 and gate.queued == 0
+    assert gate.abandon(first) is False  # already handed over: the caller owns the slot
+
+
+def test_app_sheds_generate_in_error_shape(settings, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_REQUEST_BYTES", 1_000_000)
+    monitor = LoopLagMonitor()
+    monitor.lag_s = 1.0
+    monkeypatch.setattr(admission, "_loop_lag_monitor", monitor)
+    resp = TestClient(create_app()).post(
+        GENERATE,
+        json={"session_id": "admission-1", "raw_text": "paint walls 1200", "document_type": "proposal"},
+        headers={"Authorization": f"Bearer {settings.admin_password}"},
+    )
+    assert resp.status_code == 503
+    assert resp.json()["error"]["code"] == "OVERLOADED"
@@ -0,0 +1,34 @@
+import asyncio
+
+from app.api.proposals import parse_fallback_header
+from benchmarks import cases  # noqa: F401  (registers the cases)
+from benchmarks.harness import CASES, compare, run_case
+
+
+def test_every_benchmark_case_runs():
+    loop = asyncio.new_event_loop()
+    try:
+        for case in CASES:
+            stats = run_case(case, iterations=1, loop=loop)
+            assert stats["iterations"] == 1 and stats["p50_ms"] >= 0, case.name
+    finally:
+        loop.close()
+
+
+def test_compare_flags_p50_regressions_beyond_threshold():
+    baseline = {"results": {"a": {"p50_ms": 1.0}, "b": {"p50_ms": 1.0}}}
+    results = {
+        "a": {"p50_ms": 1.2, "p99_ms": 2.0, "ops_per_s": 1.0, "mean_ms": 1.2, "iterations": 1},
+        "b": {"p50_ms": 1.3, "p99_ms": 2.0, "ops_per_s": 1.0, "mean_ms": 1.3, "iterations": 1},
+        "new": {"p50_ms": 9.0, "p99_ms": 9.0, "ops_per_s": 1.0, "mean_ms": 9.0, "iterations": 1},
+    }
+    rows = {r["name"]: r for r in compare(results, baseline, threshold=0.25)}
+    assert not rows["a"]["regressed"]
+    assert rows["b"]["regressed"]
+    assert rows["new"]["ratio"] is None and not rows["new"]["regressed"]
+
+
+def test_parse_fallback_header_skips_markers_titles_and_scope_lines():
+    raw = "--- Page 1 ---\nPROPOSAL\nJane Homeowner\n- demo carpet\n1234 Maple Ave\nSpringfield"
+    assert parse_fallback_header(raw) == ("Jane Homeowner", "1234 Maple Ave")
+    assert parse_fallback_header("") == (None, None)
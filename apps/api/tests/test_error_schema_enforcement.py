@@ -33,9 +33,12 @@ def test_middleware_order_contract():
     actual = [mw.cls.__name__ for mw in reversed(app.user_middleware)]
     core_expected = [
         "RequestIDMiddleware",
+        "IdempotencyMiddleware",       # inside auth: only authenticated requests replay
         "BaseHTTPMiddleware",          # AuthGate wrapper
         "RequestSizeLimitMiddleware",
+        "AdmissionControlMiddleware",  # outside the size limit: shed before the body is read
         "RequestLoggingMiddleware",
+        "ProfilingMiddleware",         # outside everything but CORS: profiles cover the middleware stack
     ]
     assert actual[:len(core_expected)] == core_expected, (
         "Middleware execution core order changed!\n"
@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+import httpx
+import openai
+import pytest
+from fastapi.testclient import TestClient
+
+from app.ai.prompts import AI_DOC, CONTRACTOR_DOC, SINGLE_CALL, notes_block
+from app.ai.schema_contractor_v1 import CONTRACTOR_PROPOSAL_V1_RESPONSE_FORMAT, validate_contractor_doc_v1, validate_contractor_proposal_v1
+from app.ai.schema_v1 import AiDocV1
+from app.main import app
+from app.models import config
+from app.services import openai_client
+from loadtest.fake_openai import FakeConfig, create_app, parse_latency
+
+# conftest swaps openai.AsyncOpenAI for an in-process fake per test; these tests need the real client
+RealAsyncOpenAI = openai.AsyncOpenAI
+
+NOTES = "Jane Homeowner\n1234 Maple Ave\ndemo carpet 450\ninstall carpet + pad 2,350.00\npaint walls 2 coats 1200"
+
+
+def _client(fake_app):
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_app))
+    return RealAsyncOpenAI(api_key="test", base_url="http://fake-openai/v1", http_client=http_client, max_retries=0)
+
+
+def _complete(fake_app, **kwargs):
+    async def go():
+        return await _client(fake_app).chat.completions.create(model="gpt-4o", **kwargs)
+    return asyncio.run(go())
+
+
+def test_json_prompts_return_schema_valid_documents():
+    fake = create_app()
+    contractor = _complete(fake, messages=CONTRACTOR_DOC.messages(notes_block(NOTES)))
+    doc = validate_contractor_doc_v1(contractor.choices[0].message.content)
+    assert doc.client_name == "Jane Homeowner"
+    assert doc.client_address == "1234 Maple Ave"
+    assert [i.amount_cents for i in doc.line_items] == [45_000, 235_000, 120_000]
+    assert contractor.usage.prompt_tokens > 0
+
+    ai = _complete(fake, messages=AI_DOC.messages(notes_block(NOTES)))
+    ai_doc = AiDocV1.model_validate_json(ai.choices[0].message.content)
+    assert ai_doc.totals.subtotal_cents == 400_000
+
+    single = _complete(
+        fake,
+        messages=SINGLE_CALL.messages(notes_block(NOTES)),
+        response_format=CONTRACTOR_PROPOSAL_V1_RESPONSE_FORMAT,
+    )
+    proposal = validate_contractor_proposal_v1(single.choices[0].message.content)
+    assert "Demo carpet — $450.00" in proposal.professional_text
+
+
+def test_vision_and_streaming_responses():
+    fake = create_app()
+    image = {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,AAAA"}}
+    notes = _complete(fake, messages=[{"role": "user", "content": [{"type": "text", "text": "Extract ONLY HANDWRITTEN text"}, image]}])
+    assert "Jane Homeowner" in notes.choices[0].message.content
+    book = _complete(fake, messages=[
+        {"role": "system", "content": "Transcribe all visible text from the image(s) verbatim."},
+        {"role": "user", "content": [image]},
+    ])
+    assert book.choices[0].message.content.startswith("Chapter One")
+
+    async def stream():
+        chunks = await _client(fake).chat.completions.create(
+            model="gpt-4o", messages=[{"role": "user", "content": NOTES}], stream=True, stream_options={"include_usage": True},
+        )
+        text, usage = "", None
+        async for chunk in chunks:
+            if chunk.choices:
+                text += chunk.choices[0].delta.content or ""
+            usage = chunk.usage or usage
+        return text, usage
+
+    text, usage = asyncio.run(stream())
+    assert text.endswith("Total: $4,000.00")
+    assert usage.completion_tokens > 0
+
+
+def test_rate_limit_injection_and_runtime_control():
+    fake = create_app(FakeConfig(rate_limit_ratio=1.0, retry_after_seconds=2))
+    with pytest.raises(openai.RateLimitError) as exc:
+        _complete(fake, messages=[{"role": "user", "content": NOTES}])
+    assert exc.value.response.headers["retry-after"] == "2"
+
+    with TestClient(fake) as control:
+        assert control.post("/_control", json={"rate_limit_ratio": 0.0, "latency": "uniform:0,0.001"}).status_code == 200
+        assert control.post("/_control", json={"latency": "gaussian:1"}).status_code == 400
+        assert control.post("/_control", json={"bogus": 1}).status_code == 400
+    _complete(fake, messages=[{"role": "user", "content": NOTES}])
+    with TestClient(fake) as control:
+        assert control.get("/_stats").json() == {"requests": 2, "injected_429": 1, "kind.rewrite": 1}
+
+
+def test_latency_specs():
+    import random
+    rng = random.Random(0)
+    assert parse_latency("fixed:0.25")(rng) == 0.25
+    assert 0.1 <= parse_latency("uniform:0.1,0.2")(rng) <= 0.2
+    assert parse_latency("lognormal:0.5,0.3")(rng) > 0
+    with pytest.raises(ValueError):
+        parse_latency("uniform:1")
+
+
+def test_api_uses_openai_base_url(monkeypatch):
+    fake = create_app()
+    monkeypatch.setattr(config.get_settings(), "OPENAI_BASE_URL", "http://fake-openai/v1")
+    monkeypatch.setattr(config.get_settings(), "MAX_REQUEST_BYTES", 1_000_000)
+    monkeypatch.setattr(openai, "AsyncOpenAI", RealAsyncOpenAI)
+    monkeypatch.setattr(openai_client, "build_http_client", lambda settings: httpx.AsyncClient(transport=httpx.ASGITransport(app=fake)))
+    monkeypatch.setattr(openai_client, "_client", None)
+    monkeypatch.setattr(openai_client, "_http_client", None)
+    monkeypatch.setattr(openai_client, "_client_loop", None)
+
+    settings = config.get_settings()
+    resp = TestClient(app).post(
+        "/api/proposals/generate",
+        json={"session_id": "fake-openai-1", "raw_text": NOTES, "document_type": "proposal"},
+        headers={"Authorization": f"Bearer {settings.admin_password}"},
+    )
+    assert resp.status_code == 200, resp.text
+    assert "Paint walls 2 coats — $1,200.00" in json.dumps(resp.json(), ensure_ascii=False)
@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import pytest
+
+from app.errors import StandardizedAIError
+from app.services import formatting_service, openai_guard
+from app.services.formatting_service import SchemaWinStats, generate_doc
+from app.services.openai_guard import CLOSED, HALF_OPEN, CircuitBreaker, OpenAIGuard, RetryBudget
+
+CONTRACTOR_DOC = {
+    "schema_version": "v1",
+    "client_name": "Jane Smith",
+    "client_address": "123 Main St",
+    "line_items": [{"description": "Install carpet", "amount_cents": 120000}],
+    "total_cents": 120000,
+}
+
+
+class _Resp:
+    def __init__(self, content):
+        self.choices = [type("C", (), {"message": type("M", (), {"content": content})()})()]
+
+
+class ScriptedClient:
+    """Answers by prompt kind with a per-kind delay; records started and cancelled calls."""
+
+    def __init__(self, answers, delays=None):
+        self.chat = self
+        self.completions = self
+        self.answers = answers
+        self.delays = delays or {}
+        self.started = []
+        self.cancelled = []
+
+    async def create(self, **kwargs):
+        system, user = (m["content"] for m in kwargs["messages"])
+        kind = "contractor" if "ContractorDocV1" in system.split("\n", 1)[0] else "aidoc"
+        if "VALIDATION ERRORS" in user:
+            kind = "repair"
+        self.started.append(kind)
+        try:
+            await asyncio.sleep(self.delays.get(kind, 0))
+        except asyncio.CancelledError:
+            self.cancelled.append(kind)
+            raise
+        return _Resp(self.answers[kind])
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    stats = SchemaWinStats()
+    monkeypatch.setattr(formatting_service, "schema_win_stats", stats)
+    return stats
+
+
+def test_speculative_first_valid_wins_and_cancels_other(fresh_stats):
+    client = ScriptedClient(
+        {"contractor": json.dumps(CONTRACTOR_DOC), "aidoc": "{}"},
+        delays={"contractor": 0.0, "aidoc": 5.0},
+    )
+    doc = asyncio.run(generate_doc("notes", client, speculative=True))
+    assert doc.client_name == "Jane Smith"
+    assert sorted(client.started) == ["aidoc", "contractor"]
+    assert client.cancelled == ["aidoc"]
+    snap = fresh_stats.snapshot()
+    assert snap["wins"]["speculative"]["contractor_v1"] == 1
+    assert snap["cancelled_attempts"] == 1
+
+
+def test_speculative_waits_for_slower_valid_answer(fresh_stats):
+    # The contractor answer arrives first but is invalid; the slower AiDocV1 one is also invalid,
+    # so the repair prompt runs once both have finished.
+    client = ScriptedClient(
+        {"contractor": "not json", "aidoc": "{}", "repair": "still not json"},
+        delays={"aidoc": 0.05},
+    )
+    with pytest.raises(StandardizedAIError):
+        asyncio.run(generate_doc("notes", client, speculative=True))
+    assert client.started.count("repair") == 1
+    assert client.cancelled == []
+    assert fresh_stats.snapshot()["wins"]["speculative"]["failed"] == 1
+
+
+def test_sequential_mode_is_unchanged(fresh_stats):
+    client = ScriptedClient({"contractor": json.dumps(CONTRACTOR_DOC), "aidoc": "{}"})
+    doc = asyncio.run(generate_doc("notes", client, speculative=False))
+    assert doc.total_cents == 120000
+    assert client.started == ["contractor"]
+    assert fresh_stats.snapshot()["wins"]["sequential"]["contractor_v1"] == 1
+
+
+def test_speculative_with_half_open_breaker_probes_once_and_recovers(fresh_stats, monkeypatch):
+    now = [100.0]
+    guard = OpenAIGuard(CircuitBreaker(failure_threshold=1, recovery_seconds=10, clock=lambda: now[0]), RetryBudget())
+    monkeypatch.setattr(openai_guard, "_guard", guard)
+    guard.breaker.record_failure()
+    now[0] += 10
+    assert guard.breaker.snapshot()["state"] == HALF_OPEN
+
+    client = ScriptedClient({"contractor": json.dumps(CONTRACTOR_DOC), "aidoc": "{}"}, delays={"aidoc": 5.0})
+    doc = asyncio.run(generate_doc("notes", client, speculative=True))
+    assert doc.client_name == "Jane Smith"
+    # No second racing request while upstream is recovering, and the probe closed the breaker
+    assert client.started == ["contractor"]
+    assert guard.breaker.state == CLOSED
+    assert asyncio.run(generate_doc("notes", client, speculative=True)).client_name == "Jane Smith"
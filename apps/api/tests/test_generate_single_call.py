@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.errors import StandardizedAIError
+from app.services.formatting_service import FormattingService
+
+
+class _Resp:
+    def __init__(self, content):
+        self.choices = [type("C", (), {"message": type("M", (), {"content": content})()})()]
+
+
+class RecordingClient:
+    def __init__(self, content):
+        self.calls = []
+        self.chat = self
+        self.completions = self
+        self._content = content
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return _Resp(self._content)
+
+
+SINGLE_CALL_OUTPUT = {
+    "professional_text": "Remove old carpet — $200.00\nInstall carpet — $1,200.00\nTotal: $1,400.00",
+    "schema_version": "v1",
+    "client_name": "Jane Smith",
+    "client_address": "123 Main St, Denver, CO",
+    "line_items": [
+        {"description": "Remove old carpet", "amount_cents": 20000},
+        {"description": "Install carpet", "amount_cents": 120000},
+    ],
+    "total_cents": 140000,
+}
+
+
+def test_single_call_returns_text_and_proposal_fields():
+    client = RecordingClient(json.dumps(SINGLE_CALL_OUTPUT))
+    text, data = asyncio.run(FormattingService(client=client).generate_proposal_single_call("notes"))
+
+    assert len(client.calls) == 1
+    assert client.calls[0]["response_format"]["type"] == "json_schema"
+    assert text.startswith("Remove old carpet")
+    assert data["client_name"] == "Jane Smith"
+    assert data["project_address"] == "123 Main St, Denver, CO"
+    assert [item["amount"] for item in data["line_items"]] == [200.0, 1200.0]
+    assert data["total"] == 1400.0
+
+
+def test_single_call_invalid_output_raises_schema_error():
+    client = RecordingClient('{"professional_text": "x"}')
+    with pytest.raises(StandardizedAIError) as exc:
+        asyncio.run(FormattingService(client=client).generate_proposal_single_call("notes"))
+    assert exc.value.code == "AI_SCHEMA_VALIDATION_FAILED"
+
+
+def test_generate_route_uses_single_call_when_enabled(monkeypatch):
+    from app.api import proposals as proposals_api
+    from app.main import app
+    from app.models import config
+
+    calls = []
+
+    class FakeFormattingService:
+        async def generate_proposal_single_call(self, raw_text, document_type="proposal", **kwargs):
+            calls.append(raw_text)
+            return "Install carpet — $1,200.00", {"client_name": "Jane", "line_items": [{"description": "Install carpet", "amount": 1200.0}], "total": 1200.0}
+
+        async def rewrite_professional(self, *args, **kwargs):
+            raise AssertionError("two-call path should not run")
+
+    async def fake_save(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(config.get_settings(), "GENERATE_SINGLE_CALL", True)
+    monkeypatch.setattr(proposals_api, "get_formatting_service", lambda: FakeFormattingService())
+    monkeypatch.setattr(proposals_api.file_manager, "save_proposal", fake_save)
+    settings = config.get_settings()
+    resp = TestClient(app).post(
+        "/api/proposals/generate",
+        json={"session_id": "single-call-1", "raw_text": "install carpet 1200", "document_type": "proposal"},
+        headers={"Authorization": f"Bearer {settings.admin_password}"},
+    )
+    assert resp.status_code == 200, resp.text
+    assert calls == ["install carpet 1200"]
+    body = resp.json()
+    assert body["proposal_data"]["client_name"] == "Jane"
+    assert body["proposal_data"]["total"] == 1200.0
@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services.formatting_service import FormattingService
+from app.services.openai_guard import OpenAIFailure
+
+
+def _chunk(content=None, usage=None):
+    choices = [] if content is None else [type("C", (), {"delta": type("D", (), {"content": content})()})()]
+    if usage is not None:
+        usage = type("U", (), {"prompt_tokens": usage[0], "completion_tokens": usage[1], "prompt_tokens_details": None})()
+    return type("Chunk", (), {"choices": choices, "usage": usage})()
+
+
+class FakeStream:
+    def __init__(self, chunks, fail_after=None):
+        self._chunks = list(chunks)
+        self._fail_after = fail_after
+        self.closed = False
+
+    def __aiter__(self):
+        return self._gen()
+
+    async def _gen(self):
+        for i, chunk in enumerate(self._chunks):
+            if self._fail_after is not None and i == self._fail_after:
+                raise RuntimeError("connection reset")
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+
+class StreamingClient:
+    def __init__(self, stream):
+        self.chat = self
+        self.completions = self
+        self.stream = stream
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.stream
+
+
+def _collect(agen):
+    async def run():
+        return [part async for part in agen]
+    return asyncio.run(run())
+
+
+def test_stream_rewrite_yields_deltas_and_reports_usage():
+    stream = FakeStream([_chunk("Install "), _chunk("carpet — $1,200.00"), _chunk(usage=(30, 12))])
+    client = StreamingClient(stream)
+    parts = _collect(FormattingService(client=client).stream_rewrite_professional("install carpet 1200"))
+
+    assert parts == ["Install ", "carpet — $1,200.00"]
+    assert client.calls[0]["stream"] is True
+    assert client.calls[0]["stream_options"] == {"include_usage": True}
+    assert stream.closed
+
+
+def test_stream_rewrite_mid_stream_error_becomes_openai_failure():
+    stream = FakeStream([_chunk("Install "), _chunk("carpet")], fail_after=1)
+    with pytest.raises(OpenAIFailure) as exc:
+        _collect(FormattingService(client=StreamingClient(stream)).stream_rewrite_professional("notes"))
+    assert exc.value.code == "OPENAI_UPSTREAM_ERROR"
+    assert stream.closed
+
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_route_sends_tokens_then_final_document(monkeypatch):
+    from app.api import proposals as proposals_api
+    from app.main import app
+    from app.models import config
+
+    structured = []
+
+    class FakeFormattingService:
+        async def stream_rewrite_professional(self, raw_text, **kwargs):
+            for part in ["Install carpet — ", "$1,200.00"]:
+                yield part
+
+        async def structure_proposal(self, text, *args, **kwargs):
+            structured.append(text)
+            return {"client_name": "Jane", "line_items": [{"description": "Install carpet", "amount": 1200.0}], "total": 1200.0}
+
+        async def rewrite_professional(self, *args, **kwargs):
+            raise AssertionError("non-streaming rewrite should not run")
+
+    async def fake_save(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(proposals_api, "get_formatting_service", lambda: FakeFormattingService())
+    monkeypatch.setattr(proposals_api.file_manager, "save_proposal", fake_save)
+    settings = config.get_settings()
+    resp = TestClient(app).post(
+        "/api/proposals/generate/stream",
+        json={"session_id": "stream-1", "raw_text": "install carpet 1200", "document_type": "proposal"},
+        headers={"Authorization": f"Bearer {settings.admin_password}"},
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(resp.text)
+    assert [name for name, _ in events] == ["start", "token", "token", "done"]
+    assert structured == ["Install carpet — $1,200.00"]
+    done = events[-1][1]
+    assert done["professional_text"] == "Install carpet — $1,200.00"
+    assert done["proposal_data"]["total"] == 1200.0
+
+
+def test_stream_route_reports_upstream_failure_as_error_event(monkeypatch):
+    from app.api import proposals as proposals_api
+    from app.main import app
+    from app.models import config
+
+    class FailingFormattingService:
+        async def stream_rewrite_professional(self, raw_text, **kwargs):
+            yield "Install "
+            raise OpenAIFailure("OPENAI_TIMEOUT", "stalled", 1)
+
+    monkeypatch.setattr(proposals_api, "get_formatting_service", lambda: FailingFormattingService())
+    settings = config.get_settings()
+    resp = TestClient(app).post(
+        "/api/proposals/generate/stream",
+        json={"session_id": "stream-2", "raw_text": "install carpet", "document_type": "proposal"},
+        headers={"Authorization": f"Bearer {settings.admin_password}"},
+    )
+    events = _parse_sse(resp.text)
+    assert [name for name, _ in events] == ["start", "token", "error"]
+    assert events[-1][1]["error_code"] == "OPENAI_TIMEOUT"
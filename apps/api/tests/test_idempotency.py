@@ -0,0 +1,116 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.middleware.idempotency import IdempotencyMiddleware, _fingerprint
+
+
+def _counting_app(calls, delay=0.0, statuses=None):
+    async def app(scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        calls.append(body)
+        await asyncio.sleep(delay)
+        status = statuses.pop(0) if statuses else 200
+        payload = f'{{"n": {len(calls)}}}'.encode()
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": payload})
+    return IdempotencyMiddleware(app)
+
+
+def _post(app, *requests):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/api/proposals/generate", content=body, headers=headers) for body, headers in requests
+            ))
+    return asyncio.run(run())
+
+
+def test_duplicate_in_flight_request_attaches_to_running_one():
+    calls = []
+    headers = {"Idempotency-Key": "abc", "Authorization": "Bearer t"}
+    first, second = _post(_counting_app(calls, delay=0.05), (b"{}", headers), (b"{}", headers))
+    assert len(calls) == 1
+    assert first.json() == second.json() == {"n": 1}
+    assert second.headers["idempotent-replayed"] == "true"
+
+
+def test_same_key_with_different_body_is_rejected():
+    calls = []
+    headers = {"Idempotency-Key": "abc", "Authorization": "Bearer t"}
+    app = _counting_app(calls)
+    _post(app, (b'{"a": 1}', headers))
+    (resp,) = _post(app, (b'{"a": 2}', headers))
+    assert resp.status_code == 422
+    assert resp.json()["error_code"] == "IDEMPOTENCY_KEY_REUSED"
+
+
+def test_failed_responses_are_not_stored_and_keys_are_per_caller():
+    calls = []
+    app = _counting_app(calls, statuses=[503])
+    key = {"Idempotency-Key": "abc"}
+    (failed,) = _post(app, (b"{}", {**key, "Authorization": "Bearer t"}))
+    (retried,) = _post(app, (b"{}", {**key, "Authorization": "Bearer t"}))
+    (other_caller,) = _post(app, (b"{}", {**key, "Authorization": "Bearer u"}))
+    assert failed.status_code == 503
+    assert retried.status_code == 200 and "idempotent-replayed" not in retried.headers
+    assert other_caller.json() == {"n": 3}
+
+
+def test_waiters_rerun_after_owner_fails_with_5xx():
+    calls = []
+    headers = {"Idempotency-Key": "abc", "Authorization": "Bearer t"}
+    first, second = _post(_counting_app(calls, delay=0.05, statuses=[503]), (b"{}", headers), (b"{}", headers))
+    # The shed/failed response is not handed to the waiter: it runs the request itself
+    assert len(calls) == 2
+    assert sorted([first.status_code, second.status_code]) == [200, 503]
+    assert all("idempotent-replayed" not in r.headers for r in (first, second))
+
+
+def test_multipart_boundary_does_not_change_fingerprint():
+    body = b"--{b}\r\nContent-Disposition: form-data; name=\"file\"\r\n\r\ndata\r\n--{b}--\r\n"
+    one = _fingerprint(body.replace(b"{b}", b"aaa111"), b"multipart/form-data; boundary=aaa111")
+    two = _fingerprint(body.replace(b"{b}", b"zzz999"), b"multipart/form-data; boundary=zzz999")
+    assert one == two
+
+
+def test_generate_replay_skips_pipeline(monkeypatch):
+    from app.api import proposals as proposals_api
+    from app.main import app
+    from app.models import config
+
+    rewrites = []
+
+    class FakeFormattingService:
+        async def rewrite_professional(self, raw_text, **kwargs):
+            rewrites.append(raw_text)
+            return "Install carpet — $1,200.00"
+
+        async def structure_proposal(self, *args, **kwargs):
+            return {"client_name": "Jane", "line_items": [{"description": "Install carpet", "amount": 1200.0}], "total": 1200.0}
+
+    async def fake_save(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(proposals_api, "get_formatting_service", lambda: FakeFormattingService())
+    monkeypatch.setattr(proposals_api.file_manager, "save_proposal", fake_save)
+    settings = config.get_settings()
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {settings.admin_password}", "Idempotency-Key": "gen-1"}
+    body = {"session_id": "idem-1", "raw_text": "install carpet 1200", "document_type": "proposal"}
+    first = client.post("/api/proposals/generate", json=body, headers={**headers, "X-Request-ID": "req-1"})
+    second = client.post("/api/proposals/generate", json=body, headers={**headers, "X-Request-ID": "req-2"})
+    assert first.status_code == second.status_code == 200
+    assert second.headers["idempotent-replayed"] == "true"
+    # The header names the request being answered; the body is replayed verbatim
+    assert second.headers["x-request-id"] == "req-2"
+    assert second.json() == first.json()
+    assert rewrites == ["install carpet 1200"]
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parents[1]
+
+# Loaded by the code paths that need them, never by importing the app
+LAZY_MODULES = ("openai", "reportlab", "pypdf", "docx", "PIL")
+# Cumulative `-X importtime` microseconds for app.main; ~0.7 s on a dev laptop, so this
+# only trips when something heavy is imported eagerly again
+IMPORT_BUDGET_US = 2_000_000
+
+
+def _import_app_main():
+    code = (
+        "import json, sys\n"
+        "import app.main\n"
+        f"print(json.dumps(sorted(m for m in {LAZY_MODULES!r} if m in sys.modules)))\n"
+    )
+    env = {**os.environ, "RETENTION_ENABLED": "0", "JOBS_ENABLED": "0"}
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=API_DIR, env=env, capture_output=True, text=True, check=True)
+
+
+def _cumulative_us(importtime_stderr, module):
+    for line in importtime_stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise AssertionError(f"{module} not in -X importtime output")
+
+
+def test_importing_app_skips_heavy_dependencies_and_stays_in_budget():
+    result = _import_app_main()
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    assert loaded == [], f"imported eagerly by app.main: {loaded}"
+    assert _cumulative_us(result.stderr, "app.main") < IMPORT_BUDGET_US
+
+
+def test_file_manager_construction_does_no_io(tmp_path, monkeypatch):
+    from app.storage import file_manager as fm_mod
+    from app.storage.file_manager import FileManager
+
+    monkeypatch.setattr(fm_mod, "BASE_DIR", tmp_path)
+    fm = FileManager()
+    assert not (tmp_path / "data").exists()
+    fm.ensure_dirs()
+    assert (tmp_path / "data" / "sessions").is_dir() and (tmp_path / "data" / "books").is_dir()
+
+
+def test_routers_share_one_container_instance():
+    from app.api import books, history, proposals, transcribe
+    from app.services.container import get_services
+
+    services = get_services()
+    assert proposals.file_manager is transcribe.file_manager is history.file_manager is books.file_manager is services.file_manager
+    assert proposals.get_formatting_service() is services.formatting_service
+    assert books.get_ocr_service() is services.book_ocr_service
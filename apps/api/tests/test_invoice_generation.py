@@ -92,7 +92,7 @@ def test_file_outputs(monkeypatch, tmp_path, client):
     assert resp.status_code == 200, resp.text
     from app.storage.file_manager import FileManager
     fm = FileManager()
-    session_dir = fm.sessions_dir / payload["session_id"]
+    session_dir = fm.session_dir(payload["session_id"])
     assert (session_dir / "invoice.json").exists()
     assert (session_dir / "invoice.pdf").exists()
 
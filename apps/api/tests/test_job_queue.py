@@ -0,0 +1,222 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import job_queue
+from app.services.job_queue import FAILED, QUEUED, RUNNING, SUCCEEDED, JobFailed, JobQueue, JobStore
+from app.services.openai_guard import OpenAIFailure
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = JobStore(tmp_path / "jobs.sqlite3")
+    yield s
+    s.close()
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    registry = {}
+    monkeypatch.setattr(job_queue, "JOB_HANDLERS", registry)
+    return registry
+
+
+def test_claim_is_fifo_and_counts_attempts(store):
+    first = store.submit("generate", {"n": 1}, max_attempts=2)
+    store.submit("generate", {"n": 2}, max_attempts=2)
+    claimed = store.claim()
+    assert claimed["id"] == first["id"]
+    assert claimed["status"] == RUNNING
+    assert claimed["attempts"] == 1
+    store.complete(claimed["id"], {"ok": True})
+    assert store.get(first["id"])["result"] == {"ok": True}
+    assert store.counts() == {QUEUED: 1, RUNNING: 0, SUCCEEDED: 1, FAILED: 0}
+
+
+def test_recover_requeues_interrupted_jobs_without_using_attempts(store):
+    job = store.submit("generate", {}, max_attempts=1)
+    for _ in range(job_queue.MAX_INTERRUPTIONS - 1):
+        store.claim()
+        assert store.recover() == 1
+        recovered = store.get(job["id"])
+        assert (recovered["status"], recovered["attempts"]) == (QUEUED, 0)
+    # A job that keeps taking the process down is eventually failed
+    store.claim()
+    assert store.recover() == 0
+    assert store.get(job["id"])["status"] == FAILED
+    assert store.get(job["id"])["error"]["error_code"] == "JOB_INTERRUPTED"
+
+
+def test_shutdown_mid_job_hands_it_back_without_using_an_attempt(store, handlers):
+    started = None
+
+    async def slow(payload):
+        started.set()
+        await asyncio.Event().wait()
+    handlers["slow"] = slow
+    job = store.submit("slow", {}, max_attempts=1)
+
+    async def run():
+        nonlocal started
+        started = asyncio.Event()
+        queue = JobQueue(store, poll_interval_s=0.01)
+        queue._loop, queue._wake = asyncio.get_running_loop(), asyncio.Event()
+        worker = asyncio.create_task(queue._worker(0))
+        await started.wait()
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+    asyncio.run(run())
+    handed_back = store.get(job["id"])
+    assert (handed_back["status"], handed_back["attempts"]) == (QUEUED, 0)
+
+
+def test_upstream_failures_are_retried_then_recorded(store, handlers):
+    calls = []
+
+    async def flaky(payload):
+        calls.append(payload)
+        raise OpenAIFailure("OPENAI_TIMEOUT", "slow", 3)
+    handlers["flaky"] = flaky
+
+    async def run():
+        queue = JobQueue(store, max_attempts=2)
+        job = store.submit("flaky", {}, max_attempts=2)
+        await queue.run_job(store.claim())
+        assert store.get(job["id"])["status"] == QUEUED
+        await queue.run_job(store.claim())
+        return store.get(job["id"])
+
+    job = asyncio.run(run())
+    assert len(calls) == 2
+    assert job["status"] == FAILED
+    assert job["error"] == {"error_code": "OPENAI_TIMEOUT", "message": "Upstream AI service unavailable.", "status_code": 503}
+
+
+def test_job_failed_is_terminal(store, handlers):
+    async def bad(payload):
+        raise JobFailed("PROPOSAL_SCHEMA_INVALID", "nope", 500)
+    handlers["bad"] = bad
+    job = store.submit("bad", {}, max_attempts=3)
+    asyncio.run(JobQueue(store).run_job(store.claim()))
+    assert store.get(job["id"])["status"] == FAILED
+
+
+def test_jobs_left_running_are_finished_after_restart(tmp_path, handlers):
+    async def echo(payload):
+        return {"echo": payload["value"]}
+    handlers["echo"] = echo
+
+    # Previous process claimed the job and died
+    old = JobStore(tmp_path / "jobs.sqlite3")
+    job = old.submit("echo", {"value": 7}, max_attempts=2)
+    old.claim()
+    old.close()
+
+    async def run():
+        queue = JobQueue(JobStore(tmp_path / "jobs.sqlite3"), poll_interval_s=0.01)
+        await queue.start()
+        try:
+            for _ in range(200):
+                if queue.store.get(job["id"])["status"] == SUCCEEDED:
+                    break
+                await asyncio.sleep(0.01)
+            return queue.store.get(job["id"])
+        finally:
+            await queue.stop()
+
+    finished = asyncio.run(run())
+    assert finished["status"] == SUCCEEDED
+    assert finished["result"] == {"echo": 7}
+    assert finished["attempts"] == 1  # the crashed run is not charged
+
+
+def test_generate_job_endpoints(monkeypatch, tmp_path):
+    from app.api import proposals as proposals_api
+    from app.main import create_app
+    from app.models import config
+
+    class FakeFormattingService:
+        async def rewrite_professional(self, *args, **kwargs):
+            return "Install carpet — $1,200.00"
+
+        async def structure_proposal(self, *args, **kwargs):
+            return {"client_name": "Jane", "line_items": [{"description": "Install carpet", "amount": 1200.0}], "total": 1200.0}
+
+    async def fake_save(*args, **kwargs):
+        return None
+
+    settings = config.get_settings()
+    monkeypatch.setattr(settings, "JOB_DB_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(settings, "JOB_POLL_INTERVAL_SECONDS", 0.05)
+    monkeypatch.setattr(proposals_api, "get_formatting_service", lambda: FakeFormattingService())
+    monkeypatch.setattr(proposals_api.file_manager, "save_proposal", fake_save)
+    headers = {"Authorization": f"Bearer {settings.admin_password}"}
+
+    with TestClient(create_app()) as client:
+        resp = client.post(
+            "/api/jobs/generate",
+            json={"session_id": "job-1", "raw_text": "install carpet 1200", "document_type": "proposal"},
+            headers=headers,
+        )
+        assert resp.status_code == 202, resp.text
+        job = resp.json()
+        assert resp.headers["location"] == job["status_url"]
+
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            status = client.get(job["status_url"], headers=headers).json()["status"]
+            if status in (SUCCEEDED, FAILED):
+                break
+            time.sleep(0.05)
+        assert status == SUCCEEDED
+
+        result = client.get(job["result_url"], headers=headers)
+        assert result.status_code == 200
+        assert result.json()["proposal_data"]["total"] == 1200.0
+
+        events = client.get(job["events_url"], headers=headers).text
+        assert "event: result" in events
+
+        assert client.get("/api/jobs/does-not-exist", headers=headers).status_code == 404
+
+
+def test_generate_job_is_retried_after_transient_upstream_failure(monkeypatch, tmp_path):
+    from app.api import jobs as jobs_api
+    from app.api import proposals as proposals_api
+
+    calls = []
+
+    class FlakyFormattingService:
+        async def rewrite_professional(self, *args, **kwargs):
+            calls.append("rewrite")
+            if len(calls) == 1:
+                raise OpenAIFailure("OPENAI_TIMEOUT", "slow", 3)
+            return "Install carpet — $1,200.00"
+
+        async def structure_proposal(self, *args, **kwargs):
+            return {"client_name": "Jane", "line_items": [{"description": "Install carpet", "amount": 1200.0}], "total": 1200.0}
+
+    async def fake_save(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(proposals_api, "get_formatting_service", lambda: FlakyFormattingService())
+    monkeypatch.setattr(proposals_api.file_manager, "save_proposal", fake_save)
+    monkeypatch.setattr(job_queue, "JOB_HANDLERS", {"generate": jobs_api.run_generate_job})
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    job = store.submit("generate", {"request": {"session_id": "job-retry", "raw_text": "install carpet 1200", "document_type": "proposal"}}, max_attempts=2)
+
+    async def run():
+        queue = JobQueue(store, max_attempts=2)
+        await queue.run_job(store.claim())
+        assert store.get(job["id"])["status"] == QUEUED
+        await queue.run_job(store.claim())
+
+    asyncio.run(run())
+    finished = store.get(job["id"])
+    store.close()
+    assert finished["status"] == SUCCEEDED, finished["error"]
+    assert finished["attempts"] == 2 and calls == ["rewrite", "rewrite"]
+    assert finished["result"]["proposal_data"]["total"] == 1200.0
@@ -0,0 +1,140 @@
+import asyncio
+import base64
+import json
+
+import httpx
+import openai
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import config
+from app.services import openai_cassette, openai_client
+from app.services.openai_guard import call_openai_with_retry
+from loadtest.fake_openai import create_app
+
+# conftest swaps openai.AsyncOpenAI for an in-process fake per test; these tests need the real client
+RealAsyncOpenAI = openai.AsyncOpenAI
+
+IMAGE = b"\x89PNG fake page bytes"
+IMAGE_URL = "data:image/png;base64," + base64.b64encode(IMAGE).decode("ascii")
+OCR_MESSAGES = [{"role": "user", "content": [{"type": "text", "text": "Extract ONLY HANDWRITTEN text"}, {"type": "image_url", "image_url": {"url": IMAGE_URL}}]}]
+NOTES = "Jane Homeowner\n1234 Maple Ave\ndemo carpet 450\npaint walls 1200"
+
+
+def _openai(transport):
+    return RealAsyncOpenAI(api_key="test", base_url="http://fake-openai/v1", http_client=httpx.AsyncClient(transport=transport), max_retries=0)
+
+
+async def _ocr(client):
+    response = await call_openai_with_retry(
+        lambda: client.chat.completions.create(model="gpt-4o", messages=OCR_MESSAGES),
+        max_attempts=1,
+        operation="ocr",
+    )
+    return response.choices[0].message.content
+
+
+async def _stream(client):
+    chunks = await client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": NOTES}], stream=True)
+    return "".join([c.choices[0].delta.content or "" async for c in chunks if c.choices])
+
+
+def _record(path):
+    recorder = openai_cassette.RecordingTransport(httpx.ASGITransport(app=create_app()), openai_cassette.CassetteWriter(path))
+
+    async def go():
+        client = _openai(recorder)
+        return await _ocr(client), await _stream(client)
+
+    return asyncio.run(go())
+
+
+def test_record_hashes_images_and_keeps_operation(tmp_path):
+    path = tmp_path / "calls.jsonl.gz"
+    text, streamed = _record(path)
+    assert "Jane Homeowner" in text and streamed.startswith("Demo carpet")
+
+    ocr, stream = openai_cassette.load_cassette(path)
+    assert ocr["operation"] == "ocr" and stream["operation"] is None
+    image_url = ocr["request"]["messages"][0]["content"][1]["image_url"]["url"]
+    assert image_url.startswith("sha256:")
+    assert base64.b64encode(IMAGE).decode("ascii") not in json.dumps(ocr)
+    assert json.loads(ocr["body"])["choices"][0]["message"]["content"] == text
+    assert stream["headers"]["content-type"].startswith("text/event-stream")
+    assert ocr["latency_ms"] >= ocr["ttfb_ms"] >= 0
+
+
+def test_replay_serves_recorded_responses_without_network(tmp_path):
+    path = tmp_path / "calls.jsonl"
+    recorded = _record(path)
+    replay = openai_cassette.ReplayTransport.from_path(path)
+
+    async def go():
+        client = _openai(replay)
+        replayed = (await _ocr(client), await _stream(client))
+        with pytest.raises(openai.NotFoundError):
+            await client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "never recorded"}])
+        return replayed
+
+    assert asyncio.run(go()) == recorded
+    assert (replay.hits, replay.misses) == (2, 1)
+
+
+def test_replay_with_recorded_latency(tmp_path, monkeypatch):
+    entry = {
+        "key": openai_cassette.request_key(openai_cassette.normalize_request({"model": "gpt-4o", "messages": OCR_MESSAGES})),
+        "status": 200,
+        "headers": {"content-type": "application/json"},
+        "body": json.dumps({"id": "x", "object": "chat.completion", "created": 0, "model": "gpt-4o", "choices": [{"index": 0, "message": {"role": "assistant", "content": "hi"}, "finish_reason": "stop"}]}),
+        "ttfb_ms": 40.0,
+        "latency_ms": 250.0,
+    }
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(seconds, *args, **kwargs):
+        sleeps.append(seconds)
+        await real_sleep(0)
+
+    monkeypatch.setattr(openai_cassette.asyncio, "sleep", fake_sleep)
+    replay = openai_cassette.ReplayTransport([entry], replay_latency=True)
+    assert asyncio.run(_ocr(_openai(replay))) == "hi"
+    assert sleeps == [0.25]
+
+
+def test_api_replays_cassette_from_settings(tmp_path, monkeypatch):
+    settings = config.get_settings()
+    monkeypatch.setattr(settings, "MAX_REQUEST_BYTES", 1_000_000)
+    monkeypatch.setattr(openai, "AsyncOpenAI", RealAsyncOpenAI)
+    monkeypatch.setattr(openai_client, "_client", None)
+    monkeypatch.setattr(openai_client, "_http_client", None)
+    monkeypatch.setattr(openai_client, "_client_loop", None)
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", "http://fake-openai/v1")
+    path = tmp_path / "generate.jsonl"
+    body = {"session_id": "cassette-1", "raw_text": NOTES, "document_type": "proposal"}
+    headers = {"Authorization": f"Bearer {settings.admin_password}"}
+
+    # Record against the fake server...
+    monkeypatch.setattr(settings, "OPENAI_CASSETTE_MODE", "record")
+    monkeypatch.setattr(settings, "OPENAI_CASSETTE_PATH", str(path))
+    fake = create_app()
+    monkeypatch.setattr(httpx, "AsyncHTTPTransport", lambda **kwargs: httpx.ASGITransport(app=fake))
+    recorded = TestClient(app).post("/api/proposals/generate", json=body, headers=headers)
+    assert recorded.status_code == 200, recorded.text
+    assert {e["route"] for e in openai_cassette.load_cassette(path)} == {"/api/proposals/generate"}
+
+    # ...then replay with the fake gone
+    monkeypatch.setattr(settings, "OPENAI_CASSETTE_MODE", "replay")
+    monkeypatch.setattr(httpx, "AsyncHTTPTransport", None)
+    monkeypatch.setattr(openai_client, "_client", None)
+    replayed = TestClient(app).post("/api/proposals/generate", json={**body, "session_id": "cassette-2"}, headers=headers)
+    assert replayed.status_code == 200, replayed.text
+    assert replayed.json()["professional_text"] == recorded.json()["professional_text"]
+
+
+def test_cassette_mode_requires_path():
+    from types import SimpleNamespace
+    with pytest.raises(RuntimeError):
+        openai_cassette.cassette_transport(SimpleNamespace(OPENAI_CASSETTE_MODE="replay", OPENAI_CASSETTE_PATH=""), None)
+    assert openai_cassette.cassette_transport(SimpleNamespace(OPENAI_CASSETTE_MODE="off"), None) is None
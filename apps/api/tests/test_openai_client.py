@@ -0,0 +1,112 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import openai_client
+from app.services.book_ocr_service import BookOCRService
+from app.services.formatting_service import FormattingService
+from app.services.ocr_service import OCRService
+
+
+@pytest.fixture(autouse=True)
+def reset_shared_client(monkeypatch):
+    monkeypatch.setattr(openai_client, "_client", None)
+    monkeypatch.setattr(openai_client, "_http_client", None)
+    monkeypatch.setattr(openai_client, "_client_loop", None)
+
+
+def test_services_share_one_client_per_loop():
+    async def clients():
+        return OCRService().client, BookOCRService().client, FormattingService().client
+
+    first = asyncio.run(clients())
+    assert first[0] is first[1] is first[2]
+    # A different event loop cannot reuse the pooled sockets: a fresh client is built
+    second = asyncio.run(clients())
+    assert second[0] is not first[0]
+
+
+def test_loop_change_closes_the_old_pool():
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever, daemon=True)
+    thread.start()
+    try:
+        async def build():
+            openai_client.get_openai_client()
+            return openai_client._http_client
+
+        # Old loop still running: the pool is closed on that loop
+        on_other = asyncio.run_coroutine_threadsafe(build(), other).result(5)
+
+        async def rebuild():
+            openai_client.get_openai_client()
+            for future in list(openai_client._closing):
+                await asyncio.wrap_future(future)
+            return openai_client._http_client
+
+        current = asyncio.run(rebuild())
+        assert on_other.is_closed and not current.is_closed
+
+        # Old loop already closed: closed from the new one instead
+        async def rebuild_again():
+            openai_client.get_openai_client()
+            await asyncio.gather(*openai_client._closing)
+
+        asyncio.run(rebuild_again())
+        assert current.is_closed
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join(5)
+        other.close()
+
+
+def test_explicit_client_overrides_shared_one():
+    sentinel = object()
+    assert OCRService(client=sentinel).client is sentinel
+
+
+def test_build_http_client_applies_pool_settings():
+    settings = SimpleNamespace(
+        OPENAI_HTTP2=False,
+        OPENAI_MAX_CONNECTIONS=7,
+        OPENAI_MAX_KEEPALIVE_CONNECTIONS=3,
+        OPENAI_KEEPALIVE_EXPIRY_SECONDS=12.0,
+        OPENAI_CONNECT_TIMEOUT_SECONDS=2.0,
+    )
+
+    async def build():
+        client = openai_client.build_http_client(settings)
+        try:
+            pool = client._transport._pool
+            return pool._max_connections, pool._max_keepalive_connections, pool._keepalive_expiry, pool._http2, client.timeout.connect
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(build()) == (7, 3, 12.0, False, 2.0)
+
+
+def test_http2_enabled_when_h2_installed():
+    pytest.importorskip("h2")
+
+    async def build():
+        client = openai_client.build_http_client(SimpleNamespace(OPENAI_HTTP2=True))
+        try:
+            return client._transport._pool._http2
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(build()) is True
+
+
+def test_close_releases_pool():
+    async def scenario():
+        openai_client.get_openai_client()
+        http_client = openai_client._http_client
+        await openai_client.close_openai_client()
+        return http_client
+
+    http_client = asyncio.run(scenario())
+    assert http_client.is_closed
+    assert openai_client._client is None
@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import openai_guard
+from app.services.openai_guard import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    OpenAIFailure,
+    OpenAIGuard,
+    RetryBudget,
+    call_openai_with_retry,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def guard(monkeypatch):
+    clock = FakeClock()
+    g = OpenAIGuard(
+        CircuitBreaker(failure_threshold=2, recovery_seconds=10, clock=clock),
+        RetryBudget(ratio=0.2, min_retries=10, clock=clock),
+        min_timeout_s=0.01,
+    )
+    monkeypatch.setattr(openai_guard, "_guard", g)
+
+    async def no_sleep(_):
+        return None
+    monkeypatch.setattr(openai_guard.asyncio, "sleep", no_sleep)
+    g.clock = clock
+    return g
+
+
+def _timeout_call(counter):
+    async def fn():
+        counter.append(1)
+        raise asyncio.TimeoutError()
+    return fn
+
+
+def test_breaker_opens_and_fails_fast(guard):
+    calls = []
+    with pytest.raises(OpenAIFailure) as exc:
+        asyncio.run(call_openai_with_retry(_timeout_call(calls), max_attempts=3))
+    # Second consecutive timeout opened the breaker; the third attempt never ran
+    assert exc.value.code == "AI_UPSTREAM_UNAVAILABLE"
+    assert len(calls) == 2
+    assert guard.breaker.state == OPEN
+
+    with pytest.raises(OpenAIFailure) as exc:
+        asyncio.run(call_openai_with_retry(_timeout_call(calls), max_attempts=3))
+    assert len(calls) == 2
+    assert exc.value.retry_after == 10
+
+
+def test_half_open_probe_closes_on_success(guard):
+    guard.breaker.record_failure()
+    guard.breaker.record_failure()
+    assert guard.breaker.state == OPEN
+    guard.clock.now += 10
+    assert guard.breaker.snapshot()["state"] == HALF_OPEN
+
+    async def ok():
+        return "ok"
+
+    assert asyncio.run(call_openai_with_retry(ok)) == "ok"
+    assert guard.breaker.state == CLOSED
+
+
+def test_half_open_probe_failure_reopens(guard):
+    guard.breaker.record_failure()
+    guard.breaker.record_failure()
+    guard.clock.now += 10
+    calls = []
+    with pytest.raises(OpenAIFailure):
+        asyncio.run(call_openai_with_retry(_timeout_call(calls), max_attempts=3))
+    assert len(calls) == 1
+    assert guard.breaker.state == OPEN
+
+
+def test_cancelled_half_open_probe_releases_its_slot(guard):
+    guard.breaker.record_failure()
+    guard.breaker.record_failure()
+    guard.clock.now += 10
+
+    async def cancel_probe():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.Event().wait()
+
+        probe = asyncio.create_task(call_openai_with_retry(hang))
+        await started.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(cancel_probe())
+    assert guard.breaker.state == HALF_OPEN
+
+    async def ok():
+        return "ok"
+
+    # The next call gets the probe slot instead of AI_UPSTREAM_UNAVAILABLE
+    assert asyncio.run(call_openai_with_retry(ok)) == "ok"
+    assert guard.breaker.state == CLOSED
+
+
+def test_adaptive_timeout_follows_p95(guard):
+    for _ in range(19):
+        guard.latency("ocr").observe(1.0)
+    assert guard.attempt_timeout("ocr", 20.0) == 20.0  # not enough samples yet
+    guard.latency("ocr").observe(1.0)
+    assert guard.attempt_timeout("ocr", 20.0) == pytest.approx(2.0)
+    assert guard.attempt_timeout("ocr", 1.5) == 1.5  # never above the caller's ceiling
+
+
+def test_retry_budget_limits_retries():
+    clock = FakeClock()
+    budget = RetryBudget(ratio=0.5, min_retries=1, window_seconds=10, clock=clock)
+    for _ in range(4):
+        budget.record_request()
+    assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+    clock.now += 11
+    assert budget.try_spend() is True
+    assert budget.snapshot()["exhausted"] == 1
+
+
+def test_metrics_endpoint_reports_breaker_state(guard):
+    from app.main import create_app
+    from app.models.config import get_settings
+
+    guard.breaker.record_failure()
+    guard.breaker.record_failure()
+    client = TestClient(create_app())
+    settings = get_settings()
+    assert client.get("/api/metrics", headers={"Authorization": f"Bearer {settings.demo_password}"}).status_code == 403
+    resp = client.get("/api/metrics", headers={"Authorization": f"Bearer {settings.admin_password}"})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["openai_guard"]["breaker"]["state"] == "open"
+    assert "classes" in data["openai_scheduler"]
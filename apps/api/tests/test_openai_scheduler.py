@@ -0,0 +1,226 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import openai_scheduler
+from app.services.openai_guard import OpenAIFailure
+from app.services.openai_scheduler import (
+    BULK,
+    INTERACTIVE,
+    OpenAIScheduler,
+    call_openai_scheduled,
+    estimate_tokens,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_interactive_is_dispatched_before_bulk():
+    async def scenario():
+        sched = OpenAIScheduler(max_concurrency=1, requests_per_minute=1000, tokens_per_minute=100_000)
+        first = await sched.acquire(BULK, "book")
+        order = []
+
+        async def worker(priority, name):
+            ticket = await sched.acquire(priority, name)
+            order.append(name)
+            sched.release(ticket)
+
+        tasks = [asyncio.create_task(worker(BULK, "bulk-1")), asyncio.create_task(worker(BULK, "bulk-2"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(worker(INTERACTIVE, "interactive")))
+        await asyncio.sleep(0)
+        assert sched.stats()["classes"]["bulk"]["queue_depth"] == 2
+        sched.release(first)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert run(scenario())[0] == "interactive"
+
+
+def test_bulk_gets_every_nth_grant_under_sustained_interactive_load():
+    async def scenario():
+        sched = OpenAIScheduler(max_concurrency=1, requests_per_minute=1000, tokens_per_minute=100_000, bulk_every=4)
+        blocker = await sched.acquire(INTERACTIVE, "x")
+        order = []
+
+        async def worker(priority, name):
+            ticket = await sched.acquire(priority, name)
+            order.append(name)
+            sched.release(ticket)
+
+        tasks = [asyncio.create_task(worker(BULK, "bulk")) for _ in range(2)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(worker(INTERACTIVE, "interactive")) for _ in range(8)]
+        await asyncio.sleep(0)
+        sched.release(blocker)
+        await asyncio.gather(*tasks)
+        return order
+
+    order = run(scenario())
+    # Three interactive grants, then bulk's turn, and again
+    assert [i for i, name in enumerate(order) if name == "bulk"] == [3, 7]
+
+
+def test_tenants_are_served_round_robin():
+    async def scenario():
+        sched = OpenAIScheduler(max_concurrency=1, requests_per_minute=1000, tokens_per_minute=100_000)
+        blocker = await sched.acquire(BULK, "x")
+        order = []
+
+        async def worker(tenant):
+            ticket = await sched.acquire(BULK, tenant)
+            order.append(tenant)
+            sched.release(ticket)
+
+        # One big book queues five pages before a small one queues two
+        tasks = [asyncio.create_task(worker("big")) for _ in range(5)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(worker("small")) for _ in range(2)]
+        await asyncio.sleep(0)
+        sched.release(blocker)
+        await asyncio.gather(*tasks)
+        return order
+
+    order = run(scenario())
+    assert order[:4] == ["big", "small", "big", "small"]
+
+
+def test_concurrency_cap_is_respected():
+    async def scenario():
+        sched = OpenAIScheduler(max_concurrency=2, requests_per_minute=1000, tokens_per_minute=100_000)
+        peak = 0
+        active = 0
+
+        async def worker():
+            nonlocal peak, active
+            ticket = await sched.acquire(INTERACTIVE, "t")
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            sched.release(ticket)
+
+        await asyncio.gather(*(worker() for _ in range(6)))
+        return peak, sched.stats()
+
+    peak, stats = run(scenario())
+    assert peak == 2
+    assert stats["in_flight"] == 0
+    assert stats["classes"]["interactive"]["granted"] == 6
+
+
+def test_token_budget_blocks_until_refill_and_reconciles_usage():
+    clock = FakeClock()
+    sched = OpenAIScheduler(max_concurrency=10, requests_per_minute=1000, tokens_per_minute=600, clock=clock)
+
+    async def scenario():
+        ticket = await sched.acquire(INTERACTIVE, "t", tokens=500)
+        # Real usage was smaller than the estimate: the difference is refunded
+        sched.release(ticket, actual_tokens=100)
+        assert sched.stats()["tokens_budget_remaining"] == pytest.approx(500)
+        ticket = await sched.acquire(INTERACTIVE, "t", tokens=500)
+        sched.release(ticket, actual_tokens=500)
+        # Budget is now exhausted; the next call has to wait for refill
+        with pytest.raises(asyncio.TimeoutError):
+            await sched.acquire(INTERACTIVE, "t", tokens=500, timeout=0.05)
+        clock.now += 60  # a full minute refills the bucket
+        ticket = await sched.acquire(INTERACTIVE, "t", tokens=500, timeout=1)
+        sched.release(ticket)
+
+    run(scenario())
+    stats = sched.stats()
+    assert stats["classes"]["interactive"]["timeouts"] == 1
+    assert stats["classes"]["interactive"]["queue_depth"] == 0
+
+
+def test_call_openai_scheduled_maps_queue_timeout(monkeypatch):
+    sched = OpenAIScheduler(max_concurrency=1, requests_per_minute=1000, tokens_per_minute=100_000)
+    monkeypatch.setattr(openai_scheduler, "_scheduler", sched)
+    monkeypatch.setattr(
+        openai_scheduler,
+        "get_openai_scheduler",
+        lambda: sched,
+    )
+
+    async def fn():
+        return SimpleNamespace(usage=SimpleNamespace(total_tokens=42))
+
+    async def scenario():
+        response = await call_openai_scheduled(fn, estimated_tokens=100)
+        assert response.usage.total_tokens == 42
+        held = await sched.acquire(INTERACTIVE, "t")
+        from app.models import config
+        monkeypatch.setattr(config.get_settings(), "OPENAI_QUEUE_TIMEOUT_SECONDS", 0.05)
+        try:
+            with pytest.raises(OpenAIFailure) as exc:
+                await call_openai_scheduled(fn, estimated_tokens=100)
+        finally:
+            sched.release(held)
+        return exc.value
+
+    failure = run(scenario())
+    assert failure.code == "OPENAI_RATE_LIMITED"
+
+
+def test_sooner_waiter_rearms_the_pending_timer():
+    # Real clock: the timer has to fire for the interactive waiter to be granted
+    sched = OpenAIScheduler(max_concurrency=10, requests_per_minute=1000, tokens_per_minute=600)
+
+    async def scenario():
+        sched.release(await sched.acquire(INTERACTIVE, "t", tokens=600))
+        # Bucket drained: the bulk head needs a full minute of refill and arms the timer
+        bulk = asyncio.create_task(sched.acquire(BULK, "b", tokens=600))
+        await asyncio.sleep(0.01)
+        try:
+            # Refilled in ~0.1s; must not wait behind the bulk waiter's 60s timer
+            ticket = await sched.acquire(INTERACTIVE, "t", tokens=1, timeout=2)
+            sched.release(ticket)
+        finally:
+            bulk.cancel()
+
+    run(scenario())
+    assert sched.stats()["classes"]["interactive"]["timeouts"] == 0
+
+
+def test_call_openai_scheduled_charges_retries(monkeypatch):
+    sched = OpenAIScheduler(max_concurrency=1, requests_per_minute=100, tokens_per_minute=100_000, clock=FakeClock())
+    monkeypatch.setattr(openai_scheduler, "get_openai_scheduler", lambda: sched)
+
+    async def no_sleep(_):
+        return None
+
+    monkeypatch.setattr(asyncio, "sleep", no_sleep)
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        if len(calls) < 3:
+            raise asyncio.TimeoutError
+        return SimpleNamespace(usage=SimpleNamespace(total_tokens=100))
+
+    run(call_openai_scheduled(fn, estimated_tokens=100))
+    stats = sched.stats()
+    assert len(calls) == 3
+    # One request per attempt; the two failed attempts keep their estimate, the last is reconciled
+    assert stats["requests_budget_remaining"] == pytest.approx(97)
+    assert stats["tokens_budget_remaining"] == pytest.approx(100_000 - 300)
+
+
+def test_estimate_tokens_counts_text_and_images():
+    messages = [
+        {"role": "system", "content": "x" * 400},
+        {"role": "user", "content": [{"type": "text", "text": "y" * 40}, {"type": "image_url", "image_url": {"url": "data:"}}]},
+    ]
+    assert estimate_tokens(messages, 2000) == 100 + 10 + openai_scheduler.IMAGE_TOKEN_ESTIMATE + 2000
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import config
+from app.observability.profiling import SamplingProfiler
+
+
+def _headers(password, **extra):
+    return {"Authorization": f"Bearer {password}", **extra}
+
+
+@pytest.fixture
+def profiling_on(monkeypatch, tmp_path):
+    settings = config.get_settings()
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(settings, "PROFILING_INTERVAL_MS", 1.0)
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path))
+    return settings
+
+
+def _spin(seconds):
+    deadline = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < deadline:
+        n += 1
+    return n
+
+
+def test_sampling_profiler_produces_folded_stacks():
+    profiler = SamplingProfiler(threading.get_ident(), interval_s=0.001)
+    profiler.start()
+    _spin(0.1)
+    profiler.stop()
+    assert profiler.sample_count > 0
+    lines = profiler.folded().splitlines()
+    assert any("_spin (" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+
+def test_disabled_by_default_ignores_profile_header():
+    settings = config.get_settings()
+    resp = TestClient(app).get("/api/history/missing", headers=_headers(settings.admin_password, **{"X-Profile": "1"}))
+    assert "x-profile-id" not in resp.headers
+
+
+def test_admin_profile_header_stores_downloadable_profile(profiling_on):
+    client = TestClient(app)
+    resp = client.get("/api/history/missing", headers=_headers(profiling_on.admin_password, **{"X-Profile": "1", "X-Request-ID": "prof-1"}))
+    profile_id = resp.headers["x-profile-id"]
+
+    listing = client.get("/api/admin/profiles", headers=_headers(profiling_on.admin_password)).json()["profiles"]
+    meta = next(p for p in listing if p["id"] == profile_id)
+    assert meta["request_id"] == "prof-1"
+    assert meta["path"] == "/api/history/missing"
+    assert meta["trigger"] == "on_demand"
+    assert meta["status_code"] == 404
+
+    download = client.get(f"/api/admin/profiles/{profile_id}", headers=_headers(profiling_on.admin_password))
+    assert download.status_code == 200
+    assert download.headers["content-type"].startswith("text/plain")
+
+
+def test_profile_flag_requires_admin(profiling_on):
+    resp = TestClient(app).get("/api/auth/login?profile=1", headers=_headers(profiling_on.demo_password))
+    assert "x-profile-id" not in resp.headers
+
+
+def test_sample_rate_profiles_without_flag(profiling_on, monkeypatch):
+    monkeypatch.setattr(profiling_on, "PROFILING_SAMPLE_RATE", 1.0)
+    client = TestClient(app)
+    profile_id = client.get("/health").headers["x-profile-id"]
+    listing = client.get("/api/admin/profiles", headers=_headers(profiling_on.admin_password)).json()["profiles"]
+    assert next(p for p in listing if p["id"] == profile_id)["trigger"] == "sampled"
+
+
+def test_profile_endpoints_are_admin_only(profiling_on):
+    client = TestClient(app)
+    assert client.get("/api/admin/profiles", headers=_headers(profiling_on.demo_password)).status_code == 403
+    missing = client.get("/api/admin/profiles/../../etc", headers=_headers(profiling_on.admin_password))
+    assert missing.status_code == 404
+    assert client.get("/api/admin/profiles/20260101T000000-deadbeef", headers=_headers(profiling_on.admin_password)).status_code == 404
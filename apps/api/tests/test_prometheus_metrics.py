@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.observability import metrics as obs
+from app.observability.metrics import Counter, Histogram, Registry
+
+
+def test_histogram_exposition_is_cumulative():
+    registry = Registry()
+    h = registry.histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 0.5, 3.0):
+        h.labels("/x").observe(v)
+    text = registry.expose()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{route="/x",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/x",le="1"} 3' in text
+    assert 'demo_seconds_bucket{route="/x",le="+Inf"} 4' in text
+    assert 'demo_seconds_count{route="/x"} 4' in text
+    assert 'demo_seconds_sum{route="/x"} 4.05' in text
+
+
+def test_per_thread_shards_are_merged():
+    c = Counter("hits_total", "Hits.")
+    h = Histogram("lat", "Latency.", buckets=(1.0,))
+
+    def work():
+        for _ in range(1000):
+            c.inc()
+            h.observe(0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert c.labels().value() == 4000
+    counts, total = h.labels().snapshot()
+    assert counts == [4000, 0]
+    assert total == 2000.0
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter("odd_total", "Odd.", ("route",)).labels('a"b\\c').inc()
+    assert 'odd_total{route="a\\"b\\\\c"} 1' in registry.expose()
+
+
+def test_openai_retries_and_attempt_latency_are_recorded(monkeypatch):
+    from app.services import openai_guard
+
+    async def no_sleep(_):
+        return None
+    monkeypatch.setattr(openai_guard.asyncio, "sleep", no_sleep)
+    retries = obs.OPENAI_RETRIES.labels("metrics_test", "OPENAI_TIMEOUT")
+    before = retries.value()
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise asyncio.TimeoutError()
+        return "ok"
+
+    assert asyncio.run(openai_guard.call_openai_with_retry(flaky, operation="metrics_test")) == "ok"
+    assert retries.value() == before + 1
+    counts, _ = obs.OPENAI_ATTEMPT_SECONDS.labels("metrics_test", "ok").snapshot()
+    assert sum(counts) >= 1
+
+
+def test_atomic_write_counts_bytes(tmp_path):
+    from app.storage.atomic_write import atomic_write_bytes_sync
+
+    child = obs.STORAGE_BYTES_WRITTEN.labels("sync")
+    before = child.value()
+    atomic_write_bytes_sync(tmp_path / "f.bin", b"x" * 123)
+    assert child.value() == before + 123
+
+
+def test_metrics_endpoint_exposes_route_latency():
+    from app.main import create_app
+    from app.models.config import get_settings
+
+    settings = get_settings()
+    client = TestClient(create_app())
+    client.get("/health")
+    assert client.get("/metrics", headers={"Authorization": f"Bearer {settings.demo_password}"}).status_code == 403
+    resp = client.get("/metrics", headers={"Authorization": f"Bearer {settings.admin_password}"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'mph_http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in resp.text
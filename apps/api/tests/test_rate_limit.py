@@ -88,7 +88,7 @@ def test_rate_limit_no_file_write_on_429(monkeypatch, tmp_path):
     t = [3000.0]
     monkeypatch.setattr("time.time", lambda: t[0])
     # Set up deterministic client IP and proxy trust
-    monkeypatch.setattr("app.api.proposals.rate_limiter._store", {}, raising=False)
+    monkeypatch.setattr("app.security.rate_limit._rate_limiter", None)
     monkeypatch.setattr("app.api.proposals.TRUST_PROXY_HEADERS", True, raising=False)
     payload = {
         "session_id": "test-session2",
@@ -0,0 +1,181 @@
+import asyncio
+import multiprocessing
+import socketserver
+import threading
+
+import pytest
+
+from app.security.rate_limit import (
+    InMemoryRateLimitBackend,
+    RateLimiter,
+    RateLimitException,
+    RedisRateLimitBackend,
+    SharedMemoryRateLimitBackend,
+)
+
+WINDOW = 60
+
+
+def drain(backend, key, limit, now, n):
+    return [backend.hit(key, limit, WINDOW, now)[0] for _ in range(n)]
+
+
+def test_sliding_window_blocks_edge_double_burst():
+    backend = InMemoryRateLimitBackend()
+    # Burst at the very end of one window...
+    assert drain(backend, "k", 5, 59.0, 5) == [True] * 5
+    # ...cannot be repeated right after the boundary (a fixed window would allow 5 more)
+    assert drain(backend, "k", 5, 61.0, 5) == [False] * 5
+    # Once the previous window has decayed, requests flow again
+    assert backend.hit("k", 5, WINDOW, 119.0)[0] is True
+
+
+def test_retry_after_points_past_the_block():
+    backend = InMemoryRateLimitBackend()
+    drain(backend, "k", 3, 0.0, 3)
+    allowed, retry_after = backend.hit("k", 3, WINDOW, 10.0)
+    assert not allowed
+    assert backend.hit("k", 3, WINDOW, 10.0 + retry_after)[0] is True
+
+
+def test_memory_backend_is_bounded_lru():
+    backend = InMemoryRateLimitBackend(max_keys=3)
+    for key in ("a", "b", "c"):
+        backend.hit(key, 1, WINDOW, 0.0)
+    backend.hit("a", 1, WINDOW, 0.0)  # touch a -> b is least recently used
+    backend.hit("d", 1, WINDOW, 0.0)
+    assert len(backend) == 3
+    assert backend.hit("b", 1, WINDOW, 0.0)[0] is True  # evicted, starts fresh
+    assert backend.hit("a", 1, WINDOW, 0.0)[0] is False
+
+
+def _shared_worker(path, queue):
+    backend = SharedMemoryRateLimitBackend(path, slots=64)
+    queue.put(drain(backend, "shared-key", 10, 30.0, 5))
+
+
+def test_shared_memory_backend_enforces_across_processes(tmp_path):
+    path = str(tmp_path / "rl.bin")
+    SharedMemoryRateLimitBackend(path, slots=64).close()
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_shared_worker, args=(path, queue)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    results = [hit for _ in procs for hit in queue.get(timeout=30)]
+    for p in procs:
+        p.join(10)
+    assert results.count(True) == 10
+    assert len(results) == 20
+
+
+def test_shared_memory_backend_evicts_within_bound(tmp_path):
+    backend = SharedMemoryRateLimitBackend(str(tmp_path / "rl.bin"), slots=8)
+    for i in range(100):
+        assert backend.hit(f"k{i}", 1, WINDOW, float(i) / 1000)[0] is True
+    backend.close()
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Just enough of the Redis protocol for the rate limiter."""
+
+    def _read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            n = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(n + 2)[:-2].decode())
+        return args
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            cmd = self._read_command()
+            if cmd is None:
+                return
+            op = cmd[0].upper()
+            with self.server.lock:
+                if op == "GET":
+                    val = store.get(cmd[1])
+                    reply = b"$-1\r\n" if val is None else b"$%d\r\n%s\r\n" % (len(str(val)), str(val).encode())
+                elif op in ("INCR", "DECR"):
+                    store[cmd[1]] = int(store.get(cmd[1], 0)) + (1 if op == "INCR" else -1)
+                    reply = b":%d\r\n" % store[cmd[1]]
+                elif op == "PEXPIRE":
+                    reply = b":1\r\n"
+                else:
+                    reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def fake_redis():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeRedisHandler)
+    server.daemon_threads = True
+    server.store = {}
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_redis_backend_shares_limits_between_clients(fake_redis):
+    url = "redis://127.0.0.1:%d/0" % fake_redis.server_address[1]
+    a, b = RedisRateLimitBackend(url), RedisRateLimitBackend(url)
+    results = drain(a, "k", 4, 10.0, 3) + drain(b, "k", 4, 10.0, 3)
+    assert results == [True, True, True, True, False, False]
+    # Rejected hits are not counted
+    assert fake_redis.store["mph:rl:k:0"] == 4
+    a.close()
+    b.close()
+
+
+def test_limiter_falls_back_when_redis_unreachable():
+    limiter = RateLimiter(RedisRateLimitBackend("redis://127.0.0.1:1/0", timeout=0.05))
+    limiter.check("1.2.3.4", "login", 1)
+    with pytest.raises(RateLimitException):
+        limiter.check("1.2.3.4", "login", 1)
+
+
+class FlakyBackend:
+    blocking_io = True
+
+    def __init__(self):
+        self.calls = []
+        self.fail = True
+
+    def hit(self, key, limit, window, now):
+        self.calls.append(threading.get_ident())
+        if self.fail:
+            raise ConnectionError("down")
+        return True, 0
+
+
+def test_failed_backend_is_skipped_until_retry_interval():
+    clock = [0.0]
+    backend = FlakyBackend()
+    limiter = RateLimiter(backend, backend_retry_seconds=30, clock=lambda: clock[0])
+    limiter.check("1.2.3.4", "login", 5)
+    limiter.check("1.2.3.4", "login", 5)
+    assert len(backend.calls) == 1  # second call went straight to the in-memory fallback
+    backend.fail = False
+    clock[0] += 31
+    limiter.check("1.2.3.4", "login", 5)
+    assert len(backend.calls) == 2
+
+
+def test_acheck_runs_blocking_backend_off_the_event_loop():
+    backend = FlakyBackend()
+    backend.fail = False
+    limiter = RateLimiter(backend)
+
+    async def go():
+        await limiter.acheck("1.2.3.4", "login", 5)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(go())
+    assert backend.calls and backend.calls[0] != loop_thread
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+
+from fastapi.testclient import TestClient
+
+from app import request_context
+from app.main import app
+from app.models import config
+from app.request_context import RequestContext, RequestContextLogFilter
+from app.services import openai_scheduler
+
+
+def _admin_headers(**extra):
+    settings = config.get_settings()
+    return {"Authorization": f"Bearer {settings.admin_password}", **extra}
+
+
+def test_handler_error_carries_bound_request_id():
+    resp = TestClient(app).get("/api/history/no-such-session", headers=_admin_headers(**{"x-request-id": "ctx-404"}))
+    assert resp.status_code == 404
+    assert resp.json()["request_id"] == "ctx-404"
+    assert resp.headers["x-request-id"] == "ctx-404"
+
+
+def test_context_is_unbound_after_the_request():
+    TestClient(app).get("/api/history/no-such-session", headers=_admin_headers())
+    assert request_context.current() is None
+    assert request_context.get_request_id() is None
+
+
+def test_log_filter_stamps_request_id_and_auth_level():
+    record = logging.LogRecord("t", logging.INFO, __file__, 1, "msg", None, None)
+    token = request_context.bind(RequestContext("ctx-log", "GET", "/x", "10.0.0.1"))
+    try:
+        request_context.set_auth_level("admin")
+        assert RequestContextLogFilter().filter(record)
+    finally:
+        request_context.reset(token)
+    assert record.request_id == "ctx-log"
+    assert record.auth_level == "admin"
+
+
+def test_log_filter_keeps_explicit_request_id():
+    record = logging.LogRecord("t", logging.INFO, __file__, 1, "msg", None, None)
+    record.request_id = "explicit"
+    token = request_context.bind(RequestContext("ctx-other"))
+    try:
+        RequestContextLogFilter().filter(record)
+    finally:
+        request_context.reset(token)
+    assert record.request_id == "explicit"
+
+
+def test_client_ip_prefers_forwarded_for():
+    scope = {"headers": [(b"x-forwarded-for", b"203.0.113.9, 10.0.0.1")], "client": ("127.0.0.1", 5000)}
+    assert request_context.client_ip_from_scope(scope) == "203.0.113.9"
+    assert request_context.client_ip_from_scope({"client": ("127.0.0.1", 5000)}) == "127.0.0.1"
+
+
+def test_openai_slot_queues_under_client_ip_by_default():
+    async def scenario():
+        tenants = []
+        token = request_context.bind(RequestContext("ctx-slot", client_ip="198.51.100.7"))
+        try:
+            async with openai_scheduler.openai_slot() as ticket:
+                tenants.append(ticket.tenant)
+        finally:
+            request_context.reset(token)
+        async with openai_scheduler.openai_slot() as ticket:
+            tenants.append(ticket.tenant)
+        return tenants
+
+    assert asyncio.run(scenario()) == ["198.51.100.7", "default"]
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import formatting_service, response_cache
+from app.services.formatting_service import FormattingService
+from app.services.response_cache import ResponseCache, cache_key, normalize_text
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Resp:
+    def __init__(self, content):
+        self.choices = [type("C", (), {"message": type("M", (), {"content": content})()})()]
+
+
+class CountingClient:
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        return _Resp(f"Install carpet — $1,200.00 (call {self.calls})")
+
+
+def test_key_ignores_whitespace_but_not_content():
+    assert normalize_text("  Jane  Smith\r\n\n123 Main\tSt  ") == "Jane Smith\n123 Main St"
+    base = cache_key("rewrite", "Jane Smith\n123 Main St", "v1", "gpt-4o", 0.0)
+    assert cache_key("rewrite", " Jane  Smith \n\n123 Main St", "v1", "gpt-4o", 0.0) == base
+    assert cache_key("rewrite", "Jane Smith\n124 Main St", "v1", "gpt-4o", 0.0) != base
+    assert cache_key("rewrite", "Jane Smith\n123 Main St", "v2", "gpt-4o", 0.0) != base
+    assert cache_key("rewrite", "Jane Smith\n123 Main St", "v1", "gpt-4o-mini", 0.0) != base
+
+
+def test_lru_eviction_and_ttl(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(tmp_path, max_entries=2, ttl_seconds=60, clock=clock)
+    cache.set("a" * 64, "A")
+    cache.set("b" * 64, "B")
+    assert cache.get("a" * 64) == "A"  # a is now most recent
+    cache.set("c" * 64, "C")
+    assert cache.get("b" * 64) is None
+    assert not (tmp_path / "bb" / f"{'b' * 64}.json").exists()
+    clock.now += 61
+    assert cache.get("a" * 64) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_survive_restart(tmp_path):
+    clock = FakeClock()
+    ResponseCache(tmp_path, clock=clock).set("d" * 64, {"x": 1})
+    reloaded = ResponseCache(tmp_path, clock=clock)
+    assert reloaded.get("d" * 64) == {"x": 1}
+
+
+@pytest.fixture
+def enabled_cache(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path)
+    monkeypatch.setattr(formatting_service, "get_response_cache", lambda: cache)
+    return cache
+
+
+def test_rewrite_is_served_from_cache(enabled_cache):
+    client = CountingClient()
+    service = FormattingService(client=client)
+    first = asyncio.run(service.rewrite_professional("install carpet 1200"))
+    second = asyncio.run(service.rewrite_professional("install  carpet 1200\n"))
+    assert first == second
+    assert client.calls == 1
+    # Bypass forces a fresh call and refreshes the entry
+    third = asyncio.run(service.rewrite_professional("install carpet 1200", use_cache=False))
+    assert client.calls == 2
+    assert asyncio.run(service.rewrite_professional("install carpet 1200")) == third
+
+
+def test_generate_route_honours_bypass_header(monkeypatch):
+    from app.api import proposals as proposals_api
+    from app.main import app
+    from app.models import config
+
+    seen = []
+
+    class FakeFormattingService:
+        async def rewrite_professional(self, *args, **kwargs):
+            seen.append(kwargs.get("use_cache"))
+            return "ok"
+
+        async def structure_proposal(self, *args, **kwargs):
+            return {}
+
+    async def fake_save(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(proposals_api, "get_formatting_service", lambda: FakeFormattingService())
+    monkeypatch.setattr(proposals_api.file_manager, "save_proposal", fake_save)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {config.get_settings().admin_password}"}
+    payload = {"session_id": "cache-bypass-1", "raw_text": "x", "document_type": "proposal"}
+    client.post("/api/proposals/generate", json=payload, headers=headers)
+    client.post("/api/proposals/generate", json=payload, headers={**headers, "X-Cache-Bypass": "1"})
+    assert seen == [True, False]
@@ -0,0 +1,142 @@
+import io
+import os
+import time
+
+import pytest
+from PIL import Image
+
+from app.storage.file_manager import FileManager
+from app.storage.retention import (
+    ARCHIVE_SUFFIX,
+    TEMPLATE_TMP_PREFIX,
+    RetentionPolicy,
+    RetentionWorker,
+    run_retention_pass,
+)
+
+DAY = 86400
+
+
+def make_file_manager(tmp_path):
+    fm = FileManager()
+    fm.sessions_dir = tmp_path / "sessions"
+    fm.books_dir = tmp_path / "books"
+    fm.uploads_dir = tmp_path / "raw_uploads"
+    for d in (fm.sessions_dir, fm.books_dir, fm.uploads_dir):
+        d.mkdir(parents=True)
+    return fm
+
+
+def touch(path, data=b"x", age=0.0, now=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    ts = (now or time.time()) - age
+    os.utime(path, (ts, ts))
+    return path
+
+
+def age_dir(path, age, now):
+    ts = now - age
+    os.utime(path, (ts, ts))
+
+
+def noisy_png(size=(400, 400)) -> bytes:
+    img = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_age_based_deletion(tmp_path):
+    now = time.time()
+    fm = make_file_manager(tmp_path)
+    old = fm.sessions_dir / "old-session"
+    fresh = fm.sessions_dir / "fresh-session"
+    touch(old / "proposal.json", b"{}" * 50, age=40 * DAY, now=now)
+    age_dir(old, 40 * DAY, now)
+    touch(fresh / "proposal.json", b"{}", age=DAY, now=now)
+    old_chapter = fm.books_dir / "old-chapter"
+    touch(old_chapter / "chapter.json", b"{}", age=40 * DAY, now=now)
+    age_dir(old_chapter, 40 * DAY, now)
+
+    stats = run_retention_pass(fm, RetentionPolicy(max_age_days=30), now=now, temp_dir=tmp_path)
+
+    assert not old.exists()
+    assert not old_chapter.exists()
+    assert fresh.exists()
+    assert stats.deleted_dirs == 2
+    assert stats.reclaimed_bytes >= 102
+    assert stats.scan_seconds >= 0
+
+
+def test_age_deletion_disabled_by_default(tmp_path):
+    now = time.time()
+    fm = make_file_manager(tmp_path)
+    old = fm.sessions_dir / "old-session"
+    touch(old / "proposal.json", age=400 * DAY, now=now)
+    age_dir(old, 400 * DAY, now)
+
+    run_retention_pass(fm, RetentionPolicy(), now=now, temp_dir=tmp_path)
+
+    assert (old / "proposal.json").exists()
+
+
+def test_recompresses_old_originals(tmp_path):
+    now = time.time()
+    fm = make_file_manager(tmp_path)
+    session = fm.sessions_dir / "s1"
+    original = touch(session / "original_page1.png", noisy_png(), age=10 * DAY, now=now)
+    recent = touch(session / "original_page2.png", noisy_png(), age=DAY, now=now)
+    before = original.stat().st_size
+
+    policy = RetentionPolicy(archive_after_days=7, archive_quality=40, archive_max_dimension=200)
+    stats = run_retention_pass(fm, policy, now=now, temp_dir=tmp_path)
+
+    archived = session / ("original_page1" + ARCHIVE_SUFFIX)
+    assert not original.exists()
+    assert archived.exists()
+    assert recent.exists()
+    assert stats.recompressed_files == 1
+    assert stats.reclaimed_bytes == before - archived.stat().st_size
+    # Already archived files are left alone on the next pass
+    os.utime(archived, (now - 10 * DAY, now - 10 * DAY))
+    assert run_retention_pass(fm, policy, now=now, temp_dir=tmp_path).recompressed_files == 0
+
+
+def test_removes_orphans_after_grace(tmp_path):
+    now = time.time()
+    fm = make_file_manager(tmp_path)
+    session = fm.sessions_dir / "s1"
+    touch(session / "proposal.pdf", age=2 * DAY, now=now)
+    stale_tmp = touch(session / "proposal.pdf.tmp.abc123", age=2 * DAY, now=now)
+    live_tmp = touch(session / "proposal.json.tmp.def456", age=10, now=now)
+    overlay = touch(session / "invoice_overlay.pdf", age=2 * DAY, now=now)
+    empty = fm.sessions_dir / "empty"
+    empty.mkdir()
+    age_dir(empty, 2 * DAY, now)
+    leaked = touch(tmp_path / f"{TEMPLATE_TMP_PREFIX}abc.pdf", age=2 * DAY, now=now)
+    other_tmp = touch(tmp_path / "tmpabc.pdf", age=2 * DAY, now=now)
+
+    stats = run_retention_pass(fm, RetentionPolicy(orphan_grace_seconds=3600), now=now, temp_dir=tmp_path)
+
+    assert not stale_tmp.exists()
+    assert not overlay.exists()
+    assert not empty.exists()
+    assert not leaked.exists()
+    assert live_tmp.exists()
+    assert other_tmp.exists()
+    assert (session / "proposal.pdf").exists()
+    assert stats.deleted_files == 3
+    assert stats.deleted_dirs == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_run_once_accumulates_totals(tmp_path):
+    fm = make_file_manager(tmp_path)
+    worker = RetentionWorker(fm, RetentionPolicy(), interval_seconds=60)
+    await worker.run_once()
+    await worker.run_once()
+    snap = worker.snapshot()
+    assert snap["passes"] == 2
+    assert snap["last"]["scan_seconds"] >= 0
+    assert "reclaimed_bytes" in snap["totals"]
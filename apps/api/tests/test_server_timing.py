@@ -0,0 +1,73 @@
+import json
+import logging
+
+from fastapi.testclient import TestClient
+
+from app import request_context
+from app.main import app
+from app.models import config
+from app.observability import timing
+from app.request_context import RequestContext
+
+
+def _parse_server_timing(value):
+    metrics = {}
+    for part in value.split(","):
+        name, dur = part.strip().split(";dur=")
+        metrics[name] = float(dur)
+    return metrics
+
+
+def test_stage_sums_repeats_within_a_request():
+    token = request_context.bind(RequestContext("timing-unit"))
+    try:
+        for _ in range(3):
+            with timing.stage("ocr"):
+                pass
+        ctx = request_context.current()
+    finally:
+        request_context.reset(token)
+    assert ctx.stages["ocr"][1] == 3
+    record = timing.timing_record(ctx, 200)
+    assert record["stages"]["ocr"]["count"] == 3
+    assert set(_parse_server_timing(timing.server_timing(ctx))) == {"ocr", "total"}
+
+
+def test_stage_outside_a_request_is_harmless():
+    with timing.stage("ocr"):
+        pass
+    assert request_context.current() is None
+
+
+def test_generate_reports_each_pipeline_stage(monkeypatch, caplog):
+    from app.api import proposals as proposals_api
+
+    class FakeFormattingService:
+        async def rewrite_professional(self, *args, **kwargs):
+            return "Install carpet — $1,200.00"
+
+        async def structure_proposal(self, *args, **kwargs):
+            return {"client_name": "Jane", "line_items": [{"description": "Install carpet", "amount": 1200.0}], "total": 1200.0}
+
+    monkeypatch.setattr(proposals_api, "get_formatting_service", lambda: FakeFormattingService())
+    settings = config.get_settings()
+    with caplog.at_level(logging.INFO, logger="mph.timing"):
+        resp = TestClient(app).post(
+            "/api/proposals/generate",
+            json={"session_id": "timing-1", "raw_text": "install carpet 1200", "document_type": "proposal"},
+            headers={"Authorization": f"Bearer {settings.admin_password}", "X-Request-ID": "timing-rid"},
+        )
+    assert resp.status_code == 200, resp.text
+    metrics = _parse_server_timing(resp.headers["server-timing"])
+    assert {"rewrite", "structure", "validate", "save", "pdf_render", "total"} <= set(metrics)
+    assert metrics["total"] >= metrics["pdf_render"]
+
+    records = [json.loads(r.getMessage()) for r in caplog.records if r.name == "mph.timing"]
+    assert records and records[-1]["request_id"] == "timing-rid"
+    assert records[-1]["status_code"] == 200
+    assert "rewrite" in records[-1]["stages"]
+
+
+def test_requests_without_stages_only_report_total():
+    resp = TestClient(app).get("/api/auth/login")
+    assert set(_parse_server_timing(resp.headers["server-timing"])) == {"total"}
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from app.services.formatting_service import FormattingService
+from app.services.ocr_service import OCRService
+from app.services.single_flight import SingleFlight, get_single_flight
+
+
+class _Resp:
+    def __init__(self, content):
+        self.choices = [type("C", (), {"message": type("M", (), {"content": content})()})()]
+
+
+class SlowClient:
+    def __init__(self, content="text", delay=0.05):
+        self.chat = self
+        self.completions = self
+        self.calls = 0
+        self._content = content
+        self._delay = delay
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self._delay)
+        return _Resp(self._content)
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    sf = SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        return await asyncio.gather(*(sf.do("ocr", "k", work) for _ in range(5)), sf.do("ocr", "other", work))
+
+    assert asyncio.run(run()) == ["done"] * 6
+    assert len(runs) == 2
+    assert sf.stats()["by_namespace"]["ocr"] == {"calls": 6, "executed": 2, "coalesced": 4}
+    assert sf.stats()["in_flight"] == 0
+
+
+def test_followers_share_the_leaders_exception():
+    sf = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream")
+
+    async def run():
+        return await asyncio.gather(sf.do("x", "k", boom), sf.do("x", "k", boom), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_follower_takes_over_when_leader_is_cancelled():
+    sf = SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def run():
+        leader = asyncio.ensure_future(sf.do("x", "k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(sf.do("x", "k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "ok"
+    assert len(runs) == 2
+
+
+def test_same_image_ocr_is_coalesced(tmp_path):
+    page = tmp_path / "page.jpg"
+    page.write_bytes(b"\xff\xd8same-image")
+    copy = tmp_path / "copy.jpg"
+    copy.write_bytes(b"\xff\xd8same-image")
+    client = SlowClient("handwritten text")
+    service = OCRService(client=client)
+
+    async def run():
+        return await asyncio.gather(service.transcribe_image(page), service.transcribe_image(copy))
+
+    assert asyncio.run(run()) == ["handwritten text", "handwritten text"]
+    assert client.calls == 1
+    assert get_single_flight().stats()["by_namespace"]["ocr"]["coalesced"] == 1
+
+
+def test_double_submitted_rewrite_is_coalesced():
+    client = SlowClient("Install carpet — $1,200.00")
+    service = FormattingService(client=client)
+
+    async def run():
+        return await asyncio.gather(
+            service.rewrite_professional("install carpet 1200", use_cache=False),
+            service.rewrite_professional("install carpet 1200", use_cache=False),
+        )
+
+    first, second = asyncio.run(run())
+    assert first == second == "Install carpet — $1,200.00"
+    assert client.calls == 1
@@ -0,0 +1,82 @@
+import pytest
+
+from app.storage.file_manager import FileManager, shard_path
+from app.storage.migrate_layout import main as migrate_main, migrate_to_sharded
+
+
+def make_file_manager(tmp_path, sharded=True):
+    fm = FileManager(sharded=sharded)
+    fm.sessions_dir = tmp_path / "sessions"
+    fm.books_dir = tmp_path / "books"
+    fm.sessions_dir.mkdir()
+    fm.books_dir.mkdir()
+    return fm
+
+
+def test_new_session_uses_sharded_path(tmp_path):
+    fm = make_file_manager(tmp_path)
+    sid = "6f1c2d8e-0000-4000-8000-000000000001"
+    path = fm.session_dir(sid)
+    assert path == shard_path(fm.sessions_dir, sid)
+    rel = path.relative_to(fm.sessions_dir).parts
+    assert len(rel) == 3 and len(rel[0]) == 2 and len(rel[1]) == 2 and rel[2] == sid
+
+
+def test_flat_layout_when_sharding_disabled(tmp_path):
+    fm = make_file_manager(tmp_path, sharded=False)
+    assert fm.session_dir("abc") == fm.sessions_dir / "abc"
+
+
+def test_legacy_dirs_still_resolve(tmp_path):
+    fm = make_file_manager(tmp_path)
+    legacy = fm.sessions_dir / "legacy-session"
+    legacy.mkdir()
+    assert fm.session_dir("legacy-session") == legacy
+    chapter = fm.books_dir / "legacy-chapter"
+    chapter.mkdir()
+    assert fm.chapter_dir("legacy-chapter") == chapter
+
+
+@pytest.mark.asyncio
+async def test_iter_dirs_covers_both_layouts(tmp_path):
+    fm = make_file_manager(tmp_path)
+    (fm.sessions_dir / "legacy-session").mkdir()
+    await fm.save_transcription("new-session", "hello")
+    names = sorted(p.name for p in fm.iter_session_dirs())
+    assert names == ["legacy-session", "new-session"]
+    assert (fm.session_dir("new-session") / "transcription.txt").read_text() == "hello"
+
+
+def test_migration_moves_and_merges(tmp_path):
+    fm = make_file_manager(tmp_path)
+    (fm.sessions_dir / "s1").mkdir()
+    (fm.sessions_dir / "s1" / "proposal.json").write_text("{}")
+    (fm.books_dir / "chapter-1").mkdir()
+    (fm.books_dir / "chapter-1" / "chapter.json").write_text("{}")
+    # Legacy dir recreated by a concurrent write after an earlier move
+    target = shard_path(fm.sessions_dir, "s2")
+    target.mkdir(parents=True)
+    (target / "proposal.json").write_text("{}")
+    (fm.sessions_dir / "s2").mkdir()
+    (fm.sessions_dir / "s2" / "proposal.pdf").write_bytes(b"%PDF")
+
+    assert migrate_to_sharded(fm, dry_run=True)["sessions"] == {"moved": 1, "merged": 1, "errors": 0}
+    assert (fm.sessions_dir / "s1").exists()
+
+    result = migrate_to_sharded(fm)
+    assert result["sessions"] == {"moved": 1, "merged": 1, "errors": 0}
+    assert result["books"] == {"moved": 1, "merged": 0, "errors": 0}
+    assert not (fm.sessions_dir / "s1").exists()
+    assert (shard_path(fm.sessions_dir, "s1") / "proposal.json").exists()
+    assert sorted(p.name for p in target.iterdir()) == ["proposal.json", "proposal.pdf"]
+    assert (fm.chapter_dir("chapter-1") / "chapter.json").exists()
+    # Idempotent
+    assert migrate_to_sharded(fm)["sessions"] == {"moved": 0, "merged": 0, "errors": 0}
+
+
+def test_migration_cli(tmp_path, monkeypatch, capsys):
+    fm = make_file_manager(tmp_path)
+    (fm.sessions_dir / "s1").mkdir()
+    monkeypatch.setattr("app.storage.migrate_layout.FileManager", lambda: fm)
+    assert migrate_main([]) == 0
+    assert '"moved": 1' in capsys.readouterr().out
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import config
+from app.observability import tracing
+from app.services import openai_guard
+
+
+def _admin_headers(**extra):
+    settings = config.get_settings()
+    return {"Authorization": f"Bearer {settings.admin_password}", **extra}
+
+
+def test_trace_id_follows_request_id():
+    rid = str(uuid.uuid4())
+    assert tracing.trace_id_for(rid) == rid.replace("-", "")
+    other = tracing.trace_id_for("req-123")
+    assert len(other) == 32 and other == tracing.trace_id_for("req-123")
+
+
+def test_generate_trace_covers_pipeline_and_render_phases(monkeypatch):
+    from app.api import proposals as proposals_api
+
+    class FakeFormattingService:
+        async def rewrite_professional(self, *args, **kwargs):
+            return "Install carpet — $1,200.00"
+
+        async def structure_proposal(self, *args, **kwargs):
+            return {"client_name": "Jane", "line_items": [{"description": "Install carpet", "amount": 1200.0}], "total": 1200.0}
+
+    monkeypatch.setattr(proposals_api, "get_formatting_service", lambda: FakeFormattingService())
+    client = TestClient(app)
+    rid = str(uuid.uuid4())
+    resp = client.post(
+        "/api/proposals/generate",
+        json={"session_id": "trace-1", "raw_text": "install carpet 1200", "document_type": "proposal"},
+        headers=_admin_headers(**{"X-Request-ID": rid}),
+    )
+    assert resp.status_code == 200, resp.text
+
+    trace = client.get(f"/api/metrics/traces/{rid}", headers=_admin_headers()).json()
+    assert trace["trace_id"] == rid.replace("-", "")
+    spans = {s["name"]: s for s in trace["spans"]}
+    root = spans["POST /api/proposals/generate"]
+    assert root["parent_span_id"] is None
+    assert root["attributes"]["http.status_code"] == 200
+    for name in ("rewrite", "structure", "save", "pdf_render", "pdf.overlay", "pdf.template_merge", "pdf.write"):
+        assert name in spans, name
+    assert spans["rewrite"]["parent_span_id"] == root["span_id"]
+    assert spans["pdf.overlay"]["parent_span_id"] == spans["pdf_render"]["span_id"]
+    assert trace["critical_path"][0]["name"] == "POST /api/proposals/generate"
+
+    slowest = client.get("/api/metrics/traces", headers=_admin_headers()).json()["traces"]
+    assert any(t["request_id"] == rid for t in slowest)
+
+
+def test_retry_attempts_and_backoff_are_spans(monkeypatch):
+    async def no_sleep(_):
+        return None
+
+    monkeypatch.setattr(openai_guard.asyncio, "sleep", no_sleep)
+    calls = {"n": 0}
+
+    async def flaky():
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise asyncio.TimeoutError()
+        return "ok"
+
+    async def scenario():
+        with tracing.span("root", trace_id="ab" * 16):
+            return await openai_guard.call_openai_with_retry(flaky, max_attempts=3, operation="unit")
+
+    assert asyncio.run(scenario()) == "ok"
+    spans = tracing.get_tracer().trace("ab" * 16)
+    names = [s.name for s in sorted(spans, key=lambda s: s.start_ns)]
+    assert names == ["root", "openai.attempt", "openai.backoff", "openai.attempt"]
+    first_attempt = next(s for s in spans if s.name == "openai.attempt" and s.attributes["attempt"] == 1)
+    assert first_attempt.status_code == tracing.STATUS_ERROR
+
+
+def test_batch_exporter_writes_otlp_json(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    tracer = tracing.Tracer(exporter=tracing.BatchExporter(path=str(path)), recent_traces=0)
+    root = tracer.start_span("root", trace_id="cd" * 16, attributes={"request_id": "r-1"})
+    root.end()
+    tracer.shutdown()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    payload = json.loads(lines[0])
+    span = payload["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert span["traceId"] == "cd" * 16
+    assert span["name"] == "root"
+    assert {"key": "request_id", "value": {"stringValue": "r-1"}} in span["attributes"]
+    assert int(span["endTimeUnixNano"]) >= int(span["startTimeUnixNano"])
+
+
+def test_tracing_disabled_records_nothing(monkeypatch):
+    monkeypatch.setattr(config.get_settings(), "TRACING_ENABLED", False)
+    with tracing.span("ignored") as s:
+        s.set_attribute("k", "v")
+    assert s is tracing.NOOP_SPAN
+    assert tracing.get_tracer() is None
+
+
+def test_pdf_phase_span_is_ended_when_render_fails(monkeypatch, tmp_path):
+    from app.models.schemas import ProposalData
+    from app.services import export_service
+
+    def broken_templates():
+        raise RuntimeError("template missing")
+
+    monkeypatch.setattr(export_service, "load_templates", broken_templates)
+    data = ProposalData(client_name="Jane", line_items=[{"description": "Paint", "amount": 100.0}], total=100.0)
+    with pytest.raises(RuntimeError):
+        with tracing.span("render", trace_id="ab" * 16):
+            export_service.ExportService()._generate_pdf("s", data, "", tmp_path / "out.pdf", document_type="invoice")
+
+    spans = {s.name: s for s in tracing.get_tracer().trace("ab" * 16)}
+    assert "pdf.overlay" in spans
+    assert spans["pdf.template_merge"].status_code == tracing.STATUS_ERROR
+    assert "pdf.write" not in spans
@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.ai.prompts import CONTRACTOR_DOC, REWRITE
+from app.services.formatting_service import FormattingService
+from app.services.openai_scheduler import call_openai_scheduled
+from app.services.usage_tracker import UsageTracker, extract_usage, get_usage_tracker, usage_scope
+
+
+def _usage(prompt, completion, cached=0):
+    details = type("D", (), {"cached_tokens": cached})()
+    return type("U", (), {"prompt_tokens": prompt, "completion_tokens": completion, "prompt_tokens_details": details})()
+
+
+def _response(content, usage, model="gpt-4o-2024-08-06"):
+    choice = type("C", (), {"message": type("M", (), {"content": content})()})()
+    return type("Resp", (), {"choices": [choice], "usage": usage, "model": model})()
+
+
+class RecordingClient:
+    def __init__(self, content, usage):
+        self.chat = self
+        self.completions = self
+        self.calls = []
+        self._response = _response(content, usage)
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return self._response
+
+
+def test_cost_accounts_for_cached_prompt_tokens():
+    tracker = UsageTracker()
+    tracker.record("rewrite", "gpt-4o-2024-08-06", (2000, 500, 1024), 1.5)
+    total = tracker.report()["total"]
+    # 976 uncached @ $2.50 + 1024 cached @ $1.25 + 500 output @ $10.00, per 1M tokens
+    assert total["cost_usd"] == pytest.approx((976 * 2.50 + 1024 * 1.25 + 500 * 10.00) / 1e6)
+    assert total["prompt_cache_savings_usd"] == pytest.approx(1024 * 1.25 / 1e6)
+    assert total["cached_ratio"] == pytest.approx(0.512)
+    assert total["avg_latency_ms"] == 1500.0
+
+
+def test_extract_usage_tolerates_missing_fields():
+    assert extract_usage(type("R", (), {})()) is None
+    no_details = type("U", (), {"prompt_tokens": 10, "completion_tokens": 2})()
+    assert extract_usage(type("R", (), {"usage": no_details})()) == (10, 2, 0)
+
+
+def test_calls_are_attributed_to_route_and_session():
+    async def fake_call():
+        return _response("ok", _usage(100, 20, 64))
+
+    async def run():
+        with usage_scope("/api/proposals/generate", "sess-1"):
+            await call_openai_scheduled(fake_call, operation="rewrite")
+            await call_openai_scheduled(fake_call, operation="generate_doc")
+        await call_openai_scheduled(fake_call, operation="ocr")
+
+    asyncio.run(run())
+    report = get_usage_tracker().report()
+    assert report["by_route"]["/api/proposals/generate"]["calls"] == 2
+    assert report["by_route"]["-"]["calls"] == 1
+    assert report["by_operation"]["rewrite"]["prompt_tokens"] == 100
+    assert report["top_sessions"]["sess-1"]["cached_tokens"] == 128
+
+
+def test_rewrite_sends_static_instructions_as_system_message():
+    client = RecordingClient("Install carpet — $1,200.00", _usage(1500, 40, 1280))
+    asyncio.run(FormattingService(client=client).rewrite_professional("install carpet 1200", use_cache=False))
+
+    messages = client.calls[0]["messages"]
+    assert [m["role"] for m in messages] == ["system", "user"]
+    assert messages[0]["content"] == REWRITE.system
+    assert "install carpet 1200" in messages[1]["content"]
+    assert "install carpet 1200" not in messages[0]["content"]
+    assert get_usage_tracker().report()["by_operation"]["rewrite"]["cached_tokens"] == 1280
+
+
+def test_generate_doc_prefix_is_identical_across_inputs():
+    from app.services.formatting_service import generate_doc
+
+    doc = json.dumps({"schema_version": "v1", "line_items": [{"description": "x", "amount_cents": 100}], "total_cents": 100})
+    client = RecordingClient(doc, _usage(900, 30))
+    asyncio.run(generate_doc("first notes", client, speculative=False))
+    asyncio.run(generate_doc("other notes", client, speculative=False))
+    systems = [c["messages"][0] for c in client.calls]
+    assert systems[0] == systems[1] == {"role": "system", "content": CONTRACTOR_DOC.system}
+
+
+def test_usage_endpoint_is_admin_only():
+    from app.main import create_app
+    from app.models.config import get_settings
+
+    get_usage_tracker().record("rewrite", "gpt-4o", (100, 10, 0), 0.2)
+    client = TestClient(create_app())
+    settings = get_settings()
+    assert client.get("/api/metrics/usage", headers={"Authorization": f"Bearer {settings.demo_password}"}).status_code == 403
+    resp = client.get("/api/metrics/usage", headers={"Authorization": f"Bearer {settings.admin_password}"})
+    assert resp.status_code == 200
+    assert resp.json()["by_operation"]["rewrite"]["calls"] == 1
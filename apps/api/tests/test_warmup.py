@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.models import config
+from app.services import openai_client, warmup
+from app.services.export_service import load_templates
+from loadtest.fake_openai import create_app as create_fake_openai
+
+# conftest swaps openai.AsyncOpenAI for an in-process fake per test; the openai step needs the real client
+RealAsyncOpenAI = openai.AsyncOpenAI
+
+
+def _settings(**overrides):
+    return SimpleNamespace(**{"WARMUP_OPENAI": True, "WARMUP_TIMEOUT_SECONDS": 30.0, **overrides})
+
+
+def test_warmup_runs_every_step_against_fake_openai(monkeypatch):
+    fake = create_fake_openai()
+    monkeypatch.setattr(openai, "AsyncOpenAI", RealAsyncOpenAI)
+    monkeypatch.setattr(openai_client, "build_http_client", lambda settings: httpx.AsyncClient(transport=httpx.ASGITransport(app=fake)))
+    monkeypatch.setattr(openai_client, "_client", None)
+    monkeypatch.setattr(openai_client, "_http_client", None)
+    monkeypatch.setattr(openai_client, "_client_loop", None)
+    monkeypatch.setattr(config.get_settings(), "OPENAI_BASE_URL", "http://fake-openai/v1")
+
+    async def go():
+        try:
+            return await warmup.run_warmup(_settings())
+        finally:
+            await openai_client.close_openai_client()
+
+    results = asyncio.run(go())
+    assert list(results) == ["validators", "templates", "pdf", "openai"]
+    assert all(step["ok"] for step in results.values()), results
+    assert load_templates() is load_templates()
+
+
+def test_failed_step_is_recorded_not_fatal(monkeypatch):
+    def broken():
+        raise RuntimeError("no fonts")
+
+    monkeypatch.setattr(warmup, "warm_pdf", broken)
+    results = asyncio.run(warmup.run_warmup(_settings(WARMUP_OPENAI=False)))
+    assert results["pdf"]["ok"] is False
+    assert results["validators"]["ok"] and results["templates"]["ok"]
+    assert "openai" not in results
+
+
+def test_ready_waits_for_warmup(monkeypatch):
+    monkeypatch.setattr(config.get_settings(), "WARMUP_ENABLED", True)
+    monkeypatch.setattr(config.get_settings(), "JOBS_ENABLED", False)
+    monkeypatch.setattr(config.get_settings(), "RETENTION_ENABLED", False)
+    release = asyncio.Event()
+
+    async def slow_warmup(settings):
+        await release.wait()
+        return {"pdf": {"ok": True, "ms": 1.0}}
+
+    monkeypatch.setattr(warmup, "run_warmup", slow_warmup)
+    with TestClient(create_app()) as client:
+        not_ready = client.get("/ready")
+        assert not_ready.status_code == 503
+        assert not_ready.json()["error_code"] == "NOT_READY"
+        assert not_ready.headers["retry-after"] == "1"
+        assert client.get("/health").status_code == 200
+
+        client.portal.call(release.set)
+        for _ in range(100):
+            ready = client.get("/ready")
+            if ready.status_code == 200:
+                break
+        assert ready.json() == {"status": "ready", "warmup": {"pdf": {"ok": True, "ms": 1.0}}}
+
+
+def test_ready_immediately_when_warmup_disabled(monkeypatch):
+    monkeypatch.setattr(config.get_settings(), "WARMUP_ENABLED", False)
+    monkeypatch.setattr(config.get_settings(), "JOBS_ENABLED", False)
+    monkeypatch.setattr(config.get_settings(), "RETENTION_ENABLED", False)
+    with TestClient(create_app()) as client:
+        assert client.get("/ready").json() == {"status": "ready", "warmup": None}